@@ -0,0 +1,260 @@
+"""
+Archive Sources
+
+This module lets the scan read a .tar, .tar.gz, .tar.bz2, .tar.xz or .zip snapshot in place, as
+if it were the directory it was made from, so that generate_llms_full and the counters can run
+on an archive without extracting it to disk.
+
+Key Features:
+- Members are listed once and handed to the scan in the walker's shape: sorted directories,
+  exclusion patterns and the size limit from config.yaml applied, paths of the form
+  "<archive>/<member path>", so the output matches a run over the extracted directory
+- Only regular files are read; links, devices, sparse members and paths that would leave the
+  archive root ("..", absolute paths) are left out
+- Members are read through file objects, so large members are streamed like large files
+- zip members are opened directly through the central directory
+- Compressed tar streams can only be read front to back; a bounded read-ahead buffer
+  (READ_AHEAD bytes) keeps the passed-over members the scan will read (want()), so that its
+  sorted order does not cost a decompression from the start per member in the common case
+- Memory is bounded: one small record per member plus the read-ahead buffer
+
+Usage:
+    from archive import is_archive, ArchiveSource
+
+    if is_archive(path):
+        with ArchiveSource(path) as source:
+            for dirpath, files in source.walk():
+                ...
+            source.want(paths)
+"""
+
+import io
+import os
+import bisect
+import threading
+from collections import namedtuple
+from walker import exclusion_rules, group_by_directory
+from utils import is_binary, report_skip, SNIFF_SIZE, SKIP_TOO_LARGE
+
+# File name suffixes recognised as archives.
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz", ".zip")
+
+# Bytes of passed-over tar members kept for later reads of a compressed tar archive.
+READ_AHEAD = 64 << 20
+
+# The stat data the scan uses for an archive member.
+ArchiveStat = namedtuple("ArchiveStat", ["st_size", "st_mtime_ns"])
+
+# One regular file of an archive. key is the tar data offset or the zip member name.
+_Member = namedtuple("_Member", ["path", "size", "mtime_ns", "key"])
+
+def is_archive(path):
+    """
+    Tells whether path is an archive file the scan can read in place.
+    """
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+def _member_path(name):
+    # The member's path relative to the archive root, or None if it would leave the root.
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts or name.startswith("/"):
+        return None
+    return "/".join(parts)
+
+class _TarMemberFile(io.RawIOBase):
+    # A member's data, read on demand from the shared tar stream.
+
+    def __init__(self, reader, offset, size):
+        self._reader = reader
+        self._offset = offset
+        self._size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._reader.read_at(self._offset + self._position, min(len(buffer), self._size - self._position))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+class _TarReader:
+    # Reads member data from a tar stream. In a compressed stream a seek back means decompressing
+    # from the start again, so small wanted members that a forward seek passes over are kept in
+    # a buffer of at most READ_AHEAD bytes until they are opened.
+
+    def __init__(self, tar, read_ahead):
+        self._stream = tar.fileobj
+        # An uncompressed archive is read through a plain buffered file; anything else decompresses.
+        self.compressed = not isinstance(tar.fileobj, io.BufferedReader)
+        self._read_ahead = read_ahead if self.compressed else 0
+        self._lock = threading.Lock()
+        self._offsets = []
+        self._wanted = {}
+        self._buffered = {}
+        self._buffered_size = 0
+
+    def want(self, members):
+        # Members the scan may read; only these are buffered.
+        self._wanted = {member.key: member for member in members}
+        self._offsets = sorted(self._wanted)
+
+    def keep(self, offset, data):
+        # Buffers a passed-over member's data unless it is binary, which the scan will skip.
+        if not is_binary(data[:SNIFF_SIZE]):
+            self._buffered[offset] = data
+            self._buffered_size += len(data)
+
+    def open(self, member):
+        with self._lock:
+            data = self._buffered.pop(member.key, None)
+            if data is not None:
+                self._buffered_size -= len(data)
+                return io.BytesIO(data)
+        return io.BufferedReader(_TarMemberFile(self, member.key, member.size), 1 << 16)
+
+    def read_at(self, offset, size):
+        with self._lock:
+            position = self._stream.tell()
+            if self._read_ahead and offset > position:
+                start = bisect.bisect_left(self._offsets, position)
+                for member_offset in self._offsets[start:bisect.bisect_left(self._offsets, offset)]:
+                    member = self._wanted[member_offset]
+                    if self._buffered_size + member.size <= self._read_ahead and member_offset not in self._buffered:
+                        self._stream.seek(member_offset)
+                        self.keep(member_offset, self._stream.read(member.size))
+            if offset != position:
+                self._stream.seek(offset)
+            return self._stream.read(size)
+
+class ArchiveSource:
+    """
+    The regular files of a tar or zip archive, in the shape the scan expects.
+
+    Attributes:
+        path (str): The archive; member paths are joined onto it.
+        sequential (bool): Whether members must be read one at a time in order (a compressed
+            tar stream), in which case the scan reads with a single thread.
+    """
+
+    def __init__(self, path, read_ahead=READ_AHEAD):
+        """
+        Args:
+            path (str): The archive file.
+            read_ahead (int): Read-ahead buffer size for compressed tar archives, in bytes.
+
+        Raises:
+            ValueError: If the file is not a readable tar or zip archive.
+        """
+        # Imported here so that directory runs do not pay for the archive modules.
+        import tarfile
+        import zipfile
+
+        self.path = path
+        self._members = {}
+        self._zip = None
+        self._tar = None
+        self._tar_reader = None
+        try:
+            if zipfile.is_zipfile(path):
+                self._zip = zipfile.ZipFile(path)
+            else:
+                self._tar = tarfile.open(path, "r:*")
+                self._tar_reader = _TarReader(self._tar, read_ahead)
+        except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+            raise ValueError(f"Cannot read archive {path}: {e}") from e
+        self.sequential = self._tar_reader is not None and self._tar_reader.compressed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _list(self):
+        # Yields (relpath, _Member) for each regular file, in archive order.
+        if self._zip is not None:
+            # Imported here: calendar pulls in locale, which only zip member times need.
+            import calendar
+
+            for info in self._zip.infolist():
+                relpath = _member_path(info.filename)
+                if relpath is None or info.is_dir():
+                    continue
+                mtime_ns = calendar.timegm(info.date_time + (0, 0, 0)) * 1_000_000_000
+                yield relpath, _Member(relpath, info.file_size, mtime_ns, info.filename)
+            return
+        tar = self._tar
+        while True:
+            info = tar.next()
+            if info is None:
+                break
+            # The records kept here replace tarfile's member list, which would grow with the archive.
+            tar.members.clear()
+            relpath = _member_path(info.name)
+            if relpath is None or not info.isreg() or info.issparse():
+                continue
+            yield relpath, _Member(relpath, info.size, int(info.mtime) * 1_000_000_000, info.offset_data)
+
+    def walk(self, exclude_patterns=None, max_file_size=None, on_skip=None):
+        """
+        Yields the members like walker.walk_files, with ArchiveStat records as stat results.
+
+        Args:
+            exclude_patterns (iterable): Glob patterns (default: from config.yaml).
+            max_file_size (int): Size limit in bytes (default: from config.yaml; 0 disables).
+            on_skip (callable): Called with a utils.SkippedFile for each member over the limit.
+
+        Yields:
+            tuple: (dirpath, files) per directory, where files is a list of (filename, ArchiveStat).
+        """
+        excluded, match_relpath, max_file_size = exclusion_rules(exclude_patterns, max_file_size)
+        # A later member with the same path replaces an earlier one, as on extraction.
+        members = dict(self._list())
+        by_directory = group_by_directory(members.items(), excluded, match_relpath)
+        listing = []
+        for reldir in sorted(by_directory):
+            dirpath = os.path.join(self.path, *reldir.split("/")) if reldir else self.path
+            files = []
+            for filename, member in by_directory[reldir]:
+                path = os.path.join(dirpath, filename)
+                if max_file_size and member.size > max_file_size:
+                    report_skip(on_skip, path, SKIP_TOO_LARGE, f"{member.size} bytes > {max_file_size}")
+                    continue
+                self._members[path] = member
+                files.append((filename, ArchiveStat(member.size, member.mtime_ns)))
+            listing.append((dirpath, files))
+        yield from listing
+
+    def want(self, paths):
+        """
+        Names the members that will be read, by the paths walk() gave them. Only these are kept
+        in the read-ahead buffer of a compressed tar archive, so files the scan leaves out (by
+        extension, say) do not take up its room; without a call nothing is kept.
+
+        Args:
+            paths (iterable): Member paths.
+        """
+        if self._tar_reader is not None:
+            self._tar_reader.want(self._members[path] for path in paths if path in self._members)
+
+    def open(self, filepath):
+        """
+        Opens a member by the path walk() gave it, as a binary file object.
+
+        Raises:
+            FileNotFoundError: If filepath is not a listed member.
+        """
+        member = self._members.get(filepath)
+        if member is None:
+            raise FileNotFoundError(f"No member {filepath} in {self.path}")
+        if self._zip is not None:
+            return self._zip.open(member.key)
+        return self._tar_reader.open(member)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
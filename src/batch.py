@@ -0,0 +1,261 @@
+"""
+Batch Generation for Many Repositories
+
+This script runs generate_llms_full for every job in a manifest, several at a time, so that
+hundreds of repositories can be processed by one command instead of one interpreter (and one
+interactive prompt) per repository.
+
+Key Features:
+- YAML or JSON manifest of jobs: source directory, output path and generate_llms_full options,
+  with shared defaults
+- Runs up to one job per CPU core at a time (--jobs), each in its own worker process forked from
+  this one, so no interpreter starts up and no modules are imported again per job
+- Per-job timeouts: a job that runs too long is killed and reported, the others carry on
+- Failure isolation: an exception, a crash or a killed worker only fails its own job
+- Summary report on the console and, optionally, as JSON (--report)
+
+Manifest:
+    defaults:
+      dedup: true
+      timeout: 600
+    jobs:
+      - directory: repos/alpha
+        output: out/alpha/llms-full.txt
+      - directory: repos/beta
+        output: out/beta/llms-full.txt.gz
+        index: true
+
+    Relative paths are relative to the manifest. A plain list of jobs is accepted as well.
+
+Usage:
+    python -m src.batch manifest.yaml [--jobs N] [--timeout SECONDS] [--report report.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import namedtuple
+from contextlib import redirect_stdout
+from multiprocessing.connection import wait
+from generate_llms import generate_llms_full
+from archive import is_archive
+from utils import setup_logging
+
+# Options a job may pass on to generate_llms_full.
+JOB_OPTIONS = (
+    "workers", "cache", "count_lines", "count_chars", "honor_gitignore", "max_tokens", "dedup",
+    "compress", "frame_size", "compress_level", "index", "toc", "compact", "git",
+    "rank", "budget", "budget_unit", "rank_references", "chunks", "chunk_size", "chunk_overlap", "chunk_unit",
+    "chunks_changed",
+)
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+STATUS_CRASHED = "crashed"
+
+# One manifest entry: source directory, output path, generate_llms_full options and timeout.
+Job = namedtuple("Job", ["directory", "output", "options", "timeout"])
+
+# The outcome of a job. skipped and duplicates are file counts; messages are the last lines
+# the job printed.
+JobResult = namedtuple("JobResult", ["directory", "output", "status", "seconds", "error",
+                                     "skipped", "duplicates", "messages"])
+
+# Lines of console output kept per job.
+MESSAGE_LINES = 20
+
+def load_manifest(path):
+    """
+    Loads a batch manifest.
+
+    Args:
+        path (str): YAML or JSON file with a list of jobs, or a mapping with "jobs" and
+            optional "defaults".
+
+    Returns:
+        list: Job tuples, with paths resolved relative to the manifest.
+
+    Raises:
+        ValueError: If the manifest cannot be read or a job is malformed.
+    """
+    import yaml
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError) as e:
+        raise ValueError(f"Cannot read manifest {path}: {e}") from e
+    defaults = {}
+    if isinstance(manifest, dict):
+        defaults = manifest.get("defaults") or {}
+        manifest = manifest.get("jobs")
+    if not isinstance(manifest, list) or not isinstance(defaults, dict):
+        raise ValueError(f"Manifest {path} must be a list of jobs or a mapping with a 'jobs' list")
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for number, entry in enumerate(manifest, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Job {number} in {path} is not a mapping")
+        entry = {**defaults, **entry}
+        missing = [key for key in ("directory", "output") if not entry.get(key)]
+        if missing:
+            raise ValueError(f"Job {number} in {path} has no {' or '.join(missing)}")
+        directory = os.path.join(base, os.path.expanduser(entry.pop("directory")))
+        output = os.path.join(base, os.path.expanduser(entry.pop("output")))
+        timeout = entry.pop("timeout", None)
+        unknown = sorted(set(entry) - set(JOB_OPTIONS))
+        if unknown:
+            raise ValueError(f"Job {number} in {path} has unknown options: {', '.join(unknown)}")
+        jobs.append(Job(directory, output, entry, timeout))
+    return jobs
+
+def _run_job(job, conn):
+    # Worker process body: runs one job and sends back a dict of JobResult fields.
+    out = io.StringIO()
+    try:
+        with redirect_stdout(out):
+            if not (os.path.isdir(job.directory) or is_archive(job.directory)):
+                raise NotADirectoryError(f"No such directory: {job.directory}")
+            output_dir = os.path.dirname(job.output)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            result = generate_llms_full(job.directory, job.output, **job.options)
+        report = {"status": STATUS_OK, "skipped": len(result.skipped),
+                  "duplicates": len(result.duplicates)}
+    except BaseException as e:
+        report = {"status": STATUS_FAILED, "error": f"{type(e).__name__}: {e}"}
+    report["messages"] = out.getvalue().splitlines()[-MESSAGE_LINES:]
+    conn.send(report)
+    conn.close()
+
+def _context():
+    # fork shares the already imported modules with the workers; elsewhere use the default.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def run_batch(jobs, max_parallel=None, timeout=None, on_result=None):
+    """
+    Runs jobs in worker processes, at most max_parallel at a time.
+
+    Args:
+        jobs (list): Job tuples, e.g. from load_manifest().
+        max_parallel (int): Jobs running at once (default: the number of CPU cores).
+        timeout (float): Seconds after which a job without its own timeout is killed
+            (default: no limit).
+        on_result (callable): Called with each JobResult as soon as its job ends.
+
+    Returns:
+        list: One JobResult per job, in the order of jobs.
+    """
+    max_parallel = max(1, max_parallel or os.cpu_count() or 1)
+    context = _context()
+    results = [None] * len(jobs)
+    pending = list(enumerate(jobs))[::-1]
+    running = {}    # result connection -> (index, process, start, deadline)
+
+    def finish(index, seconds, report):
+        job = jobs[index]
+        result = JobResult(job.directory, job.output, report["status"], seconds,
+                           report.get("error"), report.get("skipped", 0),
+                           report.get("duplicates", 0), report.get("messages", []))
+        results[index] = result
+        if on_result is not None:
+            on_result(result)
+
+    try:
+        while pending or running:
+            while pending and len(running) < max_parallel:
+                index, job = pending.pop()
+                reader, writer = context.Pipe(duplex=False)
+                process = context.Process(target=_run_job, args=(job, writer), daemon=True)
+                start = time.monotonic()
+                process.start()
+                writer.close()
+                limit = job.timeout if job.timeout is not None else timeout
+                running[reader] = (index, process, start, start + limit if limit else None)
+
+            deadlines = [entry[3] for entry in running.values() if entry[3] is not None]
+            wait_for = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+            # A connection becomes ready when its worker sends a result, or at EOF when the
+            # worker dies without one.
+            ready = wait(list(running), wait_for)
+            now = time.monotonic()
+            for reader, (index, process, start, deadline) in list(running.items()):
+                if reader in ready:
+                    try:
+                        report = reader.recv()
+                    except EOFError:
+                        process.join()
+                        report = {"status": STATUS_CRASHED,
+                                  "error": f"Worker exited with code {process.exitcode}"}
+                    else:
+                        process.join()
+                    finish(index, now - start, report)
+                elif deadline is not None and now >= deadline:
+                    process.kill()
+                    process.join()
+                    finish(index, now - start, {"status": STATUS_TIMEOUT,
+                                                "error": f"Killed after {deadline - start:g} seconds"})
+                else:
+                    continue
+                reader.close()
+                del running[reader]
+    finally:
+        for reader, (index, process, start, deadline) in running.items():
+            process.kill()
+            process.join()
+            reader.close()
+    return results
+
+def summarize(results, seconds=None):
+    """
+    Returns a one-line summary of a batch, e.g. "12 jobs: 10 ok, 1 failed, 1 timeout".
+    """
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    parts = [f"{counts[status]} {status}" for status in
+             (STATUS_OK, STATUS_FAILED, STATUS_TIMEOUT, STATUS_CRASHED) if counts.get(status)]
+    summary = f"{len(results)} jobs: {', '.join(parts) or 'nothing to do'}"
+    if seconds is not None:
+        summary += f" in {seconds:.1f}s"
+    return summary
+
+def _print_result(result):
+    line = f"{'[' + result.status + ']':<10}{result.seconds:8.2f}s  {result.directory} -> {result.output}"
+    if result.error:
+        line += f"\n    {result.error}"
+    print(line, flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate llms-full.txt for every job in a manifest.")
+    parser.add_argument("manifest", help="YAML or JSON manifest of jobs")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="Jobs run at once (default: number of CPU cores)")
+    parser.add_argument("--timeout", type=float,
+                        help="Seconds after which a job is killed, unless it sets its own timeout")
+    parser.add_argument("--report", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    setup_logging()
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    start = time.monotonic()
+    results = run_batch(jobs, args.jobs, args.timeout, on_result=_print_result)
+    seconds = time.monotonic() - start
+    print(summarize(results, seconds))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"seconds": seconds, "jobs": [result._asdict() for result in results]}, f, indent=2)
+    sys.exit(0 if all(result.status == STATUS_OK for result in results) else 1)
+
+if __name__ == "__main__":
+    main()
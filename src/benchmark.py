@@ -0,0 +1,345 @@
+"""
+Benchmark Suite
+
+This script measures how fast the generator and the counters run on a synthetic repository, so
+that performance regressions show up before they reach production. The tree is generated from
+a seed, so every run (and every machine) benchmarks the same files.
+
+Key Features:
+- Deterministic synthetic tree generator (make_tree): file count, log-normal size distribution,
+  extension mix, share of non-UTF-8 and binary files, and directory depth
+- Benchmarks generate_llms_full, count_lines_of_code, count_characters and generate_toc, each in
+  a fresh worker process so that peak memory is measured per benchmark
+- Reports wall time (best of --repeat runs), files/s, MB/s and peak RSS
+- Results are stored as JSON (-o); --compare flags benchmarks that got slower or bigger than
+  a saved baseline by more than --threshold percent, and exits non-zero if any did
+
+Usage:
+    python -m src.benchmark [--files N] [--repeat N] [-o results.json] [--compare baseline.json]
+
+Example:
+    python -m src.benchmark --files 5000 -o baseline.json
+    python -m src.benchmark --files 5000 --compare baseline.json
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from contextlib import redirect_stdout
+from generate_llms import generate_llms_full
+from count_lines_of_code import count_lines_of_code
+from count_chars_of_code import count_characters
+from generate_toc import generate_toc_file
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RESULTS_VERSION = 1
+
+BENCHMARKS = ("generate_llms_full", "count_lines_of_code", "count_characters", "generate_toc")
+
+DEFAULT_EXTENSIONS = {".py": 4, ".md": 2, ".js": 2, ".txt": 1, ".html": 1}
+
+# Benchmarks slower (or bigger) than the baseline by more than this share are flagged.
+DEFAULT_THRESHOLD = 0.10
+
+_WORDS = ("data", "value", "index", "result", "config", "path", "count", "item", "node", "name",
+          "buffer", "stream", "token", "section", "offset", "cache", "entry", "state", "error")
+
+def _code_lines(rng, ext, count):
+    # Source-like lines for a code file of the given extension.
+    comment = "#" if ext in (".py", ".sh", ".toml") else "//"
+    lines = []
+    for number in range(count):
+        a, b, c = rng.choice(_WORDS), rng.choice(_WORDS), rng.choice(_WORDS)
+        kind = number % 7
+        if kind == 0:
+            lines.append(f"{comment} {a} {b} handling for {c}")
+        elif kind == 1:
+            lines.append(f"def {a}_{b}({c}):" if ext == ".py" else f"function {a}_{b}({c}) {{")
+        elif kind == 6:
+            lines.append("")
+        else:
+            lines.append(f"    {a}_{b} = {c}[{number}] + len({a})")
+    return lines
+
+def _markdown_lines(rng, count):
+    lines = [f"# {rng.choice(_WORDS).title()} {rng.choice(_WORDS)}", f"> About {rng.choice(_WORDS)}.", ""]
+    while len(lines) < count:
+        kind = rng.randrange(6)
+        if kind == 0:
+            lines += [f"## {rng.choice(_WORDS).title()} {rng.choice(_WORDS)}", ""]
+        elif kind == 1:
+            lines += ["```python", "# comment, not a heading", f"{rng.choice(_WORDS)} = 1", "```", ""]
+        else:
+            lines.append(" ".join(rng.choice(_WORDS) for _ in range(12)) + ".")
+    return lines
+
+def _file_content(rng, ext, size, encoding):
+    # About size bytes of text for a file with this extension.
+    count = max(1, size // 32)
+    lines = _markdown_lines(rng, count) if ext in (".md", ".markdown") else _code_lines(rng, ext, count)
+    if encoding != "utf-8":
+        lines.insert(min(1, len(lines)), f"{'#' if ext == '.py' else '//'} café naïve résumé")
+    data = ("\n".join(lines) + "\n").encode(encoding)
+    while len(data) < size:
+        data += data[:size - len(data)]
+    return data[:size] if size else data
+
+def make_tree(root, files=1000, size_median=4096, size_sigma=1.0, max_size=1 << 20,
+              extensions=None, non_utf8=0.02, binary=0.01, depth=3, fanout=4, seed=0):
+    """
+    Writes a deterministic synthetic repository.
+
+    Args:
+        root (str): Directory to create the files in (created if missing).
+        files (int): Number of files.
+        size_median (int): Median file size in bytes; sizes follow a log-normal distribution.
+        size_sigma (float): Spread of the log-normal size distribution (0 for equal sizes).
+        max_size (int): Largest file size in bytes.
+        extensions (dict): Extension -> relative weight (default: DEFAULT_EXTENSIONS).
+        non_utf8 (float): Share of text files written in cp1252 with non-ASCII characters.
+        binary (float): Share of files with binary content (under the same extensions).
+        depth (int): Deepest directory nesting below root.
+        fanout (int): Subdirectories per directory.
+        seed (int): Random seed; the same arguments always produce the same tree.
+
+    Returns:
+        dict: {"files", "bytes", "binary", "non_utf8"} counts of what was written.
+    """
+    rng = random.Random(seed)
+    extensions = extensions or DEFAULT_EXTENSIONS
+    names, weights = list(extensions), list(extensions.values())
+    stats = {"files": 0, "bytes": 0, "binary": 0, "non_utf8": 0}
+    for number in range(files):
+        ext = rng.choices(names, weights)[0]
+        size = min(max_size, max(1, int(rng.lognormvariate(math.log(max(size_median, 1)), size_sigma))))
+        parts = [f"d{rng.randrange(fanout)}" for _ in range(rng.randint(0, depth))]
+        directory = os.path.join(root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        kind = rng.random()
+        if kind < binary:
+            # Random bytes after a NUL, so that even a tiny file is recognisably binary.
+            data = b"\0" + bytes(rng.getrandbits(8) for _ in range(min(size, 4096) - 1))
+            data += b"\0" * (size - len(data))
+            stats["binary"] += 1
+        elif kind < binary + non_utf8:
+            data = _file_content(rng, ext, size, "cp1252")
+            stats["non_utf8"] += 1
+        else:
+            data = _file_content(rng, ext, size, "utf-8")
+        with open(os.path.join(directory, f"file{number:06d}{ext}"), "wb") as f:
+            f.write(data)
+        stats["files"] += 1
+        stats["bytes"] += len(data)
+    return stats
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def _target(name, tree, work):
+    # Runs one benchmark and returns its wall time; console output is discarded.
+    document = os.path.join(work, "llms-full.txt")
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if name == "generate_llms_full":
+            generate_llms_full(tree, os.path.join(work, "bench-llms-full.txt"))
+        elif name == "count_lines_of_code":
+            count_lines_of_code(tree)
+        elif name == "count_characters":
+            count_characters(tree)
+        elif name == "generate_toc":
+            generate_toc_file(document)
+        else:
+            raise ValueError(f"Unknown benchmark {name!r}")
+        return time.perf_counter() - start
+
+def _worker(name, tree, work, conn):
+    try:
+        conn.send({"seconds": _target(name, tree, work), "peak_rss_kb": _peak_rss_kb()})
+    except BaseException as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    conn.close()
+
+def _measure(context, name, tree, work):
+    reader, writer = context.Pipe(duplex=False)
+    process = context.Process(target=_worker, args=(name, tree, work, writer))
+    process.start()
+    writer.close()
+    try:
+        report = reader.recv()
+    except EOFError:
+        report = {"error": f"Worker exited with code {process.exitcode}"}
+    process.join()
+    if "error" in report:
+        raise RuntimeError(f"Benchmark {name} failed: {report['error']}")
+    return report
+
+def run_benchmarks(tree, names=BENCHMARKS, repeat=3, tree_stats=None):
+    """
+    Runs benchmarks on a tree, each repeat times in a fresh worker process.
+
+    Args:
+        tree (str): The directory to benchmark on.
+        names (iterable): Benchmarks to run (default: all of BENCHMARKS).
+        repeat (int): Runs per benchmark; the fastest counts, and the largest peak RSS.
+        tree_stats (dict): What make_tree() returned, for files/s and MB/s.
+
+    Returns:
+        dict: Benchmark name -> {"seconds", "files_per_s", "mb_per_s", "peak_rss_kb"}.
+    """
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    results = {}
+    work = tempfile.mkdtemp(prefix="llms-bench-")
+    try:
+        document = os.path.join(work, "llms-full.txt")
+        with redirect_stdout(io.StringIO()):
+            generate_llms_full(tree, document)
+        for name in names:
+            runs = [_measure(context, name, tree, work) for _ in range(max(1, repeat))]
+            seconds = min(run["seconds"] for run in runs)
+            peaks = [run["peak_rss_kb"] for run in runs if run["peak_rss_kb"] is not None]
+            if name == "generate_toc":
+                files, size = None, os.path.getsize(document)
+            else:
+                files = (tree_stats or {}).get("files")
+                size = (tree_stats or {}).get("bytes")
+            results[name] = {
+                "seconds": round(seconds, 6),
+                "files_per_s": round(files / seconds, 1) if files and seconds else None,
+                "mb_per_s": round(size / seconds / 1e6, 2) if size and seconds else None,
+                "peak_rss_kb": max(peaks) if peaks else None,
+            }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares benchmark results with a baseline.
+
+    Args:
+        results (dict): Benchmark name -> metrics, as returned by run_benchmarks().
+        baseline (dict): The same for the baseline.
+        threshold (float): Relative increase of wall time or peak RSS that counts as a
+            regression (default: 0.10, 10%).
+
+    Returns:
+        list: (benchmark, metric, baseline value, current value, relative change) for every
+        regression.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("seconds", "peak_rss_kb"):
+            old, new = base.get(metric), current.get(metric)
+            if old and new is not None and (new - old) / old > threshold:
+                regressions.append((name, metric, old, new, (new - old) / old))
+    return regressions
+
+def _print_results(results, baseline=None):
+    print(f"{'benchmark':<22}{'seconds':>10}{'files/s':>12}{'MB/s':>10}{'peak RSS':>12}"
+          + (f"{'vs baseline':>14}" if baseline else ""))
+    for name, metrics in results.items():
+        line = (f"{name:<22}{metrics['seconds']:>10.3f}{metrics['files_per_s'] or '-':>12}"
+                f"{metrics['mb_per_s'] or '-':>10}"
+                f"{(str(metrics['peak_rss_kb']) + ' KB') if metrics['peak_rss_kb'] else '-':>12}")
+        base = (baseline or {}).get(name)
+        if base and base.get("seconds"):
+            line += f"{(metrics['seconds'] - base['seconds']) / base['seconds']:>+14.1%}"
+        print(line)
+
+def _parse_extensions(text):
+    # "py=4,md=2" -> {".py": 4.0, ".md": 2.0}
+    extensions = {}
+    for item in text.split(","):
+        ext, _, weight = item.partition("=")
+        extensions["." + ext.strip().lstrip(".")] = float(weight or 1)
+    return extensions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generator and counters on a synthetic tree.")
+    parser.add_argument("--files", type=int, default=2000, help="Number of files (default: 2000)")
+    parser.add_argument("--size-median", type=int, default=4096, help="Median file size in bytes")
+    parser.add_argument("--size-sigma", type=float, default=1.0, help="Spread of the log-normal sizes")
+    parser.add_argument("--max-size", type=int, default=1 << 20, help="Largest file size in bytes")
+    parser.add_argument("--extensions", type=_parse_extensions, default=DEFAULT_EXTENSIONS,
+                        help="Extension mix with weights, e.g. py=4,md=2,js=2")
+    parser.add_argument("--non-utf8", type=float, default=0.02, help="Share of cp1252 text files")
+    parser.add_argument("--binary", type=float, default=0.01, help="Share of binary files")
+    parser.add_argument("--depth", type=int, default=3, help="Deepest directory nesting")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the tree")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest counts")
+    parser.add_argument("--only", help="Comma-separated benchmarks to run (default: all)")
+    parser.add_argument("--tree", help="Generate the tree here and keep it (default: a temporary directory)")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD * 100,
+                        help="Regression threshold in percent (default: 10)")
+    args = parser.parse_args()
+
+    names = tuple(args.only.split(",")) if args.only else BENCHMARKS
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    params = {"files": args.files, "size_median": args.size_median, "size_sigma": args.size_sigma,
+              "max_size": args.max_size, "extensions": args.extensions, "non_utf8": args.non_utf8,
+              "binary": args.binary, "depth": args.depth, "seed": args.seed}
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    tree = args.tree or tempfile.mkdtemp(prefix="llms-tree-")
+    try:
+        tree_stats = make_tree(tree, **params)
+        print(f"Tree: {tree_stats['files']} files, {tree_stats['bytes'] / 1e6:.1f} MB "
+              f"({tree_stats['binary']} binary, {tree_stats['non_utf8']} non-UTF-8)")
+        results = run_benchmarks(tree, names, args.repeat, tree_stats)
+    finally:
+        if not args.tree:
+            shutil.rmtree(tree, ignore_errors=True)
+
+    report = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "tree": tree_stats,
+        "results": results,
+    }
+    _print_results(results, baseline and baseline.get("results"))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        if baseline.get("params") != params:
+            print("Warning: the baseline was measured on a tree with different parameters")
+        regressions = compare(results, baseline.get("results", {}), args.threshold / 100)
+        for name, metric, old, new, change in regressions:
+            print(f"REGRESSION {name} {metric}: {old} -> {new} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:g}% against {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""
+JSONL Chunk Export for Retrieval and Embedding Pipelines
+
+This module writes the generated document a second time as a stream of overlapping chunks, one
+JSON line each, ready to be embedded or loaded into a search index. The chunks are cut from the
+same section stream the document is written from, so nothing is read back or parsed afterwards.
+
+Key Features:
+- Windows of a fixed size in estimated tokens (shards.estimate_tokens) or characters, with a
+  configurable overlap carried over from the end of the previous window
+- Chunks end at line boundaries and never span two sections; a Markdown heading outside a code
+  block starts a new chunk (without overlap) once the current one is a quarter full, and only
+  lines longer than a whole window are cut inside
+- Every record carries the source path, section title, the heading it falls under, its byte
+  offset and length in the document, and the SHA-256 of its text
+- A sorted table of hash prefixes is kept next to the export, so the next run can tell which
+  chunks are unchanged and, with skip_unchanged, leave their text out
+- Streams: a chunk is written as soon as its window is full, so memory is bounded by the window
+  size plus 8 bytes per chunk for the hash table, not by the document
+
+Usage:
+    python -m src.generate_llms /path/to/project --chunks --chunk-size 512 --chunk-overlap 64
+
+    from chunk_export import ChunkExporter, load_chunks
+
+    with ChunkExporter("llms-full.txt.chunks.jsonl", directory) as exporter:
+        for section in map(exporter.track, sections):
+            ...
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+from array import array
+from bisect import bisect_left
+from collections import deque
+from shards import estimate_tokens
+from section_index import written_length
+
+EXPORT_VERSION = 1
+UNITS = ("tokens", "chars")
+
+DEFAULT_SIZE = 512
+DEFAULT_OVERLAP = 64
+
+# A heading only closes the current chunk once it holds this share of a window, so that short
+# runs of small sections under their own headings are not exported as tiny chunks.
+HEADING_FILL = 0.25
+
+_HASHES_MAGIC = b"LLMSCHK1"
+
+_HEADING_PATTERN = re.compile(r" {0,3}#{1,6}[ \t]+(.*?)(?:[ \t]+#+)?[ \t]*\Z")
+_FENCE_PATTERN = re.compile(r" {0,3}(`{3,}|~{3,})(.*)\Z")
+# Lines that can start a heading or a fence, and inside a fence the lines that can close it;
+# searched for after a line break, which keeps the regex engine on its fast path.
+_CANDIDATE_PATTERN = re.compile(r"\n {0,3}[#`~]")
+_LINE_START_PATTERN = re.compile(r" {0,3}[#`~]")
+_CLOSING_PATTERNS = {"`": re.compile(r"\n {0,3}```"), "~": re.compile(r"\n {0,3}~~~")}
+
+# Characters of a section buffered before they are cut into windows.
+BLOCK_SIZE = 1 << 16
+
+def chunks_path(output_file):
+    """
+    Returns the path of the chunk export stored next to an output file.
+    """
+    return output_file + ".chunks.jsonl"
+
+def _hashes_path(path):
+    return path + ".hashes"
+
+def _load_hashes(path):
+    # Sorted, distinct 64-bit hash prefixes of the previous export, or an empty array.
+    keys = array("Q")
+    try:
+        with open(_hashes_path(path), "rb") as f:
+            if f.read(len(_HASHES_MAGIC)) != _HASHES_MAGIC:
+                return keys
+            keys.frombytes(f.read())
+    except (OSError, ValueError):
+        return array("Q")
+    if sys.byteorder == "big":
+        keys.byteswap()
+    return keys
+
+def _save_hashes(path, keys):
+    # Sorts and deduplicates the hash prefixes of this export and writes them next to it.
+    ordered = sorted(keys)
+    keys = array("Q", (key for i, key in enumerate(ordered) if not i or key != ordered[i - 1]))
+    if sys.byteorder == "big":
+        keys.byteswap()
+    with open(_hashes_path(path) + ".tmp", "wb") as f:
+        f.write(_HASHES_MAGIC)
+        keys.tofile(f)
+    os.replace(_hashes_path(path) + ".tmp", _hashes_path(path))
+
+class ChunkExporter:
+    """
+    Cuts every section passed through track() into overlapping chunks and writes them to a JSONL
+    file: a header record, one record per chunk and a trailer with the totals.
+
+    The export is written to a temporary file and moved into place by close(commit=True),
+    together with the hash table the next run compares against.
+    """
+
+    def __init__(self, path, directory, size=DEFAULT_SIZE, overlap=DEFAULT_OVERLAP, unit="tokens",
+                 newline="\n", skip_unchanged=False, duplicates=None):
+        """
+        Args:
+            path (str): Where to write the export (usually chunks_path(output_file)).
+            directory (str): The directory the document was generated from, as given.
+            size (int): Largest chunk, in unit.
+            overlap (int): How much of the end of a chunk is repeated at the start of the next
+                one from the same section, in unit; whole lines only, so usually a little less.
+            unit (str): "tokens" (estimated) or "chars".
+            newline (str): What each "\\n" becomes in the written document, for the byte offsets.
+            skip_unchanged (bool): Leave out the text of chunks whose hash was in the previous
+                export; their records are marked "unchanged".
+            duplicates (dict): Duplicate path -> original path, as filled in by the scan.
+
+        Raises:
+            ValueError: If the unit is unknown, size is not positive or overlap is not smaller.
+        """
+        if unit not in UNITS:
+            raise ValueError(f"Unknown chunk unit {unit!r}; expected one of {', '.join(UNITS)}")
+        if size < 1 or not 0 <= overlap < size:
+            raise ValueError(f"Chunk size must be positive and overlap below it (got {size} and {overlap})")
+        self.path = path
+        self.size = size
+        self.overlap = overlap
+        self.unit = unit
+        self.newline = newline
+        self.skip_unchanged = skip_unchanged
+        self.duplicates = duplicates if duplicates is not None else {}
+        self.measure = estimate_tokens if unit == "tokens" else len
+        self.offset = 0
+        self.chunks = 0
+        self.new = 0
+        self.unchanged = 0
+        self.removed = 0
+        self._previous = _load_hashes(path)
+        self._seen = bytearray(len(self._previous))
+        self._keys = array("Q")
+        self._file = open(path + ".tmp", "w", encoding="utf-8")
+        self._write({"version": EXPORT_VERSION, "directory": directory, "unit": unit,
+                     "size": size, "overlap": overlap})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self._file.write("\n")
+
+    def track(self, section):
+        """
+        Returns the section with its chunks wrapped so that it is exported as they are consumed.
+
+        Args:
+            section (Section): The section about to be written.
+
+        Returns:
+            Section: The same section.
+        """
+        return section._replace(chunks=self._track(section))
+
+    def _track(self, section):
+        if section.kind == "heading":
+            for chunk in section.chunks:
+                self.offset += written_length(chunk, self.newline)
+                yield chunk
+            return
+        splitter = _SectionSplitter(self, section)
+        for chunk in section.chunks:
+            yield chunk
+            splitter.feed(chunk)
+        splitter.finish()
+
+    def _emit(self, section, number, heading, text, offset, length, cost):
+        # Writes one chunk record.
+        digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+        key = int.from_bytes(digest[:8], "little")
+        self._keys.append(key)
+        record = {"path": section.path, "title": section.title, "kind": section.kind,
+                  "heading": heading, "chunk": number, "offset": offset, "length": length,
+                  self.unit: cost, "hash": digest.hex()}
+        original = self.duplicates.get(section.path)
+        if original is not None:
+            record["same_as"] = original
+        i = bisect_left(self._previous, key)
+        if i < len(self._previous) and self._previous[i] == key:
+            self._seen[i] = 1
+            self.unchanged += 1
+            if self.skip_unchanged:
+                record["unchanged"] = True
+            else:
+                record["text"] = text
+        else:
+            self.new += 1
+            record["text"] = text
+        self._write(record)
+        self.chunks += 1
+
+    def summary(self):
+        """
+        Returns a one-line report of the chunks written.
+        """
+        return (f"Chunks: {self.chunks} of at most {self.size} {self.unit} written to {self.path} "
+                f"({self.new} new, {self.unchanged} unchanged, {self.removed} removed)")
+
+    def close(self, commit=True):
+        if self._file is None:
+            return
+        if commit:
+            self.removed = len(self._previous) - self._seen.count(1)
+            self._write({"end": True, "size": self.offset, "chunks": self.chunks, "new": self.new,
+                         "unchanged": self.unchanged, "removed": self.removed})
+        self._file.close()
+        self._file = None
+        if commit:
+            _save_hashes(self.path, self._keys)
+            os.replace(self.path + ".tmp", self.path)
+        else:
+            os.remove(self.path + ".tmp")
+
+class _SectionSplitter:
+    # Cuts the text of one section, fed in arbitrary pieces, into windows of whole lines. Text is
+    # buffered and cut in blocks: window ends are found by measuring a few candidate prefixes,
+    # and headings by a search for the lines that can start one, so no step runs per line.
+
+    def __init__(self, exporter, section):
+        self.exporter = exporter
+        self.section = section
+        self.size = exporter.size
+        self.fill = exporter.size * HEADING_FILL
+        self.measure = exporter.measure
+        self.text = ""          # buffered text, from the start of the current window
+        self.pending = []       # pieces fed since the last pass
+        self.pending_size = 0
+        self.pos = 0            # start of the current window in text
+        self.start = exporter.offset    # its byte offset in the document
+        self.fresh = 0          # where the text not yet written in a chunk starts
+        self.carried = 0        # the cost of the text from pos to fresh
+        self.scanned = 0        # end of the text searched for headings
+        self.marks = deque()    # (index, heading) of the headings found after pos
+        self.heading = None     # the heading in effect at pos
+        self.fence = None
+        self.number = 0
+        self.ratio = 4.0        # characters per unit seen so far, to place the first guesses
+
+    def feed(self, text):
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= BLOCK_SIZE:
+            self._run(False)
+
+    def finish(self):
+        self._run(True)
+        self.exporter.offset = self.start + written_length(self.text[self.pos:], self.exporter.newline)
+
+    def _run(self, final):
+        shift = self.pos
+        if shift:
+            self.fresh -= shift
+            self.scanned -= shift
+            self.marks = deque((index - shift, heading) for index, heading in self.marks)
+            self.pos = 0
+        self.text = self.text[shift:] + "".join(self.pending)
+        self.pending = []
+        self.pending_size = 0
+        limit = len(self.text) if final else self.text.rfind("\n") + 1
+        if limit > self.scanned:
+            self._scan(limit)
+        self._cut(limit, final)
+
+    def _scan(self, limit):
+        # Follows code fences through the complete lines up to limit and records the Markdown
+        # headings outside of them.
+        text = self.text
+        start = self.scanned
+        if start == 0 and _LINE_START_PATTERN.match(text):
+            self._mark(0, limit)
+        at = max(start - 1, 0)
+        while True:
+            pattern = _CANDIDATE_PATTERN if self.fence is None else _CLOSING_PATTERNS[self.fence[0]]
+            match = pattern.search(text, at, limit)
+            if match is None:
+                break
+            self._mark(match.start() + 1, limit)
+            at = match.end()
+        self.scanned = limit
+
+    def _mark(self, index, limit):
+        text = self.text
+        end = text.find("\n", index, limit)
+        line = text[index:end if end >= 0 else limit].rstrip("\r")
+        match = _FENCE_PATTERN.match(line)
+        if match:
+            marker, info = match.groups()
+            if self.fence is None:
+                if not (marker[0] == "`" and "`" in info):
+                    self.fence = marker
+            elif marker[0] == self.fence[0] and len(marker) >= len(self.fence) and not info.strip():
+                self.fence = None
+            return
+        if self.fence is None:
+            match = _HEADING_PATTERN.match(line)
+            if match:
+                self.marks.append((index, match.group(1)))
+
+    def _cut(self, limit, final):
+        # Writes every window that ends before limit; with final, also the last one.
+        text = self.text
+        while True:
+            pos = self.pos
+            while self.marks and self.marks[0][0] <= pos:
+                self.heading = self.marks.popleft()[1]
+            # A heading after enough fresh text ends the window there, without overlap; one
+            # right after the carried lines drops them.
+            bound, cost, at_heading = limit, 0, False
+            measured = pos
+            for index, _heading in self.marks:
+                if index < self.fresh:
+                    continue
+                if index == self.fresh:
+                    bound = None
+                    break
+                cost += self.measure(text[measured:index])
+                measured = index
+                if cost >= self.fill:
+                    bound, at_heading = index, cost <= self.size
+                    break
+            if bound is None:
+                self._move(self.fresh)
+                continue
+            if at_heading:
+                self._emit(pos, bound, cost)
+                self.fresh = bound
+                self._move(bound)
+                continue
+            end, cost = self._fit(pos, bound)
+            if end == bound == limit:
+                if final and limit > self.fresh:
+                    self._emit(pos, limit, cost)
+                    self.fresh = limit
+                return
+            if end <= self.fresh:
+                if pos < self.fresh:
+                    # The carried lines leave no room for the next line.
+                    self._move(self.fresh)
+                    continue
+                end, cost = self._split(pos)
+                self._emit(pos, end, cost)
+                self.fresh = end
+                self._move(end)
+                continue
+            self._emit(pos, end, cost)
+            self.fresh = end
+            self._move(*self._overlap(pos, end))
+
+    def _fit(self, pos, bound):
+        # Returns (end, cost) for the longest run of whole lines from pos to at most bound that
+        # fits in a window; it ends at or before self.fresh if no new line fits. The cost is
+        # summed over the pieces measured, each ending at a line end, which never undercounts
+        # (see shards.estimate_tokens) and measures most of the window only once.
+        text = self.text
+        low, low_cost = (self.fresh, self.carried) if pos < self.fresh else (pos, 0)
+        high, known = bound, False
+        while True:
+            guess = low + int((self.size - low_cost) * self.ratio) + 1
+            if guess >= high and not known:
+                end = high
+            else:
+                guess = min(guess, high - 1)
+                end = text.rfind("\n", low, guess) + 1
+                if end <= low:
+                    end = text.find("\n", guess, high) + 1 or high
+            if end == high and known:
+                return low, low_cost
+            cost = self.measure(text[low:end])
+            if cost:
+                self.ratio = (end - low) / cost
+            if low_cost + cost <= self.size:
+                low, low_cost = end, low_cost + cost
+                if end == high:
+                    return low, low_cost
+            else:
+                high, known = end, True
+
+    def _split(self, pos):
+        # Returns (end, cost) for a cut inside a line longer than a whole window.
+        text = self.text
+        end = text.find("\n", pos) + 1 or len(text)
+        piece = text[pos:min(end, pos + int(self.size * self.ratio * 4) + 1)]
+        cost = self.measure(piece)
+        cut = len(piece)
+        while cost > self.size and cut > 1:
+            cut = max(1, min(cut - 1, cut * self.size // cost))
+            cost = self.measure(piece[:cut])
+        return pos + cut, cost
+
+    def _overlap(self, pos, end):
+        # Returns (start, cost) for the next window: the first line after pos from which the
+        # rest of the window fits in the overlap, and its cost; or (end, 0).
+        overlap = self.exporter.overlap
+        if not overlap:
+            return end, 0
+        text = self.text
+        start = max(end - int(overlap * self.ratio), pos + 1)
+        start = text.find("\n", start - 1, end - 1) + 1
+        while start:
+            cost = self.measure(text[start:end])
+            if cost <= overlap:
+                return start, cost
+            start = text.find("\n", start, end - 1) + 1
+        return end, 0
+
+    def _move(self, pos, carried=0):
+        # Starts the window at pos; carried is the cost of the text from there to self.fresh.
+        self.start += written_length(self.text[self.pos:pos], self.exporter.newline)
+        self.pos = pos
+        self.carried = carried
+        while self.marks and self.marks[0][0] <= pos:
+            self.heading = self.marks.popleft()[1]
+
+    def _emit(self, pos, end, cost):
+        text = self.text[pos:end]
+        self.exporter._emit(self.section, self.number, self.heading, text, self.start,
+                            written_length(text, self.exporter.newline), cost)
+        self.number += 1
+
+def load_chunks(path):
+    """
+    Loads a chunk export; meant for tests and small exports, as it reads every record.
+
+    Args:
+        path (str): The export path.
+
+    Returns:
+        tuple: (header, chunks, trailer), where chunks is the list of chunk records in order.
+
+    Raises:
+        ValueError: If the export is unreadable, of another version or incomplete.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read chunk export {path}: {e}") from e
+    if not records or records[0].get("version") != EXPORT_VERSION:
+        raise ValueError(f"Unsupported chunk export {path}")
+    if len(records) < 2 or not records[-1].get("end"):
+        raise ValueError(f"Chunk export {path} is incomplete")
+    return records[0], records[1:-1], records[-1]
+
+def add_arguments(parser):
+    """
+    Adds the chunk export options of generate_llms to an argument parser.
+    """
+    group = parser.add_argument_group("chunk export")
+    group.add_argument("--chunks", action="store_true",
+                       help="Also write <output>.chunks.jsonl with overlapping chunks for retrieval")
+    group.add_argument("--chunk-size", type=int, default=DEFAULT_SIZE,
+                       help=f"Largest chunk, in --chunk-unit (default: {DEFAULT_SIZE})")
+    group.add_argument("--chunk-overlap", type=int, default=DEFAULT_OVERLAP,
+                       help=f"Overlap between consecutive chunks, in --chunk-unit (default: {DEFAULT_OVERLAP})")
+    group.add_argument("--chunk-unit", choices=UNITS, default="tokens",
+                       help="Unit of --chunk-size and --chunk-overlap (default: tokens)")
+    group.add_argument("--chunks-changed", action="store_true",
+                       help="Leave out the text of chunks unchanged since the previous export")
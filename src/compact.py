@@ -0,0 +1,476 @@
+"""
+Code Compaction
+
+This module shrinks the code sections of llms-full.txt before they are written, to cut the tokens
+spent on text that tells a model little: license headers, comments, runs of blank lines and
+trailing whitespace. It is opt-in (generate_llms --compact) and lossy by design.
+
+Key Features:
+- Three cumulative levels: "basic" strips trailing whitespace, collapses runs of blank lines and
+  drops a leading comment block that is a license or copyright notice; "comments" also drops all
+  comments; "docstrings" also drops Python docstrings
+- Per-language rules for the extensions in utils.CODE_EXTENSIONS: one compiled regular
+  expression per language finds comments and the string literals that may contain comment
+  markers, so a file is compacted in a single regex pass; files of other or ambiguous
+  extensions only get the whitespace rules
+- Whole lines that only hold a comment are removed with their line break; comments after code
+  are cut from the line
+- Streaming: large files are compacted chunk by chunk at line boundaries, carrying an unclosed
+  block comment or multi-line string over to the next chunk
+- Python docstrings are found in one regex pass over the strings, comments and brackets of a
+  file, which tells a docstring from other strings by where it stands; a docstring that is the
+  only statement of its body is kept. Streamed files keep their docstrings, and the summary
+  says how many did
+- Anything the rules cannot make sense of (an unclosed string, say) is kept as it is, and so is a
+  "#!" line at the start of a file
+- Bytes before and after, and the estimated tokens (shards.estimate_tokens) of what was dropped,
+  for the files compacted
+
+Usage:
+    python src/generate_llms.py /path/to/project --compact
+    python src/generate_llms.py /path/to/project --compact comments
+
+    from compact import Compactor
+
+    compactor = Compactor("comments")
+    text = compactor.text("app.js", source)
+    print(compactor.summary())
+"""
+
+import os
+import re
+import threading
+from collections import namedtuple
+from shards import estimate_tokens
+
+LEVELS = ("basic", "comments", "docstrings")
+
+# Mentions that make a leading comment block a license notice.
+_LICENSE = re.compile(r"copyright|\blicen[cs]|spdx-license-identifier|all rights reserved|\(c\)\s*\d{4}|©",
+                      re.IGNORECASE)
+# Characters of a streamed file looked at for a license notice before its first output, unless
+# the leading comment block is longer.
+_HEADER_PREFIX = 1 << 14
+_BLANK_RUNS = re.compile(r"\n\n\n+")
+
+# String literals, which are kept as they are and may contain comment markers. The _OPEN
+# patterns match a multi-line literal that is not closed before the end of the text.
+_DOUBLE = r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+_SINGLE = r"'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+_BACKTICK = r"`[^`\\]*(?:\\[\s\S][^`\\]*)*`"
+_BACKTICK_OPEN = r"`[^`\\]*(?:\\[\s\S][^`\\]*)*\\?\Z"
+# In languages with triple-quoted strings, a quote pair followed by a third quote is not an
+# empty string.
+_PAIRED_DOUBLE = r'"(?!"")[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+_PAIRED_SINGLE = r"'(?!'')[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+_TRIPLE_DOUBLE = r'"""[^"\\]*(?:(?:\\[\s\S]|"(?!""))[^"\\]*)*"""'
+_TRIPLE_DOUBLE_OPEN = r'"""[^"\\]*(?:(?:\\[\s\S]|"(?!""))[^"\\]*)*\\?\Z'
+_TRIPLE_SINGLE = r"'''[^'\\]*(?:(?:\\[\s\S]|'(?!''))[^'\\]*)*'''"
+_TRIPLE_SINGLE_OPEN = r"'''[^'\\]*(?:(?:\\[\s\S]|'(?!''))[^'\\]*)*\\?\Z"
+_LONG_BRACKET = r"\[\[[^\]]*(?:\](?!\])[^\]]*)*\]\]"
+_LONG_BRACKET_OPEN = r"\[\[[^\]]*(?:\](?!\])[^\]]*)*\Z"
+# A comment marker that only counts after whitespace, as in shells and YAML ("a#b" is a word).
+_HASH = r"#(?<![^\s;]#)"
+
+# How a language writes comments and the strings around them. keep: patterns of text kept as is;
+# line: patterns starting a comment that runs to the end of the line; block: (open, close)
+# string pairs; full_line: comment starts that only count at the start of a line; open:
+# patterns of multi-line keep text left unclosed, which is carried over to the next chunk.
+# Every pattern starts with a literal character, so that the regex engine can skip ahead to
+# the characters that may start a match instead of trying every position.
+Language = namedtuple("Language", ["keep", "line", "block", "full_line", "open"], defaults=((), (), (), (), ()))
+
+_C_BLOCK = (("/*", "*/"),)
+_C = Language((_DOUBLE, _SINGLE), ("//",), _C_BLOCK)
+_JS = Language((_BACKTICK, _DOUBLE, _SINGLE), ("//",), _C_BLOCK, open=(_BACKTICK_OPEN,))
+_TRIPLE_C = Language((_TRIPLE_DOUBLE, _PAIRED_DOUBLE, _SINGLE), ("//",), _C_BLOCK, open=(_TRIPLE_DOUBLE_OPEN,))
+_HASHED = Language((_DOUBLE, _SINGLE), (_HASH,))
+_DASHED = Language((_DOUBLE, _SINGLE), ("--",))
+_SEMICOLON = Language((_DOUBLE,), (";",))
+_LINE_ONLY_HASH = Language(full_line=("#",))
+_MARKUP = Language(block=(("<!--", "-->"),))
+
+PYTHON = Language((_TRIPLE_DOUBLE, _TRIPLE_SINGLE, _PAIRED_DOUBLE, _PAIRED_SINGLE), ("#",),
+                  open=(_TRIPLE_DOUBLE_OPEN, _TRIPLE_SINGLE_OPEN))
+
+# Language rules by extension. Extensions shared by several languages (.m, .v, .s) or without
+# comments (.json, .txt) are left out and only get the whitespace rules.
+LANGUAGES = {
+    ".py": PYTHON,
+    **dict.fromkeys((".c", ".cpp", ".h", ".hpp", ".java", ".rs", ".proto", ".cs"), _C),
+    **dict.fromkeys((".js", ".jsx", ".ts", ".tsx", ".go"), _JS),
+    **dict.fromkeys((".swift", ".kt", ".scala", ".groovy", ".gradle", ".dart"), _TRIPLE_C),
+    ".css": Language((_DOUBLE, _SINGLE), (), _C_BLOCK),
+    **dict.fromkeys((".scss", ".less"), Language((r"url\([^)\n]*\)", _DOUBLE, _SINGLE), ("//",), _C_BLOCK)),
+    ".php": Language((_DOUBLE, _SINGLE), ("//", "#"), _C_BLOCK),
+    **dict.fromkeys((".sh", ".bash", ".r", ".pl", ".perl", ".cmake", ".yaml", ".yml"), _HASHED),
+    ".rb": _HASHED,
+    ".toml": Language((_TRIPLE_DOUBLE, _TRIPLE_SINGLE, _PAIRED_DOUBLE, _PAIRED_SINGLE), (_HASH,),
+                      open=(_TRIPLE_DOUBLE_OPEN, _TRIPLE_SINGLE_OPEN)),
+    ".ps1": Language((_DOUBLE, _SINGLE), (_HASH,), (("<#", "#>"),)),
+    ".jl": Language((_TRIPLE_DOUBLE, _PAIRED_DOUBLE), ("#",), (("#=", "=#"),), open=(_TRIPLE_DOUBLE_OPEN,)),
+    ".coffee": Language((_TRIPLE_DOUBLE, _PAIRED_DOUBLE, _SINGLE), ("#",), (("###", "###"),),
+                        open=(_TRIPLE_DOUBLE_OPEN,)),
+    **dict.fromkeys((".tf", ".tfvars"), Language((_DOUBLE,), (_HASH, "//"), _C_BLOCK)),
+    ".sql": Language((_SINGLE, _DOUBLE), ("--",), _C_BLOCK),
+    ".lua": Language((_LONG_BRACKET, _DOUBLE, _SINGLE), ("--",), (("--[[", "]]"),),
+                     open=(_LONG_BRACKET_OPEN,)),
+    ".hs": Language((_DOUBLE,), ("--",), (("{-", "-}"),)),
+    **dict.fromkeys((".ada", ".vhdl"), _DASHED),
+    **dict.fromkeys((".clj", ".lisp", ".scm", ".edn"), _SEMICOLON),
+    ".erl": Language((_DOUBLE,), ("%",)),
+    **dict.fromkeys((".f90", ".f95", ".f03"), Language((_DOUBLE, _SINGLE), ("!",))),
+    ".pas": Language((_SINGLE,), ("//",), (("{", "}"), ("(*", "*)"))),
+    **dict.fromkeys((".vb", ".vbs"), Language((_DOUBLE,), ("'",))),
+    ".asm": Language((_DOUBLE, _SINGLE), (";",)),
+    ".ini": Language(full_line=("#", ";")),
+    **dict.fromkeys((".dockerfile", ".gitignore", ".env", ".tcl"), _LINE_ONLY_HASH),
+    ".bat": Language(full_line=("::", r"(?i:rem)\b")),
+    **dict.fromkeys((".html", ".htm", ".xml", ".csproj", ".config"), _MARKUP),
+}
+
+# Compiled rules of a Language: pattern finds the text to keep or drop, kinds names what each of
+# its marker groups (match.lastindex) found, and header matches a leading run of blank lines and
+# whole-line comments.
+_Rules = namedtuple("_Rules", ["pattern", "kinds", "header"])
+
+_compiled = {}
+
+def _block_body(close):
+    # Text up to the first close, unrolled ("[^*]*(?:\*(?!/)[^*]*)*") for the regex engine's sake.
+    first, rest = re.escape(close[0]), re.escape(close[1:])
+    return rf"[^{first}]*(?:{first}(?!{rest})[^{first}]*)*" if rest else rf"[^{first}]*"
+
+def _rules(language):
+    rules = _compiled.get(language)
+    if rules is not None:
+        return rules
+    blocks = [re.escape(open_) + _block_body(close) + re.escape(close) for open_, close in language.block]
+    lines = [start + r"[^\n]*" for start in language.line]
+    full_lines = [start + r"[^\n]*" for start in language.full_line]
+    alternatives = []
+    if full_lines:
+        # Comment starts that only count at the start of a line. Texts start with a line break.
+        alternatives.append((rf"\n[ \t]*(?:{'|'.join(full_lines)})", "full_line"))
+    alternatives += [(pattern, "keep") for pattern in language.keep]
+    alternatives += [(pattern, "block") for pattern in blocks]
+    alternatives += [(pattern, "line") for pattern in lines]
+    # Block comments and multi-line strings that are not closed in the text seen so far.
+    alternatives += [(re.escape(open_) + _block_body(close) + r"\Z", "open") for open_, close in language.block]
+    alternatives += [(pattern, "open") for pattern in language.open]
+    # Each alternative ends in an empty marker group; none of them has other capturing groups.
+    pattern = re.compile("|".join(pattern + "()" for pattern, _ in alternatives)) if alternatives else None
+    kinds = [None] + [kind for _, kind in alternatives]
+    whole_line = "|".join(blocks + lines + full_lines)
+    header = re.compile(rf"(?:\n[ \t]*(?:(?:{whole_line})[ \t]*)?)*(?=\n|\Z)") if whole_line else None
+    rules = _compiled[language] = _Rules(pattern, kinds, header)
+    return rules
+
+def language_for(filepath):
+    """
+    Returns the Language of a file by its extension, or None if only whitespace rules apply.
+    """
+    name = os.path.basename(filepath).lower()
+    # ".gitignore" and ".env" are whole names, not extensions, to os.path.splitext.
+    extension = os.path.splitext(name)[1] or (name if name.startswith(".") else "")
+    return LANGUAGES.get(extension)
+
+def _strip_comments(rules, text, final, dropped, skip=0):
+    # One regex pass over text, from skip on. Returns (compacted, rest, skip): rest is an unclosed
+    # block comment or multi-line string left for the next chunk, from its line break if only
+    # whitespace comes before it on its line, else with one character of context before it,
+    # and skip is the length of that context. When final, unclosed text is kept as it is.
+    # Dropped comments are appended to dropped.
+    pieces = []
+    position = 0
+    for match in rules.pattern.finditer(text, skip):
+        kind = rules.kinds[match.lastindex]
+        if kind == "keep":
+            continue
+        start, end = match.span()
+        if kind == "open":
+            if final:
+                break
+            line_start = text.rfind("\n", position, start)
+            if line_start >= 0 and not text[line_start + 1:start].strip(" \t"):
+                start, skip = line_start, 0
+            else:
+                skip = 1 if start > position else 0
+                start -= skip
+            pieces.append(text[position:start])
+            return "".join(pieces), text[start:], skip
+        replacement = ""
+        if kind != "full_line":
+            line_start = text.rfind("\n", position, start)
+            line_end = text.find("\n", end)
+            if (line_start >= 0 and not text[line_start + 1:start].strip(" \t")
+                    and not text[end:line_end if line_end >= 0 else len(text)].strip(" \t")):
+                # A comment alone on its line goes with its line break.
+                start = line_start
+            elif kind == "block":
+                # "a/**/b" must not become "ab".
+                replacement = " "
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        dropped.append(match.group())
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces), "", 0
+
+def _shebang_end(text):
+    # End of the "#!" line a text starts with (after its line break), or 0.
+    if not text.startswith("\n#!"):
+        return 0
+    end = text.find("\n", 1)
+    return end if end >= 0 else len(text)
+
+def _strip_license(rules, text, dropped):
+    # Drops a leading comment block (after a shebang line) that mentions a license or copyright.
+    start = _shebang_end(text)
+    end = rules.header.match(text, start).end()
+    if end > start and _LICENSE.search(text, start, end):
+        dropped.append(text[start:end])
+        return text[:start] + text[end:]
+    return text
+
+def _normalize(text):
+    # Strips trailing whitespace and collapses runs of blank lines; str methods beat a regex
+    # for the former, since indentation makes every line a partial match.
+    text = "\n".join([line.rstrip(" \t\r\f\v") for line in text.split("\n")])
+    return _BLANK_RUNS.sub("\n\n", text)
+
+def strip_docstrings(text):
+    """
+    Removes Python docstrings: string statements that open a module, class or function body
+    (or any other indented block), unless the string is the block's only statement.
+
+    Args:
+        text (str): Python source.
+
+    Returns:
+        str: The source without docstrings, or text unchanged if it has an unclosed string or bracket.
+    """
+    return _strip_docstrings(text, [])
+
+# Paired quotes that may go on after a backslash at the end of a line.
+_CONTINUED_DOUBLE = r'"(?!"")[^"\\\n]*(?:\\[\s\S][^"\\\n]*)*"'
+_CONTINUED_SINGLE = r"'(?!'')[^'\\\n]*(?:\\[\s\S][^'\\\n]*)*'"
+# Python string literals, comments, brackets and the quotes of strings left unclosed, as numbered
+# groups, for the docstring pass. The lookahead lets the regex engine skip ahead to the
+# characters that may start a match, which the alternation alone does not.
+_PYTHON_TOKENS = re.compile(r"""(?=["'#()\[\]{}])(?:""" + "|".join(
+    [f"({pattern})" for pattern in (_TRIPLE_DOUBLE, _TRIPLE_SINGLE, _CONTINUED_DOUBLE, _CONTINUED_SINGLE)]
+    + [r"(#[^\n]*)", r"([(\[{])", r"([)\]}])", r"""(\"\"\"|'''|["'])"""]) + ")")
+_STRING, _COMMENT, _OPENING, _CLOSING, _UNCLOSED = 4, 5, 6, 7, 8
+# Blank and comment lines, then the indent of the next line of code.
+_NEXT_CODE = re.compile(r"(?:[ \t\f\r]*(?:#[^\n]*)?\n)*([ \t\f]*)(?=[^\s#])")
+_COMMENTS = re.compile(r"#[^\n]*")
+
+def _strip_docstrings(text, dropped):
+    # One regex pass over the strings, comments and brackets of the text, which is much faster
+    # than tokenize. A string is a docstring if it is outside brackets, starts its line (after
+    # an "r" or "u" prefix) and ends it, comes first in the text or after a ":" that ends the
+    # code before it, and is followed by code at its own indent. Text with an unclosed string or
+    # bracket is left as it is.
+    pieces = []
+    position = 0
+    depth = 0
+    code_end = 0    # end of the last string or bracket
+    first = True
+    for match in _PYTHON_TOKENS.finditer(text):
+        kind = match.lastindex
+        if kind == _COMMENT:
+            continue
+        if kind == _OPENING:
+            depth += 1
+        elif kind == _CLOSING:
+            depth -= 1
+        elif kind == _UNCLOSED:
+            return text
+        start, end = match.span()
+        previous, code_end = code_end, end
+        module, first = first, False
+        if kind > _STRING or depth:
+            continue
+        line_start = text.rfind("\n", 0, start) + 1
+        indent = text[line_start:start].rstrip("rRuU")
+        if indent.strip(" \t\f") or start - line_start - len(indent) > 1:
+            continue
+        before = text[previous:line_start]
+        if "#" in before:
+            before = _COMMENTS.sub("", before)
+        before = before.rstrip()
+        if not (before.endswith(":") or module and not before):
+            continue
+        line_end = text.find("\n", end) + 1 or len(text)
+        rest = text[end:line_end].strip()
+        if rest and not rest.startswith("#"):
+            continue
+        following = _NEXT_CODE.match(text, line_end)
+        if following is None or following.group(1) != indent:
+            continue
+        # The whole statement goes, from its line start to the end of its last line.
+        pieces.append(text[position:line_start])
+        dropped.append(text[line_start:line_end])
+        position = line_end
+    if depth:
+        return text
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+class Compactor:
+    """
+    Compacts file contents at one level and adds up what it saved. Safe to share between threads.
+
+    Attributes:
+        level (str): One of LEVELS.
+        files (int): Files compacted.
+        bytes_before (int): UTF-8 bytes of their content before compaction.
+        bytes_after (int): UTF-8 bytes after compaction.
+        tokens_saved (int): Estimated tokens of the comments, license headers and docstrings
+            dropped; the estimate only looks at the dropped text, which is much cheaper than
+            estimating whole files twice, and leaves out the whitespace.
+        docstrings_kept (int): Python files at the docstrings level that were streamed, and so
+            kept their docstrings.
+    """
+
+    def __init__(self, level="basic"):
+        """
+        Args:
+            level (str): "basic", "comments" or "docstrings" (see the module docstring).
+
+        Raises:
+            ValueError: If level is not one of LEVELS.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Unknown compaction level {level!r}; expected one of {', '.join(LEVELS)}")
+        self.level = level
+        self.comments = LEVELS.index(level) >= LEVELS.index("comments")
+        self.docstrings = level == "docstrings"
+        self.files = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.tokens_saved = 0
+        self.docstrings_kept = 0
+        self._lock = threading.Lock()
+
+    def text(self, filepath, content):
+        """
+        Returns the compacted content of a file.
+
+        Args:
+            filepath (str): The file's path; its extension picks the language rules.
+            content (str): The decoded content.
+        """
+        language = language_for(filepath)
+        dropped = []
+        compacted = content
+        if self.docstrings and language is PYTHON:
+            compacted = _strip_docstrings(compacted, dropped)
+        # The rules look for whole-line comments after a line break, so the text starts with one.
+        compacted = "\n" + compacted
+        if language is not None:
+            rules = _rules(language)
+            if self.comments and rules.pattern is not None:
+                compacted = _strip_comments(rules, compacted, True, dropped, _shebang_end(compacted))[0]
+            elif rules.header is not None:
+                compacted = _strip_license(rules, compacted, dropped)
+        compacted = _normalize(compacted).lstrip("\n")
+        self._add(1, content, compacted, dropped)
+        return compacted
+
+    def chunks(self, filepath, chunks):
+        """
+        Compacts a stream of content chunks, a run of whole lines at a time as they are consumed.
+        Python docstrings are kept in streamed files.
+
+        Args:
+            filepath (str): The file's path; its extension picks the language rules.
+            chunks (iterable): Decoded content chunks.
+
+        Yields:
+            str: The compacted content, in pieces.
+        """
+        language = language_for(filepath)
+        rules = _rules(language) if language is not None else None
+        if self.docstrings and language is PYTHON:
+            with self._lock:
+                self.docstrings_kept += 1
+        strip = self.comments and rules is not None and rules.pattern is not None
+        license = not self.comments and rules is not None and rules.header is not None
+        pending = "\n"
+        first = True
+        shebang = strip     # the first pass keeps a "#!" line
+        skip = 0
+        blank = 0   # line breaks at the end of the output so far
+        self._add(1, "", "", ())
+        for chunk in _chain_final(chunks):
+            final = chunk is None
+            dropped = []
+            if not final:
+                self._add(0, chunk, "", ())
+                pending += chunk
+            # Texts end before a line break, so that the next one starts with it.
+            cut = len(pending) if final else pending.rfind("\n")
+            if cut <= 0:
+                continue
+            text, pending = pending[:cut], pending[cut:]
+            if license:
+                if not final and (len(text) < _HEADER_PREFIX or rules.header.match(text).end() == len(text)):
+                    # The leading comment block may go on in the next chunk.
+                    pending = text + pending
+                    continue
+                text = _strip_license(rules, text, dropped)
+                license = False
+            if shebang:
+                skip = _shebang_end(text)
+                shebang = False
+            if strip:
+                text, rest, skip = _strip_comments(rules, text, final, dropped, skip)
+                if skip:
+                    # rest goes on with the last line, which waits for it so that the line is
+                    # normalized whole; the next pass starts scanning after it.
+                    end = text.rfind("\n")
+                    skip += len(text) - end
+                    text, rest = text[:end], text[end:] + rest
+                pending = rest + pending
+            compacted = _normalize(text)
+            if first:
+                # Blank lines at the start of a file (or left by its license header) go too.
+                compacted = compacted.lstrip("\n")
+                first = not compacted
+            # Blank lines are collapsed across chunk boundaries too.
+            leading = len(compacted) - len(compacted.lstrip("\n"))
+            if leading and blank + leading > 2:
+                compacted = compacted[min(leading, blank + leading - 2):]
+            if compacted:
+                trailing = len(compacted) - len(compacted.rstrip("\n"))
+                blank = trailing if trailing < len(compacted) else blank + trailing
+            self._add(0, "", compacted, dropped)
+            if compacted:
+                yield compacted
+
+    def _add(self, files, before, after, dropped):
+        tokens = estimate_tokens("".join(dropped)) if dropped else 0
+        with self._lock:
+            self.files += files
+            self.bytes_before += len(before.encode("utf-8", "surrogatepass"))
+            self.bytes_after += len(after.encode("utf-8", "surrogatepass"))
+            self.tokens_saved += tokens
+
+    def summary(self):
+        """
+        Returns a one-line report of the bytes and estimated tokens saved.
+        """
+        saved = self.bytes_before - self.bytes_after
+        share = saved / self.bytes_before if self.bytes_before else 0.0
+        summary = (f"Compacted {self.files} files ({self.level}): {self.bytes_before} -> {self.bytes_after} bytes "
+                   f"({share:.1%} smaller), about {self.tokens_saved} tokens saved")
+        if self.docstrings_kept:
+            summary += f"; {self.docstrings_kept} streamed Python files kept their docstrings"
+        return summary
+
+def _chain_final(chunks):
+    # The chunks followed by None, so that the consumer knows when it has the last one.
+    yield from chunks
+    yield None
@@ -0,0 +1,249 @@
+"""
+Framed Compressed Output
+
+This module writes llms-full.txt compressed with gzip or xz while it is being generated, without
+an uncompressed temporary file. The output is cut into frames that are each a complete gzip
+member or xz stream, so the file is still an ordinary .gz or .xz file for gzip -d, xz -d, zcat and
+friends, while a reader that knows where the frames start can decompress just the part it needs.
+
+Key Features:
+- gzip (zlib) and xz (lzma) from the standard library; the codec follows the output extension
+- Frames end at the first section boundary after frame_size uncompressed bytes, so a section
+  usually lives in a single frame; sections much larger than that are cut inside as well
+- A small frame table next to the output (<output>.frames.json) maps uncompressed byte ranges
+  to compressed ones
+- read_range() decompresses only the frames covering the requested bytes
+- Memory is bounded by the compressor state, whatever the size of the document
+
+Usage:
+    from compression import FramedWriter, read_range
+
+    with FramedWriter("llms-full.txt.gz") as writer:
+        for section in iter_section_records(directory):
+            writer.add(section)
+    head = read_range("llms-full.txt.gz", 0, 4096)
+"""
+
+import os
+import json
+import zlib
+import lzma
+from bisect import bisect_right
+
+CODECS = ("gzip", "xz")
+FRAME_TABLE_VERSION = 1
+
+# Frames are closed at the first section boundary after this many uncompressed bytes.
+FRAME_SIZE = 1 << 20
+
+_EXTENSIONS = {".gz": "gzip", ".gzip": "gzip", ".xz": "xz"}
+
+def codec_for(path):
+    """
+    Returns the codec implied by a file name's extension.
+
+    Args:
+        path (str): The output path.
+
+    Returns:
+        str or None: "gzip", "xz", or None for uncompressed output.
+    """
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+def frame_table_path(path):
+    """
+    Returns the path of the frame table stored next to a compressed output file.
+    """
+    return path + ".frames.json"
+
+def _compressor(codec, level):
+    if codec == "gzip":
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    if codec == "xz":
+        return lzma.LZMACompressor(lzma.FORMAT_XZ, preset=6 if level is None else level)
+    raise ValueError(f"Unknown codec {codec!r}; expected one of {', '.join(CODECS)}")
+
+def _decompress(codec, data):
+    if codec == "gzip":
+        return zlib.decompress(data, 31)
+    return lzma.decompress(data, lzma.FORMAT_XZ)
+
+class FramedWriter:
+    """
+    Text sink that compresses everything written to it into independently decompressible frames.
+
+    Use write() for plain text or add() for Sections; frames are only closed at section
+    boundaries (add() calls) unless the current frame has grown past twice frame_size. The frame
+    table is written when the writer is closed.
+
+    Attributes:
+        frames (list): [compressed_offset, compressed_length, offset, length] per frame, where
+            offset and length refer to the uncompressed UTF-8 document.
+    """
+
+    def __init__(self, path, codec=None, frame_size=FRAME_SIZE, level=None):
+        """
+        Args:
+            path (str): The output path.
+            codec (str): "gzip" or "xz" (default: from the extension of path).
+            frame_size (int): Uncompressed bytes after which a frame is closed at the next
+                section boundary.
+            level (int): Compression level, or xz preset (default: 6 for both).
+        """
+        codec = codec or codec_for(path)
+        if codec not in CODECS:
+            raise ValueError(f"Cannot infer a codec from {path!r}; pass one of {', '.join(CODECS)}")
+        if frame_size < 1:
+            raise ValueError(f"frame_size must be positive, got {frame_size}")
+        self.path = path
+        self.codec = codec
+        self.frame_size = frame_size
+        self.level = level
+        self.frames = []
+        self._file = open(path + ".tmp", "wb")
+        self._compressor = None
+        self._compressed = 0      # compressed bytes written so far
+        self._size = 0            # uncompressed bytes written so far
+        self._frame_start = 0     # (compressed, uncompressed) offsets of the current frame
+        self._frame_offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+    def _emit(self, data):
+        if data:
+            self._file.write(data)
+            self._compressed += len(data)
+
+    def _end_frame(self):
+        if self._compressor is None:
+            return
+        self._emit(self._compressor.flush())
+        self._compressor = None
+        self.frames.append([self._frame_start, self._compressed - self._frame_start,
+                            self._frame_offset, self._size - self._frame_offset])
+
+    def write(self, text):
+        """
+        Compresses a piece of the document into the current frame.
+
+        Args:
+            text (str): The text to write.
+        """
+        data = text.encode("utf-8")
+        if not data:
+            return
+        if self._compressor is None:
+            self._compressor = _compressor(self.codec, self.level)
+            self._frame_start = self._compressed
+            self._frame_offset = self._size
+        self._emit(self._compressor.compress(data))
+        self._size += len(data)
+        if self._size - self._frame_offset >= 2 * self.frame_size:
+            self._end_frame()
+
+    def boundary(self):
+        """
+        Marks a section boundary: the current frame ends here if it holds frame_size bytes.
+        """
+        if self._compressor is not None and self._size - self._frame_offset >= self.frame_size:
+            self._end_frame()
+
+    def add(self, section):
+        """
+        Writes a whole Section, starting a new frame before it if the current one is full.
+
+        Args:
+            section (Section): The section; its chunks are consumed.
+        """
+        self.boundary()
+        for chunk in section.chunks:
+            self.write(chunk)
+
+    def close(self, commit=True):
+        """
+        Finishes the last frame and, if commit, writes the frame table.
+
+        Returns:
+            str or None: The frame table path, if it was written.
+        """
+        if self._file is None:
+            return None
+        if commit and not self.frames and self._compressor is None:
+            # An empty document is still a valid (empty) gzip or xz file.
+            self._compressor = _compressor(self.codec, self.level)
+            self._frame_start = self._frame_offset = 0
+        if commit:
+            self._end_frame()
+        self._file.close()
+        self._file = None
+        if not commit:
+            os.remove(self.path + ".tmp")
+            return None
+        os.replace(self.path + ".tmp", self.path)
+        table = {
+            "version": FRAME_TABLE_VERSION,
+            "codec": self.codec,
+            "frame_size": self.frame_size,
+            "size": self._size,
+            "frames": self.frames,
+        }
+        path = frame_table_path(self.path)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(table, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        return path
+
+def load_frame_table(path):
+    """
+    Loads the frame table of a compressed output file.
+
+    Args:
+        path (str): The compressed output path (not the table path).
+
+    Returns:
+        dict: {"version", "codec", "frame_size", "size", "frames"}.
+
+    Raises:
+        ValueError: If the table is missing, unreadable or of another version.
+    """
+    try:
+        with open(frame_table_path(path), "r", encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"No usable frame table for {path}: {e}") from e
+    if not isinstance(table, dict) or table.get("version") != FRAME_TABLE_VERSION:
+        raise ValueError(f"Unsupported frame table for {path}")
+    return table
+
+def read_range(path, offset, length, table=None):
+    """
+    Returns bytes of the uncompressed document, decompressing only the frames that hold them.
+
+    Args:
+        path (str): The compressed output path.
+        offset (int): Offset of the first byte in the uncompressed document.
+        length (int): Number of bytes to return (fewer at the end of the document).
+        table (dict): The frame table, if already loaded.
+
+    Returns:
+        bytes: The requested UTF-8 bytes.
+    """
+    if table is None:
+        table = load_frame_table(path)
+    frames = table["frames"]
+    end = min(offset + length, table["size"])
+    index = max(bisect_right([frame[2] for frame in frames], offset) - 1, 0)
+    parts = []
+    with open(path, "rb") as f:
+        while index < len(frames) and offset < end:
+            compressed_offset, compressed_length, frame_offset, frame_length = frames[index]
+            f.seek(compressed_offset)
+            data = _decompress(table["codec"], f.read(compressed_length))
+            parts.append(data[offset - frame_offset:end - frame_offset])
+            offset = frame_offset + frame_length
+            index += 1
+    return b"".join(parts)
@@ -6,15 +6,22 @@ text-based files. It provides comprehensive statistics about code volume and can
 for project analysis, metrics tracking, and complexity assessment.
 
 Key Features:
-- Recursively scans directories and subdirectories
-- Supports wide range of file types through CODE_EXTENSIONS
-- Uses progress bar (tqdm) for long-running operations
-- Handles encoding errors gracefully using safe_read utility
-- Returns both total counts and per-file breakdowns
+- Recursively scans directories and subdirectories, skipping exclude_patterns and files over
+  max_file_size from config.yaml
+- Supports wide range of file types through code_extensions()
+- Counts raw bytes as if decoded the way safe_read does (counting.py); binary, unreadable and
+  oversized files are skipped and summarized by reason after the scan
+- Thin view over the single-pass scan engine (scan.py); use scan.py to get line counts,
+  character counts and llms-full.txt from one read of every file
+- Returns both total counts and per-file breakdowns; the breakdown is a read-only mapping over
+  a columnar CountTable (count_table.py), a few dozen bytes per file
+- Totals per directory or extension (--by), the largest files (--top N), and a compact binary
+  file of the per-file counts (--save FILE)
 - Fast and memory-efficient processing
+- Optional profiling (--profile, --profile-json) of where the time goes (profiling.py)
 
 Usage:
-    python -m src.count_lines_of_code [directory_path]
+    python -m src.count_lines_of_code [directory_path] [--gitignore] [--profile] [--profile-json FILE]
 
 Output:
     Displays total lines of code and provides detailed file-by-file statistics
@@ -25,47 +32,87 @@ Example:
 
 import os
 import argparse
-from tqdm import tqdm
-from utils import CODE_EXTENSIONS, safe_read
+from scan import scan_tree, add_git_arguments, git_argument
+from utils import setup_logging, use_config
+# Archives, estimates, the count table reports and profiling are imported where they are used,
+# so that importing this module only loads the scan.
 
-def count_lines_of_code(directory):
+def count_lines_of_code(directory, honor_gitignore=False, profile=None, git=False):
     """
     Counts the lines of code in all text-based files within a directory (and its subdirectories).
 
     Args:
-        directory (str): The path to the directory to analyze.
+        directory (str): The path to the directory, or a tar or zip archive, to analyze.
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree.
+        profile (profiling.Profile): Collects per-phase timings, file statistics and skips.
+        git (bool or str): Count the files tracked in the git index, or those of a revision
+            (see scan.iter_scan).
 
     Returns:
-        tuple: (total_lines, file_counts)
+        tuple: (total_lines, file_counts), where file_counts maps each absolute path to its
+            line count (a count_table.CountView; its table attribute has the columns).
     """
     directory = os.path.abspath(directory)
     if not os.path.isdir(directory):
-        print(f"Error: Directory '{directory}' not found.")
-        return None
-
-    total_lines = 0
-    file_counts = {}
-
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(CODE_EXTENSIONS):
-                filepath = os.path.join(root, file)
-                content = safe_read(filepath)
-                if content is not None:
-                    lines = content.splitlines()
-                    line_count = len(lines)
-                    total_lines += line_count
-                    file_counts[filepath] = line_count
-
-    return total_lines, file_counts
-
-def main():
-    target_directory = input("Enter the directory path: ")
-    result = count_lines_of_code(target_directory)
+        from archive import is_archive
+
+        if not is_archive(directory):
+            print(f"Error: Directory '{directory}' not found.")
+            return None
+
+    result = scan_tree(directory, count_lines=True, count_chars=False, honor_gitignore=honor_gitignore,
+                       profile=profile, git=git)
+    if profile is not None:
+        profile.finish(result)
+    if result.skipped:
+        print(result.skip_summary())
+    return result.total_lines, result.line_counts
+
+def main(argv=None, prog=None, interactive=True):
+    """
+    Command-line entry point; also run by "llms count-lines".
+
+    Args:
+        argv (list): Arguments (default: sys.argv[1:]).
+        prog (str): Program name shown in usage and help.
+        interactive (bool): Prompt for the directory when it is not given; otherwise it is required.
+    """
+    parser = argparse.ArgumentParser(prog=prog, description="Count lines of code in a directory.")
+    parser.add_argument("directory", nargs="?" if interactive else None, help="Directory, or tar or zip archive, to analyze")
+    parser.add_argument("--gitignore", action="store_true", help="Skip paths ignored by .gitignore files")
+    import count_table
+    import estimate
+    import profiling
+
+    add_git_arguments(parser)
+    parser.add_argument("--config", help="Configuration file (default: config.yaml)")
+    count_table.add_arguments(parser)
+    estimate.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging()
+    if args.config:
+        use_config(args.config)
+
+    target_directory = args.directory or input("Enter the directory path: ")
+    if args.estimate:
+        print(f"\n--- Estimate for '{target_directory}' ---")
+        try:
+            result = estimate.from_arguments(target_directory, "lines", args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        estimate.report(result, "lines")
+        return
+    profile = profiling.from_arguments(args, "count_lines_of_code")
+    result = count_lines_of_code(target_directory, honor_gitignore=args.gitignore, profile=profile,
+                                 git=git_argument(args))
     if result:
-        total_lines, _ = result
+        total_lines, counts = result
         print(f"\n--- Line Counts for '{target_directory}' ---")
         print(f"Total Lines of Code: {total_lines}")
+        count_table.report(counts.table, "lines", args)
+        profiling.report(profile, args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,333 @@
+"""
+Columnar Count Table
+
+This module holds the per-file line and character counts of a scan in columns instead of one
+dictionary entry per path, so that a tree of millions of files costs a few dozen bytes per file
+instead of several hundred. It also answers the usual questions about the counts (which
+directories, which extensions, which files are largest) without rebuilding path dictionaries.
+
+Key Features:
+- Directories are stored once each in an interned table; every row keeps an index into it
+- File names are packed into one UTF-8 buffer, each followed by "/" (which a name cannot
+  contain), with an array of end offsets
+- Line and character counts are array-backed columns; a count that was not taken is -1
+- Dict-like, read-only views (CountTable.view) keep the "path -> count" interface of the old
+  result dictionaries; looking up a single path builds a lookup index on first use
+- Aggregation by directory (optionally including subdirectories), by extension, and top-N
+- A compact binary file format (save/load): a small JSON header with the directory table,
+  followed by the raw columns
+
+Usage:
+    from count_table import CountTable
+
+    table = CountTable()
+    table.add("/repo/src/app.py", lines=120, chars=4096)
+    table.by_extension("lines")      # {".py": 120}
+    table.top(10, "chars")           # [("/repo/src/app.py", 4096)]
+    table.save("counts.bin")
+
+    python src/count_lines_of_code.py /path/to/project --by extension --top 20 --save counts.bin
+"""
+
+import os
+import sys
+import json
+import heapq
+import struct
+from array import array
+from collections.abc import Mapping, ItemsView, ValuesView
+
+COLUMNS = ("lines", "chars")
+
+_MAGIC = b"LLMSCNT1"
+_HEADER_SIZE = struct.Struct("<I")
+# Column name -> array type code, in the order they are written to disk.
+_LAYOUT = (("directory", "I"), ("name_end", "Q"), ("lines", "q"), ("chars", "q"))
+
+class CountTable:
+    """
+    Per-file line and character counts stored in columns.
+
+    Attributes:
+        directories (list): The directory of each distinct directory index.
+        directory (array): Directory index of every row.
+        lines (array): Line count of every row, or -1 if lines were not counted.
+        chars (array): Character count of every row, or -1 if characters were not counted.
+    """
+
+    def __init__(self):
+        self.directories = []
+        self.directory = array("I")
+        self.lines = array("q")
+        self.chars = array("q")
+        self._directory_ids = {}
+        self._names = bytearray()
+        self._name_ends = array("Q")
+        self._sizes = dict.fromkeys(COLUMNS, 0)
+        self._rows = None
+
+    def __len__(self):
+        return len(self.directory)
+
+    def add(self, path, lines=None, chars=None):
+        """
+        Appends a file's counts.
+
+        Args:
+            path (str): The file's path.
+            lines (int): Its line count, if counted.
+            chars (int): Its character count, if counted.
+        """
+        directory, name = os.path.split(path)
+        index = self._directory_ids.get(directory)
+        if index is None:
+            index = self._directory_ids[directory] = len(self.directories)
+            self.directories.append(directory)
+        if self._rows is not None:
+            self._rows[index, name] = len(self.directory)
+        self.directory.append(index)
+        self._names += name.encode("utf-8", "surrogateescape")
+        self._name_ends.append(len(self._names))
+        self._names += b"/"
+        self.lines.append(-1 if lines is None else lines)
+        self.chars.append(-1 if chars is None else chars)
+        if lines is not None:
+            self._sizes["lines"] += 1
+        if chars is not None:
+            self._sizes["chars"] += 1
+
+    def name(self, row):
+        """
+        Returns the file name of a row.
+        """
+        start = self._name_ends[row - 1] + 1 if row else 0
+        return self._names[start:self._name_ends[row]].decode("utf-8", "surrogateescape")
+
+    def path(self, row):
+        """
+        Returns the path of a row, as it was added.
+        """
+        return os.path.join(self.directories[self.directory[row]], self.name(row))
+
+    def row(self, path):
+        """
+        Returns the row of a path, or None. The first call builds the lookup index.
+        """
+        if self._rows is None:
+            self._rows = {(self.directory[row], self.name(row)): row for row in range(len(self))}
+        directory, name = os.path.split(path)
+        index = self._directory_ids.get(directory)
+        return None if index is None else self._rows.get((index, name))
+
+    def size(self, column):
+        """
+        Returns the number of rows that have a value in column.
+        """
+        return self._sizes[column]
+
+    def items(self, column):
+        """
+        Yields (path, count) for every row that has a value in column, in the order added.
+        """
+        values = getattr(self, column)
+        for row, value in enumerate(values):
+            if value >= 0:
+                yield self.path(row), value
+
+    def view(self, column):
+        """
+        Returns a read-only dict-like view of column: path -> count.
+        """
+        return CountView(self, column)
+
+    def by_directory(self, column="lines", recursive=False):
+        """
+        Sums a column per directory.
+
+        Args:
+            column (str): "lines" or "chars".
+            recursive (bool): Include the files of subdirectories in each directory's total,
+                for every directory from the common root of the table down.
+
+        Returns:
+            dict: Directory -> total, for directories with at least one counted file.
+        """
+        totals = [0] * len(self.directories)
+        counted = [False] * len(self.directories)
+        for index, value in zip(self.directory, getattr(self, column)):
+            if value >= 0:
+                totals[index] += value
+                counted[index] = True
+        direct = {self.directories[index]: total for index, total in enumerate(totals) if counted[index]}
+        if not recursive or not direct:
+            return direct
+        root = os.path.commonpath(list(direct)) if len(direct) > 1 else next(iter(direct))
+        result = {}
+        for directory, total in direct.items():
+            while True:
+                result[directory] = result.get(directory, 0) + total
+                if directory == root or len(directory) <= len(root):
+                    break
+                directory = os.path.dirname(directory)
+        return result
+
+    def by_extension(self, column="lines"):
+        """
+        Sums a column per lower-cased file extension ("" for files without one).
+
+        Returns:
+            dict: Extension -> total.
+        """
+        totals = {}
+        for name, value in zip(bytes(self._names).split(b"/"), getattr(self, column)):
+            if value >= 0:
+                # Leading dots (".bashrc") are part of the name, as for os.path.splitext.
+                _, dot, extension = name.lstrip(b".").rpartition(b".")
+                extension = dot + extension if dot else b""
+                totals[extension] = totals.get(extension, 0) + value
+        result = {}
+        for extension, total in totals.items():
+            key = extension.decode("utf-8", "surrogateescape").lower()
+            result[key] = result.get(key, 0) + total
+        return result
+
+    def top(self, n, column="lines"):
+        """
+        Returns the n rows with the largest values of a column.
+
+        Returns:
+            list: (path, count) pairs, largest first; ties keep the order added.
+        """
+        values = getattr(self, column)
+        rows = heapq.nlargest(n, range(len(values)), key=values.__getitem__)
+        return [(self.path(row), values[row]) for row in rows if values[row] >= 0]
+
+    def save(self, path):
+        """
+        Writes the table to a file, atomically (through "<path>.tmp").
+        """
+        header = json.dumps({"rows": len(self), "directories": self.directories, "names": len(self._names),
+                             "sizes": self._sizes}, ensure_ascii=False).encode("utf-8", "surrogateescape")
+        with open(path + ".tmp", "wb") as f:
+            f.write(_MAGIC)
+            f.write(_HEADER_SIZE.pack(len(header)))
+            f.write(header)
+            for name, _ in _LAYOUT:
+                _write_array(f, self._name_ends if name == "name_end" else getattr(self, name))
+            f.write(self._names)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a table written by save().
+
+        Raises:
+            ValueError: If the file is not a count table.
+        """
+        table = cls()
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a count table")
+            (length,) = _HEADER_SIZE.unpack(f.read(_HEADER_SIZE.size))
+            header = json.loads(f.read(length).decode("utf-8", "surrogateescape"))
+            for name, typecode in _LAYOUT:
+                values = _read_array(f, typecode, header["rows"])
+                if name == "name_end":
+                    table._name_ends = values
+                else:
+                    setattr(table, name, values)
+            table._names = bytearray(f.read(header["names"]))
+        table.directories = header["directories"]
+        table._directory_ids = {directory: index for index, directory in enumerate(table.directories)}
+        table._sizes = header["sizes"]
+        return table
+
+def _write_array(f, values):
+    # Columns are stored little-endian, whatever the machine.
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(f)
+
+def _read_array(f, typecode, count):
+    values = array(typecode)
+    values.fromfile(f, count)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+def add_arguments(parser):
+    """
+    Adds the --top, --by and --save options of the counting scripts to an argument parser.
+    """
+    parser.add_argument("--top", type=int, metavar="N", help="List the N largest files")
+    parser.add_argument("--by", choices=("directory", "extension"), help="Print totals per directory or extension")
+    parser.add_argument("--save", metavar="FILE", help="Write the per-file counts to FILE as a count table")
+
+def report(table, column, args):
+    """
+    Prints the reports requested with the options from add_arguments and saves the table.
+
+    Args:
+        table (CountTable): The counts.
+        column (str): "lines" or "chars".
+        args (argparse.Namespace): Parsed arguments.
+    """
+    if args.by:
+        totals = table.by_directory(column) if args.by == "directory" else table.by_extension(column)
+        print(f"\n--- {column.capitalize()} by {args.by} ---")
+        for key, total in sorted(totals.items(), key=lambda item: (-item[1], item[0])):
+            print(f"{total:>12}  {key or '(none)'}")
+    if args.top:
+        print(f"\n--- Largest {args.top} files by {column} ---")
+        for path, value in table.top(args.top, column):
+            print(f"{value:>12}  {path}")
+    if args.save:
+        table.save(args.save)
+        print(f"Saved counts of {table.size(column)} files to {args.save}")
+
+class CountView(Mapping):
+    """
+    Read-only mapping of path -> count over one column of a CountTable.
+
+    Attributes:
+        table (CountTable): The table viewed.
+    """
+
+    def __init__(self, table, column):
+        self.table = table
+        self._column = column
+
+    def __getitem__(self, path):
+        row = self.table.row(path)
+        value = -1 if row is None else getattr(self.table, self._column)[row]
+        if value < 0:
+            raise KeyError(path)
+        return value
+
+    def __iter__(self):
+        for path, _ in self.table.items(self._column):
+            yield path
+
+    def __len__(self):
+        return self.table.size(self._column)
+
+    def __repr__(self):
+        return f"CountView({dict(self.items())!r})"
+
+    def items(self):
+        return _CountItems(self)
+
+    def values(self):
+        return _CountValues(self)
+
+class _CountItems(ItemsView):
+    # Iterates the column directly instead of looking every path up again.
+
+    def __iter__(self):
+        return self._mapping.table.items(self._mapping._column)
+
+class _CountValues(ValuesView):
+    def __iter__(self):
+        return (value for value in getattr(self._mapping.table, self._mapping._column) if value >= 0)
@@ -0,0 +1,183 @@
+"""
+Byte-Level Line and Character Counting
+
+This module counts lines and characters directly on raw file bytes, without decoding files into
+strings or splitting them into lists of lines. The results are identical to decoding the file
+the way safe_read does (UTF-8, falling back to Latin-1, with newline translation) and then taking
+len(content.splitlines()) and len(content).
+
+Key Features:
+- Files are read in fixed-size blocks, so memory stays constant per file
+- Line breaks are counted with bytes.count(); rare break characters are first checked with a
+  memchr-based "in" test, so typical code costs one counting pass plus a few quick scans
+- Pure-ASCII blocks (the common case for code) are counted without any decoding
+- UTF-8 and Latin-1 counts are gathered in the same pass, so a file that turns out not to be
+  UTF-8 is never read a second time
+- "\\r\\n" pairs and multi-byte sequences split across block boundaries are handled by carrying at
+  most a few bytes into the next block
+- Binary files are recognised from their first block (utils.is_binary) and skipped
+
+Usage:
+    from counting import count_file, count_buffer
+
+    lines, chars = count_file("src/utils.py")
+"""
+
+from utils import is_binary, report_skip, SKIP_BINARY, SKIP_UNREADABLE
+
+# Byte sequences str.splitlines() treats as line boundaries, besides "\n" and "\r" which newline
+# translation folds together.
+_ASCII_BREAKS = (b"\v", b"\f", b"\x1c", b"\x1d", b"\x1e")
+_UTF8_BREAKS = ("\x85", "\u2028", "\u2029")
+_LINE_BREAK_CHARS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+_LATIN1_BREAK_CHARS = "\n\r\v\f\x1c\x1d\x1e\x85"
+
+BLOCK_SIZE = 1 << 20
+
+class ByteCounter:
+    """
+    Incremental line and character counter fed with consecutive blocks of raw file bytes.
+
+    Blocks may be cut anywhere; feed() keeps back an incomplete trailing UTF-8 sequence or a
+    trailing "\\r" and counts it with the next block.
+    """
+
+    def __init__(self):
+        self.utf8 = True
+        self.newlines = 0         # "\n" and "\r" bytes, before subtracting "\r\n" pairs
+        self.crlf = 0
+        self.ascii_breaks = 0
+        self.utf8_chars = 0
+        self.utf8_breaks = 0      # U+0085, U+2028 and U+2029 when decoded as UTF-8
+        self.latin1_nel = 0       # \x85 bytes, a line break when decoded as Latin-1
+        self.size = 0
+        self.tail = b""
+        self._carry = b""
+
+    def feed(self, block, final=False):
+        data = self._carry + bytes(block) if self._carry else bytes(block)
+        cut = len(data)
+        if not final and cut:
+            # Step back over an incomplete UTF-8 sequence and a trailing "\r".
+            start = max(cut - 3, 0)
+            for i in range(cut - 1, start - 1, -1):
+                byte = data[i]
+                if byte < 0x80:
+                    break
+                if byte >= 0xC0:
+                    cut = i
+                    break
+            if cut and data[cut - 1] == 0x0D:
+                cut -= 1
+        self._carry = data[cut:]
+        if cut < len(data):
+            data = data[:cut]
+        if data:
+            self._count(data)
+
+    def _count(self, data):
+        self.size += len(data)
+        self.tail = (self.tail + data)[-4:]
+        self.newlines += data.count(b"\n")
+        if b"\r" in data:
+            self.newlines += data.count(b"\r")
+            self.crlf += data.count(b"\r\n")
+        for byte in _ASCII_BREAKS:
+            if byte in data:
+                self.ascii_breaks += data.count(byte)
+        if data.isascii():
+            self.utf8_chars += len(data)
+            return
+        if b"\x85" in data:
+            self.latin1_nel += data.count(b"\x85")
+        if self.utf8:
+            try:
+                text = data.decode("utf-8")
+            except UnicodeDecodeError:
+                self.utf8 = False
+                return
+            self.utf8_chars += len(text)
+            for char in _UTF8_BREAKS:
+                if char in text:
+                    self.utf8_breaks += text.count(char)
+
+    def result(self):
+        """
+        Finishes counting and returns (lines, chars) as safe_read + splitlines() would.
+
+        Returns:
+            tuple: (lines, chars)
+        """
+        if self._carry:
+            self.feed(b"", final=True)
+        if self.utf8:
+            # The tail may start inside a sequence, but always ends with a complete character.
+            last = self.tail.decode("utf-8", "ignore")[-1:]
+            chars = self.utf8_chars - self.crlf
+            breaks = self.newlines - self.crlf + self.ascii_breaks + self.utf8_breaks
+            break_chars = _LINE_BREAK_CHARS
+        else:
+            last = self.tail[-1:].decode("latin-1")
+            chars = self.size - self.crlf
+            breaks = self.newlines - self.crlf + self.ascii_breaks + self.latin1_nel
+            break_chars = _LATIN1_BREAK_CHARS
+        lines = breaks + (1 if last and last not in break_chars else 0)
+        return lines, chars
+
+def count_buffer(data):
+    """
+    Counts lines and characters of a complete in-memory file.
+
+    Args:
+        data (bytes): The raw file content.
+
+    Returns:
+        tuple: (lines, chars)
+    """
+    if data.isascii() and b"\r" not in data and not any(byte in data for byte in _ASCII_BREAKS):
+        # Plain ASCII text with "\n" line endings: every byte is a character.
+        lines = data.count(b"\n")
+        if data and data[-1] != 0x0A:
+            lines += 1
+        return lines, len(data)
+    counter = ByteCounter()
+    counter.feed(data, final=True)
+    return counter.result()
+
+def _open_unbuffered(filepath):
+    return open(filepath, "rb", buffering=0)
+
+def count_file(filepath, block_size=BLOCK_SIZE, size=None, on_skip=None, opener=None):
+    """
+    Counts lines and characters of a file in fixed-size blocks.
+
+    Args:
+        filepath (str): The path to the file.
+        block_size (int): Number of bytes read per block.
+        size (int): File size if already known; files that fit in one block are read whole.
+        on_skip (callable): Called with a utils.SkippedFile if the file is skipped.
+        opener (callable): Opens filepath as a binary file object (default: the file system,
+            unbuffered); see utils.read_bytes().
+
+    Returns:
+        tuple or None: (lines, chars), or None if the file is binary or could not be read.
+    """
+    counter = ByteCounter()
+    try:
+        with (opener or _open_unbuffered)(filepath) as f:
+            if size is not None and size < block_size:
+                block = f.read()
+            else:
+                block = f.read(block_size)
+            if is_binary(block):
+                report_skip(on_skip, filepath, SKIP_BINARY)
+                return None
+            if size is not None and size < block_size:
+                return count_buffer(block)
+            while block:
+                counter.feed(block)
+                block = f.read(block_size)
+    except Exception as e:
+        report_skip(on_skip, filepath, SKIP_UNREADABLE, str(e))
+        return None
+    return counter.result()
@@ -0,0 +1,287 @@
+"""
+Sampling-Based Count Estimation
+
+This module estimates the total lines and characters of a tree from a sample of its files, for
+when approximate totals are enough and reading every byte is not worth it. Only file metadata
+is collected for the whole tree; file contents are read for a stratified random sample, and the
+totals are extrapolated with confidence intervals.
+
+Key Features:
+- Metadata-only walk: the same files as count_lines_of_code and count_characters, with the same
+  exclusions and size limit, but only their sizes are looked at
+- Strata by extension and size bucket (powers of four); lines and characters are estimated per
+  stratum as a ratio to the stratum's bytes, which tracks them far more closely than a per-file
+  mean
+- Adaptive allocation: after a small pilot sample per stratum, further reads go to the strata
+  where one more file removes the most variance per byte read, until the confidence interval
+  is within the target error or the time budget runs out
+- Strata whose variance stays high are counted exactly: once a stratum would need most of its
+  files sampled, the rest are read as well, and small strata are always counted in full
+- Deterministic for a given seed
+
+Usage:
+    python src/count_lines_of_code.py /path/to/tree --estimate --target-error 0.01
+    python src/count_chars_of_code.py /path/to/tree --estimate --time-budget 30
+
+    from estimate import estimate_counts
+
+    result = estimate_counts("/path/to/tree", target_error=0.02)
+    print(result.lines.estimate, result.lines.low, result.lines.high)
+"""
+
+import os
+import heapq
+import random
+from time import perf_counter
+from collections import namedtuple
+import scan
+
+# Files read from every stratum before allocating the rest; strata this small are read in full.
+PILOT_SIZE = 3
+
+# Files read in total before the confidence interval is trusted: variance estimates from a
+# handful of files per stratum are too optimistic about skewed content.
+MIN_SAMPLE = 400
+
+# A stratum that would need more than this fraction of its files sampled is counted exactly.
+EXACT_FRACTION = 0.5
+
+# Fixed cost of reading a file, in bytes, when comparing the cost of reads across strata.
+READ_OVERHEAD = 4096
+
+# Estimated total with the bounds of its confidence interval.
+Interval = namedtuple("Interval", ["estimate", "low", "high"])
+
+# Result of estimate_counts. lines, chars and files (files that would be counted, i.e. not
+# binary or unreadable) are Intervals; total_files and total_bytes describe the whole
+# population; files_read and bytes_read the sample; exact_strata is the number of strata
+# counted in full out of strata.
+CountEstimate = namedtuple("CountEstimate", ["lines", "chars", "files", "total_files", "total_bytes",
+                                             "files_read", "bytes_read", "strata", "exact_strata",
+                                             "confidence", "seconds"])
+
+# Indices of the sampled values of a file.
+_LINES, _CHARS, _COUNTED = range(3)
+
+def size_bucket(size):
+    """
+    Returns the size bucket of a file: 0 for empty files, then one bucket per power of four.
+    """
+    return (size.bit_length() + 1) // 2
+
+class _Stratum:
+    # The files of one (extension, size bucket) and running sums over the sample read from them,
+    # so that estimates cost the same however large the sample grows.
+
+    def __init__(self, key, files):
+        self.key = key
+        self.files = files          # (path, size), shuffled; files[:read] have been read
+        self.read = 0
+        self.bytes = sum(size for _, size in files)
+        self.sample_bytes = 0
+        self.sample_squares = 0     # sum of size * size
+        self.sums = [[0, 0, 0] for _ in range(3)]   # per value: sum of y, y * y, y * size
+
+    @property
+    def exact(self):
+        return self.read == len(self.files)
+
+    def add(self, size, values):
+        self.sample_bytes += size
+        self.sample_squares += size * size
+        for sums, value in zip(self.sums, values):
+            sums[0] += value
+            sums[1] += value * value
+            sums[2] += value * size
+
+    def estimate(self, column):
+        # (estimate, variance) of the stratum total of a column: by ratio to bytes for lines and
+        # characters, by the mean per file for the number of counted files (or when the sample
+        # holds no bytes, i.e. empty files).
+        n, population = self.read, len(self.files)
+        total, squares, products = self.sums[column]
+        if self.exact:
+            return float(total), 0.0
+        if self.sample_bytes and column != _COUNTED:
+            ratio = total / self.sample_bytes
+            residual = squares - 2 * ratio * products + ratio * ratio * self.sample_squares
+            estimate = ratio * self.bytes
+            typical = ratio * self.sample_bytes / n
+        else:
+            residual = squares - total * total / n
+            estimate = total / n * population
+            typical = total / n
+        if n < 2:
+            return estimate, float("inf")
+        # A sample in which every file has the same ratio (plain ASCII, say) would claim no
+        # variance at all, although files that are skipped (binary) or decode differently may
+        # simply not have been drawn yet. One pseudo-file of typical size that counts as zero
+        # keeps the interval honest about that.
+        spread = (max(residual, 0.0) + typical * typical) / n
+        return estimate, population * population * (1 - n / population) / n * spread
+
+    def gain(self, columns):
+        # Variance removed by reading one more file, per byte it is expected to cost.
+        n, population = self.read, len(self.files)
+        if self.exact:
+            return 0.0
+        variance = sum(self.estimate(column)[1] for column in columns)
+        if variance == float("inf"):
+            return variance
+        # V(n) is proportional to (1/n - 1/N); one more file lowers it by this fraction.
+        reduction = variance * (1 / n - 1 / (n + 1)) / (1 / n - 1 / population)
+        return reduction / (self.bytes / population + READ_OVERHEAD)
+
+def _read(stratum, count, on_skip):
+    # Reads the stratum's next file with count (a counting.count_file) and adds it to the
+    # sample; returns its size.
+    path, size = stratum.files[stratum.read]
+    stratum.read += 1
+    counted = count(path, size=size, on_skip=on_skip)
+    stratum.add(size, (counted[0], counted[1], 1) if counted is not None else (0, 0, 0))
+    return size
+
+def estimate_counts(directory, target_error=0.01, time_budget=None, confidence=0.95, columns=("lines", "chars"),
+                    honor_gitignore=False, seed=0, on_skip=None, git=False):
+    """
+    Estimates the total lines and characters of the files count_lines_of_code would count.
+
+    Args:
+        directory (str): The root directory, or a zip or uncompressed tar archive.
+        target_error (float): Stop once the confidence interval of every column in columns is
+            within this fraction of its estimate (default: 0.01, i.e. +-1%).
+        time_budget (float): Stop after about this many seconds of reading, whatever the error.
+        confidence (float): Confidence level of the intervals (default: 0.95).
+        columns (sequence): Which totals the target error applies to: "lines" and/or "chars".
+            Both are always estimated.
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree.
+        seed (int): Seed of the random sample.
+        on_skip (callable): Called with a utils.SkippedFile for each file skipped while walking
+            or reading.
+        git (bool or str): Sample the files tracked in the git index, or those of a revision
+            (see scan.iter_scan).
+
+    Returns:
+        CountEstimate: The estimates and what was read to make them.
+
+    Raises:
+        ValueError: If the source cannot be opened (see scan.open_source), or is a compressed
+            tar archive, whose members can only be read in order.
+    """
+    from statistics import NormalDist
+
+    start = perf_counter()
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    columns = [{"lines": _LINES, "chars": _CHARS}[column] for column in columns]
+    source, ops, _ = scan.open_source(directory, git)
+    try:
+        if getattr(source, "sequential", False):
+            raise ValueError(f"Cannot sample {directory}: a compressed tar archive can only be read "
+                             f"in order; count it exactly instead")
+        return _estimate(directory, target_error, time_budget, confidence, z, columns, honor_gitignore, seed,
+                         on_skip, source, ops.count_file, start)
+    finally:
+        if source is not None:
+            source.close()
+
+# The body of estimate_counts, run while the source (if any) is open.
+def _estimate(directory, target_error, time_budget, confidence, z, columns, honor_gitignore, seed, on_skip,
+              source, count, start):
+    _, counted, stats = scan.collect(directory, (), True, honor_gitignore, on_skip, source=source)
+
+    by_key = {}
+    # Files are read by the path the walk gave them, which the source also knows them by.
+    for path in counted:
+        size = stats[path].st_size if stats.get(path) is not None else 0
+        extension = os.path.splitext(path)[1].lower()
+        by_key.setdefault((extension, size_bucket(size)), []).append((path, size))
+    rng = random.Random(seed)
+    strata = []
+    for key in sorted(by_key):
+        files = sorted(by_key[key])
+        rng.shuffle(files)
+        strata.append(_Stratum(key, files))
+
+    bytes_read = 0
+    for stratum in strata:
+        for _ in range(min(PILOT_SIZE, len(stratum.files))):
+            bytes_read += _read(stratum, count, on_skip)
+
+    def totals():
+        results = []
+        for column in (_LINES, _CHARS, _COUNTED):
+            estimate = variance = 0.0
+            for stratum in strata:
+                total, spread = stratum.estimate(column)
+                estimate += total
+                variance += spread
+            results.append((estimate, z * variance ** 0.5))
+        return results
+
+    while True:
+        results = totals()
+        files_read = sum(stratum.read for stratum in strata)
+        if files_read >= MIN_SAMPLE and all(half_width <= target_error * estimate
+                                            for estimate, half_width in (results[c] for c in columns)):
+            break
+        if time_budget is not None and perf_counter() - start >= time_budget:
+            break
+        # Read a batch of files from the strata with the best variance reduction per byte.
+        batch = max(16, files_read // 10)
+        heap = [(-stratum.gain(columns), index) for index, stratum in enumerate(strata) if not stratum.exact]
+        if not heap:
+            break
+        heapq.heapify(heap)
+        for _ in range(batch):
+            if not heap or (time_budget is not None and perf_counter() - start >= time_budget):
+                break
+            _, index = heapq.heappop(heap)
+            stratum = strata[index]
+            if stratum.read + 1 > EXACT_FRACTION * len(stratum.files):
+                # Sampling most of it would cost nearly as much as counting it.
+                while not stratum.exact:
+                    bytes_read += _read(stratum, count, on_skip)
+                continue
+            bytes_read += _read(stratum, count, on_skip)
+            heapq.heappush(heap, (-stratum.gain(columns), index))
+
+    intervals = [Interval(round(estimate), max(0, round(estimate - half_width)), round(estimate + half_width))
+                 for estimate, half_width in results]
+    return CountEstimate(*intervals, sum(len(stratum.files) for stratum in strata),
+                         sum(stratum.bytes for stratum in strata), sum(stratum.read for stratum in strata),
+                         bytes_read, len(strata), sum(stratum.exact for stratum in strata), confidence,
+                         perf_counter() - start)
+
+def add_arguments(parser):
+    """
+    Adds the estimation options of the counting scripts to an argument parser.
+    """
+    group = parser.add_argument_group("estimation")
+    group.add_argument("--estimate", action="store_true",
+                       help="Estimate the totals from a stratified sample of files instead of reading all")
+    group.add_argument("--target-error", type=float, default=0.01,
+                       help="Relative half-width of the confidence interval to reach (default: 0.01)")
+    group.add_argument("--time-budget", type=float, help="Stop sampling after this many seconds")
+    group.add_argument("--confidence", type=float, default=0.95, help="Confidence level (default: 0.95)")
+    group.add_argument("--seed", type=int, default=0, help="Seed of the random sample (default: 0)")
+
+def from_arguments(directory, column, args):
+    """
+    Runs estimate_counts with the options from add_arguments, for the given column; the source
+    options (--git, --git-rev) and --gitignore are taken from args when the parser has them.
+    """
+    return estimate_counts(directory, args.target_error, args.time_budget, args.confidence, (column,),
+                           honor_gitignore=getattr(args, "gitignore", False), seed=args.seed,
+                           git=scan.git_argument(args) if hasattr(args, "git") else False)
+
+def report(result, column):
+    """
+    Prints an estimate of one column with its interval and what was read.
+    """
+    interval = getattr(result, column)
+    error = (interval.high - interval.estimate) / interval.estimate if interval.estimate else 0.0
+    print(f"Estimated total {column}: {interval.estimate} "
+          f"({interval.low}-{interval.high}, +-{error:.2%} at {result.confidence:.0%} confidence)")
+    print(f"Read {result.files_read} of {result.total_files} files "
+          f"({result.bytes_read} of {result.total_bytes} bytes) in {result.seconds:.2f}s; "
+          f"{result.exact_strata} of {result.strata} strata counted exactly")
@@ -7,97 +7,670 @@ documentation and code in a structured format.
 
 Key Features:
 - Scans directories recursively for Markdown and text files
-- Extracts titles and summaries from Markdown files automatically
+- Extracts titles and summaries from Markdown files automatically, including YAML front matter,
+  from a bounded prefix of each file (metadata.py); large Markdown files are streamed
 - Organizes content into structured sections for easy AI parsing
 - Handles various file types including Python, JavaScript, HTML, and more
 - Provides robust error handling for encoding issues
+- Optionally reads and formats files on a thread pool (--workers) while keeping the output
+  byte-identical to a serial run
+- Streaming API (iter_sections) that can feed any sink: a file, stdout, a socket or a buffer
+- Large code files are copied through in fixed-size chunks instead of being loaded whole
+- Optional manifest cache (--cache) so repeated runs only re-read files that changed
+- Built on the single-pass scan engine (scan.py), so line and character counts can be collected
+  in the same pass (--count-lines, --count-chars)
+- Optional deduplication (--dedup): files identical to an earlier file are emitted once, and
+  later copies become a short reference section naming the file they duplicate
+- Optional gzip or xz output (--compress, or a .gz/.xz output name), written while streaming in
+  independently decompressible frames with a frame table next to it (compression.py)
+- Optional section index (--index) mapping every section to its byte range, for random access
+  with section_index.SectionReader
+- Optional table of contents (--toc) at the top of the file, collected from the sections while
+  they are written; headings inside code blocks are left out (generate_toc.py)
+- Optional profiling (--profile, --profile-json): time per phase, bytes, slowest and largest
+  files (profiling.py)
+- Optional token-budget sharding (--max-tokens) into llms-full.001.txt, llms-full.002.txt, ...
+  with an index file, using a built-in offline token estimator (shards.py)
+- Optional compaction of code sections (--compact): license headers, comments, blank-line runs,
+  trailing whitespace and Python docstrings, per language, with a report of what it saved
+  (compact.py)
+- Optional relevance ranking (--rank) and budget-constrained selection (--budget N): files are
+  emitted most relevant first, and only the most useful set that fits the budget (rank.py)
+- Optional JSONL chunk export (--chunks) for retrieval and embedding pipelines: overlapping
+  windows of whole lines with their byte ranges and hashes, cut while the document is written
+  (chunk_export.py)
 
 Usage:
-    python -m src.generate_llms [directory] [output_file]
+    python -m src.generate_llms [directory] [-o output_file|-] [--workers N] [--max-tokens N]
 
 Example:
-    python -m src.generate_llms /path/to/project llms-full.txt
+    python -m src.generate_llms /path/to/project -o llms-full.txt --workers 8
 """
 
 import os
-import re
+import sys
+import shutil
 import argparse
-from utils import safe_read
+from contextlib import contextmanager
+from functools import partial
+from itertools import chain
+from utils import (safe_read, detect_encoding, iter_text_chunks, strip_chunks, text_extensions,
+                   setup_logging, use_config)
+from shards import ShardWriter
+from compression import FramedWriter, codec_for, FRAME_SIZE
+from section_index import SectionIndex, index_path
+from metadata import extract_metadata, body_slices, read_prefix
+import scan
+from scan import Section, SectionGroup
+# The optional features (the cache, ranking, compaction, chunks, the table of contents and
+# profiling) are imported where they are used, so that importing this module stays cheap; the
+# chunk_size and chunk_overlap defaults repeat chunk_export.DEFAULT_SIZE and DEFAULT_OVERLAP.
 
-def generate_llms_full(directory, output_file="llms-full.txt"):
+MARKDOWN_EXTENSION = ".md"
+OTHER_TEXT_EXTENSIONS = (".txt", ".py", ".js", ".html", ".sh", ".rs", ".toml")
+
+def other_text_extensions():
     """
-    Generates a llms-full.txt file from a directory structure, including Markdown files and other text files.
+    Returns the extensions rendered as code sections: OTHER_TEXT_EXTENSIONS plus the
+    text_extensions from the configuration that are not Markdown.
+    """
+    return OTHER_TEXT_EXTENSIONS + tuple(ext for ext in text_extensions()
+                                         if ext != MARKDOWN_EXTENSION and ext not in OTHER_TEXT_EXTENSIONS)
+
+MARKDOWN_HEADING = (
+    "# Project Documentation (Markdown Files)\n"
+    "> Comprehensive documentation of the project in Markdown format.\n\n"
+)
+CODE_HEADING = (
+    "# Code and Other Files\n"
+    "> Code snippets, scripts, and other relevant text files.\n\n"
+)
+
+TOC_TITLE = "Table of Contents"
+TOC_HEADING = (
+    f"# {TOC_TITLE}\n"
+    "> Links to every heading in this file.\n\n"
+)
+
+# Bump when the rendered format changes so that existing manifest caches are discarded.
+RENDER_VERSION = 3
+
+def collect_files(directory, honor_gitignore=False):
+    """
+    Walks a directory and returns the sorted Markdown files and other text files in it.
+
+    Args:
+        directory (str): The root directory to scan.
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree.
+
+    Returns:
+        tuple: (markdown_files, other_text_files), each a sorted list of paths.
+    """
+    (markdown_files, other_text_files), _, _ = scan.collect(directory, _section_groups(),
+                                                           honor_gitignore=honor_gitignore)
+    return markdown_files, other_text_files
+
+def render_markdown_section(filepath):
+    """
+    Reads a Markdown file and renders its llms-full.txt section.
+
+    Args:
+        filepath (str): Path to the Markdown file.
+
+    Returns:
+        Section or None: The rendered section, or None if the file could not be read.
+    """
+    content = safe_read(filepath)
+    if content is None:
+        return None
+    return render_markdown(filepath, content)
+
+def render_markdown(filepath, content):
+    """
+    Renders the llms-full.txt section of a Markdown file from its content.
+
+    Args:
+        filepath (str): Path to the Markdown file.
+        content (str): The decoded file content.
+
+    Returns:
+        Section: The rendered section.
+    """
+    meta = extract_metadata(content)
+    title, header = _markdown_header(filepath, meta)
+    # The title, summary and front matter are written above; the body is the rest of the
+    # original text, in slices around them.
+    return Section("markdown", filepath, title, (header, *body_slices(content, meta.removed), "\n\n"),
+                   meta.summary)
+
+def _markdown_header(filepath, meta):
+    # The section title, derived from the file name if the document has none, and its header.
+    title = meta.title or os.path.basename(filepath).replace(".md", "").replace("_", " ").title()
+    summary = f"> {meta.summary}" if meta.summary else f"> Content from: {filepath}"
+    return title, f"## {title}\n{summary}\n\n"
+
+def render_code_section(filepath):
+    """
+    Reads a code or other text file and renders its llms-full.txt section.
+
+    Files larger than scan.STREAM_THRESHOLD are not read here: only their encoding is checked, and
+    the returned section reads the file lazily in scan.CHUNK_SIZE pieces when its chunks are consumed.
+
+    Args:
+        filepath (str): Path to the file.
+
+    Returns:
+        Section or None: The rendered section, or None if the file could not be read.
+    """
+    try:
+        size = os.path.getsize(filepath)
+    except OSError:
+        size = 0
+    if size > scan.STREAM_THRESHOLD:
+        encoding = detect_encoding(filepath, scan.CHUNK_SIZE)
+        if encoding is None:
+            return None
+        return render_code_stream(filepath, iter_text_chunks(filepath, encoding, scan.CHUNK_SIZE))
+
+    content = safe_read(filepath)
+    if content is None:
+        return None
+    return render_code(filepath, content)
+
+def render_code(filepath, content):
+    """
+    Renders the llms-full.txt section of a code or other text file from its content.
+
+    Args:
+        filepath (str): Path to the file.
+        content (str): The decoded file content.
+
+    Returns:
+        Section: The rendered section.
+    """
+    title = os.path.basename(filepath)
+    header = f"## {title}\n> File: {filepath}\n\n```\n"
+    return Section("code", filepath, title, (header, content.strip(), "\n```\n\n"))
+
+def render_code_stream(filepath, chunks):
+    """
+    Renders the llms-full.txt section of a code file from a lazy stream of its content.
+
+    Args:
+        filepath (str): Path to the file.
+        chunks (iterable): Decoded content chunks; only consumed when the section is.
+
+    Returns:
+        Section: The rendered section.
+    """
+    title = os.path.basename(filepath)
+    header = f"## {title}\n> File: {filepath}\n\n```\n"
+    return Section("code", filepath, title, _stream_code_section(header, chunks))
+
+def _stream_code_section(header, chunks):
+    yield header
+    yield from strip_chunks(chunks)
+    yield "\n```\n\n"
+
+def _render_markdown_stream(filepath, chunks):
+    # Metadata comes from a bounded prefix, so the rest of the document stays a lazy stream.
+    chunks = iter(chunks)
+    head = read_prefix(chunks)
+    meta = extract_metadata(head)
+    title, header = _markdown_header(filepath, meta)
+    body = strip_chunks(chain(body_slices(head, meta.removed, strip=False), chunks))
+    return Section("markdown", filepath, title, chain((header,), body, ("\n\n",)), meta.summary)
+
+def render_duplicate(filepath, original):
+    """
+    Renders the short reference section of a file whose content is identical to an earlier file.
+
+    Args:
+        filepath (str): Path to the duplicate file.
+        original (Section): The earlier section with the same content (its chunks are not used).
+
+    Returns:
+        Section: The reference section.
+    """
+    title = original.title if original.kind == "markdown" else os.path.basename(filepath)
+    text = f"## {title}\n> File: {filepath}\n> Same content as: {original.path}\n\n"
+    return Section(original.kind, filepath, title, (text,), original.summary)
+
+def _continuation(section):
+    # Text closing and reopening a section that is split across shards.
+    if section.kind == "code":
+        return "```\n\n", f"## {section.title} (continued)\n> File: {section.path}\n\n```\n"
+    return "\n", f"## {section.title} (continued)\n\n"
+
+def _section_groups(compactor=None):
+    # Built per call so that the renderers and the configuration are looked up at run time.
+    code_extensions = other_text_extensions()
+    render, render_stream = render_code, render_code_stream
+    if compactor is not None:
+        render = lambda filepath, content: render_code(filepath, compactor.text(filepath, content))
+        render_stream = lambda filepath, chunks: render_code_stream(filepath, compactor.chunks(filepath, chunks))
+    return (
+        SectionGroup("markdown", Section("heading", None, "Project Documentation (Markdown Files)", (MARKDOWN_HEADING,)),
+                     lambda filename: filename.endswith(MARKDOWN_EXTENSION), render_markdown, _render_markdown_stream,
+                     render_duplicate),
+        SectionGroup("code", Section("heading", None, "Code and Other Files", (CODE_HEADING,)),
+                     lambda filename: filename.endswith(code_extensions), render, render_stream,
+                     render_duplicate),
+    )
+
+def _ranker(rank, budget, budget_unit, workers, references):
+    # A budget or references imply ranking; a Ranker is used as is.
+    if not rank and budget is None and not references:
+        return None
+    from rank import Ranker
+
+    if isinstance(rank, Ranker):
+        return rank
+    return Ranker(budget, budget_unit, workers, references)
+
+def _compactor(compact):
+    # A level name becomes a new Compactor; a Compactor is used as is.
+    if compact is None:
+        return None
+    from compact import Compactor
+
+    return compact if isinstance(compact, Compactor) else Compactor(compact)
+
+def iter_section_records(directory, workers=1, cache=None, result=None, honor_gitignore=False, dedup=False,
+                         compact=None):
+    """
+    Yields the sections of llms-full.txt for a directory, in output order.
+
+    Args:
+        directory (str): The root directory to process.
+        workers (int): Number of threads used to read and format files (default: 1, serial).
+        cache (ManifestCache): Open manifest cache to serve unchanged files from (default: None).
+        result (scan.ScanResult): If given, line and character counts of the scanned files are
+            collected into it in the same pass.
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree.
+        dedup (bool): Render files identical to an earlier file as a reference section.
+        compact (str or compact.Compactor): Compact code sections (see generate_llms_full).
+
+    Yields:
+        Section: Headings, Markdown sections and code sections. Each section's chunks must be
+        consumed before moving on if bounded memory matters, since large files are read lazily.
+    """
+    counting = result is not None
+    yield from scan.iter_scan(directory, _section_groups(_compactor(compact)), counting, counting, workers, cache,
+                              result, honor_gitignore, dedup)
+
+def iter_sections(directory, workers=1, cache=None, honor_gitignore=False, dedup=False, compact=None):
+    """
+    Yields the rendered text of llms-full.txt for a directory as a stream of string chunks.
+
+    The chunks can be written to any sink (a file, sys.stdout, a socket, an in-memory buffer);
+    "".join(iter_sections(directory)) is exactly the content generate_llms_full writes. Memory use
+    is bounded by the prefetch window and the size of the largest non-streamed file.
 
     Args:
         directory (str): The root directory to process.
-        output_file (str): The output file name (default: "llms-full.txt").
-    """
-    markdown_files = []
-    other_text_files = []
-
-    # Categorize files
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            if filename.endswith(".md"):
-                markdown_files.append(filepath)
-            elif filename.endswith((".txt", ".py", ".js", ".html", ".sh", ".rs", ".toml")):
-                other_text_files.append(filepath)
-
-    # Sort files for consistent output
-    markdown_files.sort()
-    other_text_files.sort()
-
-    with open(output_file, "w", encoding="utf-8") as outfile:
-        # Process Markdown Files
-        outfile.write("# Project Documentation (Markdown Files)\n")
-        outfile.write("> Comprehensive documentation of the project in Markdown format.\n\n")
-        for filepath in markdown_files:
-            content = safe_read(filepath)
-            if content is None:
-                continue
-
-            # Extract title or derive from filename
-            title_match = re.search(r"^#\s+(.+)", content, re.MULTILINE)
-            title = title_match.group(1).strip() if title_match else os.path.basename(filepath).replace(".md", "").replace("_", " ").title()
-            outfile.write(f"## {title}\n")
-
-            # Extract summary if available
-            summary_match = re.search(r"^>\s+(.+)", content, re.MULTILINE)
-            if summary_match:
-                summary = summary_match.group(1).strip()
-                outfile.write(f"> {summary}\n\n")
+        workers (int): Number of threads used to read and format files (default: 1, serial).
+        cache (ManifestCache): Open manifest cache to serve unchanged files from (default: None).
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree.
+        dedup (bool): Render files identical to an earlier file as a reference section.
+        compact (str or compact.Compactor): Compact code sections (see generate_llms_full).
+
+    Yields:
+        str: Successive pieces of the generated document.
+    """
+    for section in iter_section_records(directory, workers, cache, honor_gitignore=honor_gitignore, dedup=dedup,
+                                        compact=compact):
+        yield from section.chunks
+
+@contextmanager
+def _open_output(output_file):
+    # Writable objects are used as-is and left open; anything else is treated as a path.
+    if hasattr(output_file, "write"):
+        yield output_file
+    else:
+        with open(output_file, "w", encoding="utf-8") as outfile:
+            yield outfile
+
+def _append_file(source_path, target):
+    # Appends a file to an open binary file, in the kernel where the platform allows it.
+    target.flush()
+    with open(source_path, "rb") as source:
+        if hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(source.fileno(), target.fileno(), 1 << 30):
+                    pass
+                return
+            except OSError:
+                # Not supported between these files; nothing has been copied yet, or the
+                # positions moved together, so the plain copy carries on where it stopped.
+                target.seek(0, os.SEEK_END)
+        shutil.copyfileobj(source, target, 1 << 20)
+
+def _write_with_toc(output_file, body_file, toc):
+    # Writes the TOC block followed by the already written body, then moves it into place.
+    temp_file = output_file + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as outfile:
+        outfile.write(toc)
+        outfile.flush()
+        _append_file(body_file, outfile.buffer)
+    os.replace(temp_file, output_file)
+
+def _toc_block(builder):
+    return f"{TOC_HEADING}{builder.render()}\n\n" if builder.entries else TOC_HEADING
+
+def _write_chunks(outfile, section):
+    for chunk in section.chunks:
+        outfile.write(chunk)
+
+def _write_sections(sections, write, profile=None):
+    # Passes every section to write(section), timing the writes when profiling.
+    if profile is None:
+        for section in sections:
+            write(section)
+    else:
+        for section in sections:
+            profile.write(write, profile.track(section))
+
+def own_files(output_file):
+    """
+    Returns a predicate that is True for the absolute paths of an output file and of the files
+    written next to it (<output>.tmp, .cache.*, .index.jsonl, .frames.json, .chunks.jsonl), so
+    that an output inside the processed tree is never read back as a source.
+    """
+    output = os.path.abspath(output_file)
+    return lambda path: path == output or path.startswith(output + ".")
+
+def _cache_fingerprint(git=False, compact=None):
+    # With git, content keys are blob ids rather than SHA-256, so such caches are kept apart;
+    # sections compacted at one level cannot serve another.
+    digest = ";digest=git-blob" if git else ""
+    level = f";compact={compact.level}" if compact is not None else ""
+    return f"render={RENDER_VERSION};stream_threshold={scan.STREAM_THRESHOLD}{digest}{level}"
+
+def generate_llms_full(directory, output_file="llms-full.txt", workers=1, cache=False,
+                       count_lines=False, count_chars=False, honor_gitignore=False, max_tokens=None,
+                       dedup=False, compress=None, frame_size=FRAME_SIZE, compress_level=None, index=False,
+                       toc=False, profile=None, git=False, compact=None, rank=False, budget=None,
+                       budget_unit="tokens", rank_references=False, chunks=False, chunk_size=512, chunk_overlap=64,
+                       chunk_unit="tokens", chunks_changed=False):
+    """
+    Generates a llms-full.txt file from a directory structure, including Markdown files and other text files.
+
+    Args:
+        directory (str): The root directory to process, or a .tar[.gz|.bz2|.xz] or .zip archive,
+            which is read in place as if it had been extracted (see archive.py).
+        output_file (str or file-like): The output file name (default: "llms-full.txt"), or any
+            object with a write(str) method, such as sys.stdout or io.StringIO. An output path is
+            written to "<output_file>.tmp" and moved into place when complete; when it lies inside
+            directory, it and its sidecar files are not included.
+        workers (int): Number of threads used to read and format files (default: 1, serial).
+            Sections are always written in sorted path order (or ranked order, see rank), so
+            the output does not depend on the number of workers.
+        cache (bool or str): Keep a manifest cache of rendered sections so that later runs only
+            re-read changed files. True stores it next to the output as "<output_file>.cache.*";
+            a string gives the cache base path explicitly (required for file-like outputs).
+        count_lines (bool): Also count lines of every code file, from the same single read.
+        count_chars (bool): Also count characters of every code file, from the same single read.
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree. Exclusion
+            patterns and the size limit from config.yaml always apply.
+        max_tokens (int): If given, write shards of at most this many estimated tokens instead
+            of one file: "llms-full.001.txt", "llms-full.002.txt", ... and "llms-full.index.txt"
+            listing the sections of each shard. Requires an output path.
+        dedup (bool): Emit the content of identical files once. Later copies become a short
+            reference section naming the first file with that content; their paths are listed
+            in the returned result's duplicates.
+        compress (str): "gzip" or "xz" to write compressed output in independently
+            decompressible frames, plus a frame table "<output_file>.frames.json". Output paths
+            ending in .gz or .xz are compressed without asking. Requires an output path.
+        frame_size (int): Uncompressed bytes per frame; frames end at the next section boundary
+            after this many bytes (default: compression.FRAME_SIZE, 1 MiB).
+        compress_level (int): gzip level or xz preset (default: 6).
+        index (bool): Also write "<output_file>.index.jsonl", mapping every section's source
+            path, title and kind to its byte offset and length in the (uncompressed) document.
+            Requires an output path; not available with max_tokens.
+        toc (bool): Start the file with a table of contents linking every heading outside code
+            blocks. The headings are collected while the sections are written to a temporary
+            file, which is then appended to the TOC without being parsed again. Requires an
+            uncompressed output path; not available with max_tokens.
+        profile (profiling.Profile): Collects per-phase timings and file statistics; call its
+            finish() with the returned result before reading it.
+        git (bool or str): True takes the files from the git index instead of walking the tree,
+            so untracked files are left out and unchanged files are recognised by their blob id
+            without being hashed; a revision (commit, branch, tag or tree id) generates the
+            document for that revision from the object store, without a checkout.
+        compact (str or compact.Compactor): Compact the code sections: "basic" drops license
+            headers, trailing whitespace and runs of blank lines, "comments" also drops comments
+            and "docstrings" also Python docstrings (see compact.py). A Compactor is used as is,
+            and its counters tell how many bytes and tokens were saved; sections served from
+            the cache are not counted.
+        rank (bool or rank.Ranker): Write the files of each section group most relevant first,
+            as scored from their paths, sizes and modification times (see rank.py). A Ranker is
+            used as is, and keeps the scores of the files.
+        budget (int): Only write the most useful set of files whose sections fit this many
+            tokens or bytes in all (implies rank). Files are chosen by estimated cost; the
+            budget itself holds for the rendered sections, leaving out any that would
+            overflow it. The table of contents and shard index are not part of the budget.
+        budget_unit (str): "tokens" (estimated as for max_tokens) or "bytes" (default: tokens).
+        rank_references (bool): Also rank files by the references to them in the starts of other
+            files (implies rank). This reads the start of every file before the scan reads it,
+            which costs about three times the walk; it is skipped for compressed tar streams and
+            git revisions.
+        chunks (bool or str): Also write the document as overlapping chunks of whole lines, one
+            JSON record each with source path, title, heading, byte offset and length in the
+            (uncompressed) document and SHA-256, to "<output_file>.chunks.jsonl" or the path
+            given (see chunk_export.py). Not available with max_tokens or toc.
+        chunk_size (int): Largest chunk, in chunk_unit (default: 512).
+        chunk_overlap (int): How much of a chunk is repeated at the start of the next one from
+            the same section, in chunk_unit (default: 64).
+        chunk_unit (str): "tokens" (estimated as for max_tokens) or "chars" (default: tokens).
+        chunks_changed (bool): Leave out the text of chunks that were in the previous export.
+
+    Returns:
+        scan.ScanResult: Line and character counts (empty unless requested).
+    """
+    if hasattr(output_file, "write"):
+        if cache is True:
+            raise ValueError("cache=True needs an output path; pass the cache base path instead")
+        if max_tokens:
+            raise ValueError("max_tokens needs an output path to name the shards after")
+        if compress:
+            raise ValueError("compress needs an output path for the frame table")
+        if index:
+            raise ValueError("index needs an output path to name the index after")
+        if toc:
+            raise ValueError("toc needs an output path to write the document behind it")
+        if chunks is True:
+            raise ValueError("chunks=True needs an output path; pass the export path instead")
+    else:
+        compress = compress or codec_for(output_file)
+    if max_tokens and (compress or index):
+        raise ValueError("max_tokens cannot be combined with compressed output or an index")
+    if toc and (max_tokens or compress):
+        raise ValueError("toc cannot be combined with max_tokens or compressed output")
+    if chunks and (max_tokens or toc):
+        raise ValueError("chunks cannot be combined with max_tokens or toc")
+    if cache is True:
+        cache = output_file + ".cache"
+    compact = _compactor(compact)
+    ranker = _ranker(rank, budget, budget_unit, workers, rank_references)
+
+    section_cache = None
+    if cache:
+        from manifest_cache import ManifestCache
+
+        section_cache = ManifestCache(cache, directory, _cache_fingerprint(git, compact))
+        section_cache.open()
+    result = scan.ScanResult()
+    shard_writer = None
+    section_index = None
+    chunk_exporter = None
+    toc_builder = None
+    body_file = output_file
+    try:
+        ignore = None if hasattr(output_file, "write") else own_files(output_file)
+        sections = scan.iter_scan(directory, _section_groups(compact), count_lines, count_chars, workers,
+                                  section_cache, result, honor_gitignore, dedup, profile, ignore, git,
+                                  ranker.order if ranker is not None else None)
+        if ranker is not None:
+            sections = ranker.fit(sections, result.duplicates)
+        if chunks:
+            import chunk_export
+
+            newline = "\n" if compress or hasattr(output_file, "write") else os.linesep
+            chunk_exporter = chunk_export.ChunkExporter(
+                chunk_export.chunks_path(output_file) if chunks is True else chunks, directory,
+                chunk_size, chunk_overlap, chunk_unit, newline, chunks_changed, result.duplicates)
+            sections = map(chunk_exporter.track, sections)
+        if index:
+            # Text-mode output files write "\n" as os.linesep; compressed frames keep it as is.
+            section_index = SectionIndex(index_path(output_file), directory,
+                                         "\n" if compress else os.linesep, result.duplicates)
+            sections = map(section_index.track, sections)
+        if toc:
+            from generate_toc import TocBuilder, make_anchor
+
+            toc_builder = TocBuilder(reserved=(make_anchor(TOC_TITLE),))
+            sections = map(toc_builder.track, sections)
+            body_file = output_file + ".body.tmp"
+        elif not hasattr(output_file, "write"):
+            # Written next to the output and moved into place, so that readers never see a
+            # partly written file.
+            body_file = output_file + ".tmp"
+        if max_tokens or compress:
+            if max_tokens:
+                writer = shard_writer = ShardWriter(output_file, max_tokens, continuation=_continuation)
+            else:
+                writer = FramedWriter(output_file, compress, frame_size, compress_level)
+            with writer:
+                _write_sections(sections, writer.add, profile)
+        else:
+            with _open_output(body_file) as outfile:
+                _write_sections(sections, partial(_write_chunks, outfile), profile)
+        if toc_builder is not None:
+            toc_builder.finish()
+            toc_text = _toc_block(toc_builder)
+            if section_index is not None:
+                section_index.prepend("toc", TOC_TITLE, len(toc_text.encode("utf-8"))
+                                      + toc_text.count("\n") * (len(os.linesep) - 1))
+            if profile is not None:
+                profile.bytes_written += len(toc_text.encode("utf-8"))
+                profile.timed("write", _write_with_toc)(output_file, body_file, toc_text)
             else:
-                outfile.write(f"> Content from: {filepath}\n\n")
-
-            # Remove title and summary if already written
-            content_to_write = content
-            if title_match:
-                content_to_write = content_to_write.replace(title_match.group(0), "", 1)
-            if summary_match:
-                content_to_write = content_to_write.replace(summary_match.group(0), "", 1)
-            outfile.write(content_to_write.strip() + "\n\n")
-
-        # Process Other Text Files
-        outfile.write("# Code and Other Files\n")
-        outfile.write("> Code snippets, scripts, and other relevant text files.\n\n")
-        for filepath in other_text_files:
-            content = safe_read(filepath)
-            if content is None:
-                continue
-
-            title = os.path.basename(filepath)
-            outfile.write(f"## {title}\n")
-            outfile.write(f"> File: {filepath}\n\n")
-            outfile.write("```\n")
-            outfile.write(content.strip() + "\n")
-            outfile.write("```\n\n")
-
-    print(f"Successfully generated {output_file} from {directory}")
-
-def main():
-    root_directory = input("Enter the root directory to process: ")
-    generate_llms_full(root_directory)
+                _write_with_toc(output_file, body_file, toc_text)
+        elif body_file != output_file and not (max_tokens or compress):
+            os.replace(body_file, output_file)
+    except BaseException:
+        if section_cache is not None:
+            section_cache.close(commit=False)
+        if section_index is not None:
+            section_index.close(commit=False)
+        if chunk_exporter is not None:
+            chunk_exporter.close(commit=False)
+        raise
+    finally:
+        if body_file != output_file and os.path.exists(body_file):
+            os.remove(body_file)
+    if section_cache is not None:
+        section_cache.close()
+    if section_index is not None:
+        section_index.close()
+    if chunk_exporter is not None:
+        chunk_exporter.close()
+
+    if not hasattr(output_file, "write"):
+        if section_cache is not None:
+            print(f"Cache: {section_cache.hits} unchanged, {section_cache.misses} re-rendered")
+        if result.skipped:
+            print(result.skip_summary())
+        if compact is not None:
+            print(compact.summary())
+        if ranker is not None:
+            print(ranker.summary())
+        if chunk_exporter is not None:
+            print(chunk_exporter.summary())
+        if result.duplicates:
+            print(f"Deduplicated {len(result.duplicates)} files with the same content as an earlier file")
+        if shard_writer is not None:
+            print(f"Successfully generated {len(shard_writer.shards)} shards of {output_file} from {directory}")
+        else:
+            print(f"Successfully generated {output_file} from {directory}")
+    return result
+
+def main(argv=None, prog=None, interactive=True):
+    """
+    Command-line entry point; also run by "llms generate".
+
+    Args:
+        argv (list): Arguments (default: sys.argv[1:]).
+        prog (str): Program name shown in usage and help.
+        interactive (bool): Prompt for the directory when it is not given; otherwise it is required.
+    """
+    from compact import LEVELS
+    import rank as ranking
+    import chunk_export
+    import profiling
+
+    parser = argparse.ArgumentParser(prog=prog, description="Generate llms-full.txt from a directory.")
+    parser.add_argument("directory", nargs="?" if interactive else None, help="Root directory, or a tar or zip archive, to process")
+    parser.add_argument("-o", "--output", default="llms-full.txt",
+                        help="Output file, or - for stdout (default: llms-full.txt)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of threads used to read and format files (default: 1)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse unchanged sections from <output>.cache.* and update it")
+    parser.add_argument("--gitignore", action="store_true", help="Skip paths ignored by .gitignore files")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Emit identical files once; later copies become a reference section")
+    parser.add_argument("--max-tokens", type=int,
+                        help="Split the output into shards of at most N estimated tokens, plus an index")
+    parser.add_argument("--compress", choices=("gzip", "xz"),
+                        help="Write compressed output in independently decompressible frames "
+                             "(implied by a .gz or .xz output name)")
+    parser.add_argument("--frame-size", type=float, default=FRAME_SIZE / (1 << 20),
+                        help="Uncompressed MB per compressed frame (default: 1)")
+    parser.add_argument("--compress-level", type=int, help="gzip level or xz preset (default: 6)")
+    parser.add_argument("--index", action="store_true",
+                        help="Also write <output>.index.jsonl with the byte range of every section")
+    parser.add_argument("--compact", nargs="?", const="basic", choices=LEVELS,
+                        help="Compact code sections: basic (license headers, whitespace; the default), "
+                             "comments (also all comments) or docstrings (also Python docstrings)")
+    parser.add_argument("--toc", action="store_true",
+                        help="Start the output with a table of contents of its headings")
+    ranking.add_arguments(parser)
+    chunk_export.add_arguments(parser)
+    scan.add_git_arguments(parser)
+    profiling.add_arguments(parser)
+    parser.add_argument("--check-cache", action="store_true",
+                        help="Report whether <output>.cache.* is usable, then exit")
+    parser.add_argument("--config", help="Configuration file (default: config.yaml)")
+    args = parser.parse_args(argv)
+    setup_logging()
+    if args.config:
+        use_config(args.config)
+
+    if args.check_cache:
+        from manifest_cache import check_cache
+
+        report = check_cache(args.output + ".cache", args.directory,
+                             _cache_fingerprint(scan.git_argument(args), _compactor(args.compact)))
+        print(f"Cache status: {report['status']} ({report['entries']} entries)")
+        for problem in report["problems"]:
+            print(f"  {problem}")
+        sys.exit(0 if report["status"] == "ok" else 1)
+
+    root_directory = args.directory or input("Enter the root directory to process: ")
+    output = sys.stdout if args.output == "-" else args.output
+    profile = profiling.from_arguments(args, "generate_llms")
+    result = generate_llms_full(root_directory, output, workers=args.workers, cache=args.cache,
+                       honor_gitignore=args.gitignore, max_tokens=args.max_tokens, dedup=args.dedup,
+                       compress=args.compress, frame_size=max(1, int(args.frame_size * (1 << 20))),
+                       compress_level=args.compress_level, index=args.index,
+                       toc=args.toc, profile=profile, git=scan.git_argument(args), compact=args.compact,
+                       rank=args.rank, budget=args.budget, budget_unit=args.budget_unit,
+                       rank_references=args.rank_references,
+                       chunks=args.chunks, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                       chunk_unit=args.chunk_unit, chunks_changed=args.chunks_changed)
+    profiling.report(profile, args, result)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -6,13 +6,18 @@ anchor links. It supports multiple header levels and produces a clean, navigable
 
 Key Features:
 - Parses Markdown headers (# ## ###) of all levels
-- Generates anchor links from header text automatically
+- Generates anchor links from header text automatically, unique within the document
 - Handles special characters by escaping and URL-encoding
 - Creates hierarchical indentation for nested sections
+- Skips "#" lines inside fenced code blocks, such as comments in llms-full.txt code sections
+- Streams its input: files are read in chunks, and only candidate lines are looked at, so huge
+  documents need neither a full read into memory nor a Python-level pass over every line
+- TocBuilder can be fed while a document is generated (generate_llms --toc)
 - Produces clean, readable Markdown output
+- Optional profiling (--profile, --profile-json) of reading, scanning and writing (profiling.py)
 
 Usage:
-    python -m src.generate_toc [markdown_file]
+    python -m src.generate_toc [markdown_file] [-o output_file]
 
 Output:
     Creates a toc.md file with the generated table of contents
@@ -21,49 +26,208 @@ Example:
     python -m src.generate_toc README.md
 """
 
+import os
 import re
 import html
 import argparse
+from time import perf_counter
+import profiling
 
-def generate_toc(markdown_text):
+# Lines that may be headers or code fences; everything else is skipped without being examined.
+# Anchoring on the preceding "\n" rather than on ^ lets the regex engine jump between line
+# starts, which makes the scan several times faster on large documents.
+_CANDIDATE_PATTERN = re.compile(r"\n( {0,3}(?:#|```|~~~)[^\n]*)")
+_HEADER_PATTERN = re.compile(r" {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*\Z")
+_FENCE_PATTERN = re.compile(r" {0,3}(`{3,}|~{3,})(.*)\Z")
+_ANCHOR_STRIP = re.compile(r"[^\w\s-]")
+_ANCHOR_DASHES = re.compile(r"[\s-]+")
+
+READ_SIZE = 1 << 20
+
+def make_anchor(title):
+    """
+    Returns the anchor of an (HTML-escaped) header title: lowercase, punctuation removed, and
+    runs of whitespace and hyphens turned into a single hyphen.
+    """
+    return _ANCHOR_DASHES.sub("-", _ANCHOR_STRIP.sub("", title).lower())
+
+class TocBuilder:
+    """
+    Collects TOC entries from Markdown fed in pieces of any size.
+
+    Attributes:
+        entries (list): (level, title, anchor) per header, in document order. Titles are
+            HTML-escaped and anchors are unique: repeats get "-1", "-2", ... appended.
+    """
+
+    def __init__(self, max_level=6, reserved=()):
+        """
+        Args:
+            max_level (int): Deepest header level to include (default: 6, all).
+            reserved (iterable): Anchors already taken in the document, e.g. by a heading written
+                above the fed text; headers with the same anchor get a suffix.
+        """
+        self.max_level = max_level
+        self.entries = []
+        self._anchors = set(reserved)
+        self._fence = None
+        self._partial = "\n"     # the unfinished last line, with the line break before it
+
+    def feed(self, text):
+        """
+        Processes the next piece of the document.
+
+        Args:
+            text (str): Any piece of the document; lines may span pieces.
+        """
+        text = self._partial + text
+        end = text.rfind("\n")
+        self._partial = text[end:]
+        if end > 0:
+            self._scan(text, end)
+
+    def finish(self):
+        """
+        Processes the last line if the document does not end with a newline.
+        """
+        text = self._partial
+        self._partial = "\n"
+        self._scan(text, len(text))
+
+    def track(self, section):
+        """
+        Returns the section with its chunks wrapped so that they are fed to the builder as they
+        are consumed, for collecting the TOC while a document is written.
+
+        Args:
+            section (Section): The section about to be written.
+
+        Returns:
+            Section: The same section.
+        """
+        return section._replace(chunks=self._track(section.chunks))
+
+    def _track(self, chunks):
+        for chunk in chunks:
+            self.feed(chunk)
+            yield chunk
+
+    def _scan(self, text, end):
+        for match in _CANDIDATE_PATTERN.finditer(text, 0, end):
+            self.feed_line(match.group(1))
+
+    def feed_line(self, line):
+        """
+        Processes one complete line, without its line break.
+        """
+        fence = _FENCE_PATTERN.match(line)
+        if fence is not None:
+            marker, info = fence.groups()
+            if self._fence is None:
+                if not (marker[0] == "`" and "`" in info):
+                    self._fence = marker
+            elif marker[0] == self._fence[0] and len(marker) >= len(self._fence) and not info.strip():
+                self._fence = None
+            return
+        if self._fence is not None:
+            return
+        header = _HEADER_PATTERN.match(line)
+        if header is None or not header.group(2):
+            return
+        level = len(header.group(1))
+        if level > self.max_level:
+            return
+        # Escape special characters and generate an anchor link
+        title = html.escape(header.group(2).strip())
+        anchor = base = make_anchor(title)
+        suffix = 0
+        while anchor in self._anchors:
+            suffix += 1
+            anchor = f"{base}-{suffix}"
+        self._anchors.add(anchor)
+        self.entries.append((level, title, anchor))
+
+    def render(self):
+        """
+        Returns the TOC in Markdown format, one indented bullet per header.
+        """
+        return "\n".join(f"{'  ' * (level - 1)}* [{title}](#{anchor})" for level, title, anchor in self.entries)
+
+def generate_toc(markdown_text, max_level=6):
     """
     Generates a table of contents (TOC) from Markdown text.
 
     Args:
         markdown_text (str): The Markdown content.
+        max_level (int): Deepest header level to include (default: 6, all).
 
     Returns:
         str: The generated TOC in Markdown format.
     """
-    toc = []
-    lines = markdown_text.split('\n')
-    for line in lines:
-        if line.startswith('#'):
-            level = line.count('#')
-            title = line.strip('# ').strip()
-            # Escape special characters and generate an anchor link
-            title = html.escape(title)
-            anchor = re.sub(r"[^\w\s-]", "", title).lower()
-            anchor = re.sub(r"\s+", "-", anchor)
-            anchor = re.sub(r"-+", "-", anchor)
-            indent = '  ' * (level - 1)
-            toc.append(f"{indent}* [{title}](#{anchor})")
-    return "\n".join(toc)
-
-def main():
-    input_file = input("Enter the path to the Markdown file: ")
+    builder = TocBuilder(max_level)
+    builder.feed(markdown_text)
+    builder.finish()
+    return builder.render()
+
+def generate_toc_file(input_file, max_level=6, profile=None):
+    """
+    Generates a table of contents from a Markdown file, reading it in chunks.
+
+    Args:
+        input_file (str): Path to the Markdown file.
+        max_level (int): Deepest header level to include (default: 6, all).
+        profile (profiling.Profile): Collects read and scan timings.
+
+    Returns:
+        str: The generated TOC in Markdown format.
+    """
+    builder = TocBuilder(max_level)
+    feed = builder.feed
+    start = perf_counter()
+    with open(input_file, "r", encoding="utf-8") as f:
+        read = lambda: f.read(READ_SIZE)
+        if profile is not None:
+            read, feed = profile.timed("read", read), profile.timed("toc", feed)
+        for chunk in iter(read, ""):
+            feed(chunk)
+        builder.finish()
+    if profile is not None:
+        profile.file(input_file, os.path.getsize(input_file), perf_counter() - start)
+    return builder.render()
+
+def main(argv=None, prog=None, interactive=True):
+    """
+    Command-line entry point; also run by "llms toc".
+
+    Args:
+        argv (list): Arguments (default: sys.argv[1:]).
+        prog (str): Program name shown in usage and help.
+        interactive (bool): Prompt for the input file when it is not given; otherwise it is required.
+    """
+    parser = argparse.ArgumentParser(prog=prog, description="Generate a table of contents from a Markdown file.")
+    parser.add_argument("input_file", nargs="?" if interactive else None, help="Markdown file to read")
+    parser.add_argument("-o", "--output", default="toc.md", help="Output file (default: toc.md)")
+    parser.add_argument("--max-level", type=int, default=6, help="Deepest header level to include")
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    input_file = args.input_file or input("Enter the path to the Markdown file: ")
+    profile = profiling.from_arguments(args, "generate_toc")
     try:
-        with open(input_file, "r", encoding="utf-8") as f:
-            markdown_text = f.read()
+        toc = generate_toc_file(input_file, args.max_level, profile)
     except Exception as e:
         print(f"Error reading file {input_file}: {e}")
         return
 
-    toc = generate_toc(markdown_text)
-    output_file = "toc.md"
+    output_file = args.output
+    start = perf_counter()
     with open(output_file, "w", encoding="utf-8") as f:
         f.write(toc)
+    if profile is not None:
+        profile.add("write", perf_counter() - start)
+        profile.bytes_written += len(toc.encode("utf-8"))
     print(f"Table of contents written to {output_file}")
+    profiling.report(profile, args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
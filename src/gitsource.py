@@ -0,0 +1,384 @@
+"""
+Git-Aware File Enumeration
+
+This module lists the files of a git checkout from the repository's index instead of walking
+the directory tree, and can read a commit or tree-ish straight from the object store without a
+checkout. Everything runs locally: the index is parsed directly, and the git command line is
+only used for revisions and for index formats this parser does not read.
+
+Key Features:
+- Files come from .git/index (versions 2, 3 and 4), so untracked build output is never visited
+  and no directories are listed; `git ls-files` is the fallback for sparse indexes
+- Works from a subdirectory of the checkout and in linked worktrees (.git files)
+- Blob ids from the index are free content keys: a file whose size, mtime and inode still match
+  its index entry is known to have that blob's content without reading it, which the section
+  cache and --dedup use instead of hashing the file
+- A revision (any tree-ish: commit, branch, tag, tree id) is listed with `git ls-tree` and read
+  through one `git cat-file --batch` process, so output can be generated without a checkout
+- exclude_patterns and the size limit from config.yaml still apply, as in walker.walk_files
+
+Usage:
+    from gitsource import GitSource
+
+    with GitSource("path/to/checkout") as source:
+        for dirpath, files in source.walk():
+            for filename, st in files:
+                print(dirpath, filename, st.blob)
+"""
+
+import os
+import struct
+import hashlib
+import threading
+import subprocess
+from collections import namedtuple
+from walker import exclusion_rules, group_by_directory
+from counting import count_buffer
+from utils import is_binary, report_skip, SNIFF_SIZE, SKIP_BINARY, SKIP_TOO_LARGE, SKIP_UNREADABLE
+
+# The stat data the scan uses, plus the file's blob id when its content is known to match it.
+GitStat = namedtuple("GitStat", ["st_size", "st_mtime_ns", "blob"])
+
+# One stage-0 entry of the index; path is relative to the work tree root, with "/" separators.
+IndexEntry = namedtuple("IndexEntry", ["path", "mode", "blob", "size", "mtime_ns", "ino", "valid"])
+
+_HEADER = struct.Struct(">4sII")
+_ENTRY = struct.Struct(">10I20sH")
+_REGULAR_MODES = (0o100644, 0o100755)
+_GITLINK_MODE = 0o160000
+_DIRECTORY_MODE = 0o040000
+_EXTENDED = 0x4000
+_SKIP_WORKTREE = 0x4000
+_INTENT_TO_ADD = 0x2000
+
+def blob_id(data):
+    """
+    Returns the git blob id (SHA-1 of "blob <size>\\0" + data) of a file's content.
+    """
+    digest = hashlib.sha1(b"blob %d\0" % len(data))
+    digest.update(data)
+    return digest.hexdigest()
+
+def file_blob_id(filepath, block_size=1 << 16):
+    """
+    Returns the git blob id of a file, read in blocks, or None if it cannot be read.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            digest = hashlib.sha1(b"blob %d\0" % os.fstat(f.fileno()).st_size)
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def find_git_dir(directory):
+    """
+    Finds the work tree root and git directory of the checkout containing directory.
+
+    Args:
+        directory (str): A directory inside a git work tree.
+
+    Returns:
+        tuple: (work_tree, git_dir) as absolute paths.
+
+    Raises:
+        ValueError: If directory is not inside a git work tree.
+    """
+    path = os.path.abspath(directory)
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            return path, dot_git
+        if os.path.isfile(dot_git):
+            # Linked worktrees and submodules: ".git" is a file pointing at the git directory.
+            with open(dot_git, "r", encoding="utf-8") as f:
+                line = f.readline().strip()
+            if line.startswith("gitdir:"):
+                return path, os.path.normpath(os.path.join(path, line[len("gitdir:"):].strip()))
+        parent = os.path.dirname(path)
+        if parent == path:
+            raise ValueError(f"{directory} is not inside a git work tree")
+        path = parent
+
+def _varint(data, pos):
+    # git's offset varint, used for the prefix compression of index version 4.
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+def read_index(index_path):
+    """
+    Parses a git index file.
+
+    Args:
+        index_path (str): Path to the index, usually .git/index.
+
+    Returns:
+        list: IndexEntry tuples of the stage-0 entries present in the work tree, in index order.
+        valid is False for entries whose blob id does not describe the file: conflicts,
+        intent-to-add entries, symlinks, and entries written in the same second as the index
+        ("racily clean" in git's terms).
+
+    Raises:
+        ValueError: If the file is not an index this parser understands (a sparse or split
+            index).
+        OSError: If the file cannot be read.
+    """
+    with open(index_path, "rb") as f:
+        data = f.read()
+        index_mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+    signature, version, count = _HEADER.unpack_from(data)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError(f"Unsupported index {index_path}: {signature!r} version {version}")
+    entries = []
+    conflicted = set()
+    offset = _HEADER.size
+    previous = b""
+    for _ in range(count):
+        fields = _ENTRY.unpack_from(data, offset)
+        mtime_ns = fields[2] * 1_000_000_000 + fields[3]
+        ino, mode, size, blob, flags = fields[5], fields[6], fields[9], fields[10], fields[11]
+        pos = offset + _ENTRY.size
+        extended = 0
+        if flags & _EXTENDED:
+            extended = struct.unpack_from(">H", data, pos)[0]
+            pos += 2
+        end = data.index(b"\0", pos)
+        if version == 4:
+            strip, pos = _varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = previous[:len(previous) - strip] + data[pos:end]
+            offset = end + 1
+        else:
+            path = data[pos:end]
+            # Entries are NUL-padded to a multiple of 8 bytes.
+            offset += (pos - offset + len(path) + 8) & ~7
+        previous = path
+        if mode == _DIRECTORY_MODE:
+            raise ValueError(f"Sparse index {index_path} lists directories")
+        stage = (flags >> 12) & 3
+        if stage:
+            conflicted.add(path)
+            continue
+        if extended & _SKIP_WORKTREE or mode == _GITLINK_MODE:
+            continue
+        valid = (mode in _REGULAR_MODES and not extended & _INTENT_TO_ADD
+                 and mtime_ns // 1_000_000_000 < index_mtime_ns // 1_000_000_000)
+        entries.append(IndexEntry(os.fsdecode(path), mode, blob.hex(), size, mtime_ns, ino, valid))
+    # Extensions follow the entries, up to the 20-byte checksum. A split index ("link") keeps
+    # most entries in a shared index file, which is left to git.
+    while offset + 8 <= len(data) - 20:
+        signature, length = struct.unpack_from(">4sI", data, offset)
+        if signature == b"link":
+            raise ValueError(f"Split index {index_path} needs its shared index")
+        offset += 8 + length
+    if conflicted:
+        # Unmerged paths have stages 1-3 and no stage 0; list the work tree file without a key.
+        for path in sorted(conflicted):
+            entries.append(IndexEntry(os.fsdecode(path), 0o100644, None, 0, 0, 0, False))
+    return entries
+
+def _git(directory, *args, git="git"):
+    # Runs a git command in directory and returns its stdout as bytes.
+    try:
+        completed = subprocess.run([git, "-C", directory, *args], stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, check=False)
+    except OSError as e:
+        raise ValueError(f"Cannot run {git}: {e}") from e
+    if completed.returncode != 0:
+        raise ValueError(f"git {args[0]} failed: {completed.stderr.decode(errors='replace').strip()}")
+    return completed.stdout
+
+def _ls_files(work_tree, git="git"):
+    # Fallback for indexes read_index() does not parse; without stat data, no blob is trusted.
+    entries = []
+    for record in _git(work_tree, "ls-files", "--stage", "-z", git=git).split(b"\0"):
+        if not record:
+            continue
+        info, path = record.split(b"\t", 1)
+        mode, blob, stage = info.split()
+        mode = int(mode, 8)
+        if mode == _GITLINK_MODE:
+            continue
+        entries.append(IndexEntry(os.fsdecode(path), mode, blob.decode() if stage == b"0" else None,
+                                  0, 0, 0, False))
+    return entries
+
+def index_entries(directory, git="git"):
+    """
+    Lists the tracked files under a directory from the git index.
+
+    Args:
+        directory (str): A directory inside a git work tree.
+        git (str): The git executable, used only when the index cannot be parsed directly.
+
+    Returns:
+        list: IndexEntry tuples with paths relative to directory.
+
+    Raises:
+        ValueError: If directory is not inside a git work tree, or git fails.
+    """
+    work_tree, git_dir = find_git_dir(directory)
+    try:
+        entries = read_index(os.path.join(git_dir, "index"))
+    except FileNotFoundError:
+        entries = []
+    except (OSError, ValueError, struct.error):
+        entries = _ls_files(work_tree, git)
+    prefix = os.path.relpath(os.path.abspath(directory), work_tree).replace(os.sep, "/")
+    if prefix == ".":
+        return entries
+    prefix += "/"
+    return [entry._replace(path=entry.path[len(prefix):]) for entry in entries
+            if entry.path.startswith(prefix)]
+
+def tree_entries(directory, revision, git="git"):
+    """
+    Lists the files under a directory as of a revision, without a checkout.
+
+    Args:
+        directory (str): A directory inside a git work tree.
+        revision (str): A commit, branch, tag or tree id.
+        git (str): The git executable.
+
+    Returns:
+        list: IndexEntry tuples with paths relative to directory (mtime_ns and ino are 0).
+
+    Raises:
+        ValueError: If the revision cannot be listed.
+    """
+    entries = []
+    for record in _git(directory, "ls-tree", "-r", "-z", "--long", revision, git=git).split(b"\0"):
+        if not record:
+            continue
+        info, path = record.split(b"\t", 1)
+        mode, kind, blob, size = info.split()
+        if kind != b"blob" or int(mode, 8) not in _REGULAR_MODES:
+            continue
+        entries.append(IndexEntry(os.fsdecode(path), int(mode, 8), blob.decode(), int(size), 0, 0, True))
+    return entries
+
+class GitSource:
+    """
+    The files of a git checkout, or of a revision of it, in the shape the scan expects.
+
+    Attributes:
+        directory (str): The directory being listed.
+        revision (str): The tree-ish read from the object store, or None for the work tree.
+    """
+
+    def __init__(self, directory, revision=None, git="git"):
+        """
+        Args:
+            directory (str): A directory inside a git work tree.
+            revision (str): Read this commit or tree-ish instead of the work tree.
+            git (str): The git executable.
+
+        Raises:
+            ValueError: If directory is not in a git work tree or the revision is unknown.
+        """
+        self.directory = directory
+        self.revision = revision
+        self.git = git
+        if revision is None:
+            self._entries = index_entries(directory, git)
+        else:
+            self._entries = tree_entries(directory, revision, git)
+        self._blobs = {}
+        self._process = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def walk(self, exclude_patterns=None, max_file_size=None, on_skip=None):
+        """
+        Yields the files like walker.walk_files, with GitStat records in place of stat results.
+
+        Work tree files are stat'ed (deleted ones are left out) and carry their blob id only if
+        they still match the index; files of a revision always carry it.
+
+        Args:
+            exclude_patterns (iterable): Glob patterns (default: from config.yaml).
+            max_file_size (int): Size limit in bytes (default: from config.yaml; 0 disables).
+            on_skip (callable): Called with a utils.SkippedFile for each file over the limit.
+
+        Yields:
+            tuple: (dirpath, files) per directory, where files is a list of (filename, GitStat).
+        """
+        excluded, match_relpath, max_file_size = exclusion_rules(exclude_patterns, max_file_size)
+        by_directory = group_by_directory(((entry.path, entry) for entry in self._entries), excluded,
+                                          match_relpath)
+        for reldir in sorted(by_directory):
+            dirpath = os.path.join(self.directory, *reldir.split("/")) if reldir else self.directory
+            files = []
+            for filename, entry in by_directory[reldir]:
+                path = os.path.join(dirpath, filename)
+                if self.revision is None:
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    clean = (entry.valid and st.st_size & 0xFFFFFFFF == entry.size
+                             and st.st_mtime_ns == entry.mtime_ns and entry.ino in (0, st.st_ino & 0xFFFFFFFF))
+                    st = GitStat(st.st_size, st.st_mtime_ns, entry.blob if clean else None)
+                else:
+                    st = GitStat(entry.size, 0, entry.blob)
+                    self._blobs[path] = entry.blob
+                if max_file_size and st.st_size > max_file_size:
+                    report_skip(on_skip, path, SKIP_TOO_LARGE, f"{st.st_size} bytes > {max_file_size}")
+                    continue
+                files.append((filename, st))
+            yield dirpath, files
+
+    def read(self, filepath, on_skip=None, sniff=True):
+        """
+        Reads a file of the revision from the object store, like utils.read_bytes.
+        """
+        blob = self._blobs.get(filepath)
+        data = self._cat(blob) if blob is not None else None
+        if data is None:
+            report_skip(on_skip, filepath, SKIP_UNREADABLE, f"not in {self.revision}")
+            return None
+        if sniff and is_binary(data[:SNIFF_SIZE]):
+            report_skip(on_skip, filepath, SKIP_BINARY)
+            return None
+        return data
+
+    def count_file(self, filepath, size=None, on_skip=None):
+        """
+        Counts lines and characters of a file of the revision, like counting.count_file.
+        """
+        data = self.read(filepath, on_skip)
+        return None if data is None else count_buffer(data)
+
+    def _cat(self, blob):
+        # One long-running `git cat-file --batch`; requests are serialised across threads.
+        with self._lock:
+            if self._process is None:
+                self._process = subprocess.Popen([self.git, "-C", self.directory, "cat-file", "--batch"],
+                                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self._process.stdin.write(blob.encode() + b"\n")
+            self._process.stdin.flush()
+            header = self._process.stdout.readline().split()
+            if len(header) != 3:
+                return None
+            data = self._process.stdout.read(int(header[2]))
+            self._process.stdout.read(1)
+            return data
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process.stdout.close()
+            self._process = None
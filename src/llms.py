@@ -0,0 +1,64 @@
+"""
+Command-Line Entry Point
+
+This script bundles the generators and counters behind one command with subcommands, so that
+they can be scripted with real arguments instead of answering input() prompts.
+
+Key Features:
+- generate: llms-full.txt from a directory (generate_llms.py)
+- watch: regenerate it incrementally whenever the directory changes (watch.py)
+- toc: table of contents of a Markdown file (generate_toc.py)
+- count-lines / count-chars: line and character counts of a directory
+  (count_lines_of_code.py, count_chars_of_code.py)
+- Only the module of the chosen subcommand is imported, so "llms toc" does not pay for the scan
+  engine and "--help" does not pay for anything
+- --config selects the configuration file for every subcommand; it is read on first use
+- The arguments after the subcommand are the same as those of the individual script
+
+Usage:
+    python src/llms.py [--config FILE] <command> [arguments]
+
+Example:
+    python src/llms.py generate /path/to/project -o llms-full.txt --toc
+    python src/llms.py count-lines /path/to/project
+    python src/llms.py --config ci.yaml toc llms-full.txt -o toc.md
+"""
+
+import sys
+import argparse
+import importlib
+
+# Subcommand -> (module, one-line description). Modules are imported when their command runs.
+COMMANDS = {
+    "generate": ("generate_llms", "Generate llms-full.txt from a directory"),
+    "watch": ("watch", "Keep llms-full.txt up to date while a directory changes"),
+    "toc": ("generate_toc", "Generate a table of contents from a Markdown file"),
+    "count-lines": ("count_lines_of_code", "Count lines of code in a directory"),
+    "count-chars": ("count_chars_of_code", "Count characters of code in a directory"),
+}
+
+def main(argv=None):
+    """
+    Runs a subcommand.
+
+    Args:
+        argv (list): Arguments (default: sys.argv[1:]).
+    """
+    parser = argparse.ArgumentParser(
+        prog="llms", description="Generate llms-full.txt, tables of contents and code statistics.",
+        epilog="Run 'llms <command> --help' for the arguments of a command.")
+    parser.add_argument("--config", help="Configuration file (default: config.yaml)")
+    subparsers = parser.add_subparsers(dest="command", metavar="<command>", required=True)
+    for command, (_, description) in COMMANDS.items():
+        subparsers.add_parser(command, help=description, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+
+    if args.config:
+        # Imported here so that a bare --help stays free of the project modules.
+        from utils import use_config
+        use_config(args.config)
+    module = importlib.import_module(COMMANDS[args.command][0])
+    module.main(rest, prog=f"llms {args.command}", interactive=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Manifest Cache for Incremental Regeneration
+
+This module stores the rendered llms-full.txt section of every source file next to the output,
+so that a later run only has to re-read the files that changed. Unchanged files are copied from
+the cache instead of being read, decoded and rendered again.
+
+Key Features:
+- Two files next to the output: <output>.cache.json (the manifest) and <output>.cache.sections
+  (the rendered sections, concatenated)
+- Entries are keyed by path, size and mtime; a changed stat falls back to a SHA-256 content hash,
+  so touched-but-unchanged files are still served from the cache
+- Each entry stores the Markdown title and summary along with the rendered section
+- Deleted and renamed files simply drop out of the manifest on the next run
+- Every cached section carries a digest, so a corrupt or truncated cache is detected and the
+  affected files are rendered again
+- A version and renderer fingerprint in the manifest invalidate caches written by other versions
+
+Usage:
+    from manifest_cache import ManifestCache, check_cache
+
+    with ManifestCache("llms-full.txt.cache", directory, fingerprint) as cache:
+        ...
+    print(check_cache("llms-full.txt.cache"))
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+CACHE_VERSION = 1
+
+def cache_paths(cache_path):
+    """
+    Returns the manifest and sections file paths for a cache base path.
+
+    Args:
+        cache_path (str): Base path of the cache, usually "<output>.cache".
+
+    Returns:
+        tuple: (manifest_path, sections_path)
+    """
+    return cache_path + ".json", cache_path + ".sections"
+
+def _load_manifest(manifest_path):
+    # Returns (manifest, problem); manifest is None when it is missing or unusable.
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None, "missing"
+    except (OSError, ValueError) as e:
+        return None, f"corrupt manifest: {e}"
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("entries"), dict):
+        return None, "corrupt manifest: no entries table"
+    if manifest.get("version") != CACHE_VERSION:
+        return None, f"stale manifest: version {manifest.get('version')!r}, expected {CACHE_VERSION}"
+    return manifest, None
+
+class ManifestCache:
+    """
+    Section cache for one generation run.
+
+    Lookups read from the cache written by the previous run; sections passed through record()
+    are written to a new cache, which replaces the old one when the run completes. Lookups are
+    thread-safe so they can run on the generator's worker threads; record() must be called from
+    the thread that consumes the sections.
+    """
+
+    def __init__(self, cache_path, directory, fingerprint=""):
+        self.cache_path = cache_path
+        self.manifest_path, self.sections_path = cache_paths(cache_path)
+        self.directory = os.path.abspath(directory)
+        self.fingerprint = fingerprint
+        self.entries = {}
+        self.new_entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalid = 0
+        self._lock = threading.Lock()
+        self._old_sections = None
+        self._new_sections = None
+        self._new_offset = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+    def open(self):
+        manifest, problem = _load_manifest(self.manifest_path)
+        if manifest is not None:
+            if manifest.get("directory") != self.directory or manifest.get("fingerprint") != self.fingerprint:
+                problem = "stale manifest: generated for another directory or renderer"
+                manifest = None
+        if manifest is not None:
+            try:
+                self._old_sections = open(self.sections_path, "rb")
+                self.entries = manifest["entries"]
+            except OSError as e:
+                problem = f"corrupt cache: {e}"
+        if problem and problem != "missing":
+            logging.warning(f"Ignoring cache {self.cache_path}: {problem}")
+        self._new_sections = open(self.sections_path + ".tmp", "wb")
+
+    def close(self, commit=True):
+        if self._old_sections is not None:
+            self._old_sections.close()
+            self._old_sections = None
+        if self._new_sections is None:
+            return
+        self._new_sections.close()
+        self._new_sections = None
+        tmp_sections = self.sections_path + ".tmp"
+        if not commit:
+            os.remove(tmp_sections)
+            return
+        manifest = {
+            "version": CACHE_VERSION,
+            "directory": self.directory,
+            "fingerprint": self.fingerprint,
+            "entries": self.new_entries,
+        }
+        tmp_manifest = self.manifest_path + ".tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            # dumps() runs the C encoder; dump() encodes in Python, piece by piece.
+            f.write(json.dumps(manifest, separators=(",", ":")))
+        os.replace(tmp_sections, self.sections_path)
+        os.replace(tmp_manifest, self.manifest_path)
+
+    def _read_section(self, entry):
+        # Returns the cached section bytes, or None if they fail their digest check.
+        with self._lock:
+            self._old_sections.seek(entry["offset"])
+            data = self._old_sections.read(entry["length"])
+        if hashlib.sha256(data).hexdigest() != entry["digest"]:
+            self.invalid += 1
+            logging.warning(f"Cached section for {entry.get('path')} is corrupt; rendering it again")
+            return None
+        return data
+
+    def lookup(self, path, kind, size, mtime_ns, sha256=None):
+        """
+        Returns the cached entry and section for a file if it is unchanged.
+
+        The file is unchanged when its size and mtime match the cached entry, or, when sha256 is
+        given, when its content hash matches.
+
+        Args:
+            path (str): Path of the source file, as it appears in the output.
+            kind (str): Section kind ("markdown" or "code").
+            size (int): Current size of the file in bytes.
+            mtime_ns (int): Current modification time in nanoseconds.
+            sha256 (str): Hex SHA-256 of the file content, if already known.
+
+        Returns:
+            tuple or None: (entry, data) on a hit, where data is the UTF-8 encoded section,
+            otherwise None.
+        """
+        entry = self.entries.get(path)
+        if entry is None or entry["kind"] != kind or self._old_sections is None:
+            return None
+        if sha256 is None:
+            if entry["size"] != size or entry["mtime_ns"] != mtime_ns:
+                return None
+        elif entry["sha256"] != sha256:
+            return None
+        data = self._read_section(entry)
+        if data is None:
+            return None
+        return entry, data
+
+    def carry_over(self, entry, meta, data):
+        """
+        Copies a cache hit into the new cache and returns its text.
+
+        Args:
+            entry (dict): The entry returned by lookup().
+            meta (dict): {"size", "mtime_ns", "sha256"} of the source file.
+            data (bytes): The section bytes returned by lookup().
+
+        Returns:
+            str: The decoded section text.
+        """
+        self._new_sections.write(data)
+        self.new_entries[entry["path"]] = dict(entry, offset=self._new_offset, **meta)
+        self._new_offset += len(data)
+        return data.decode("utf-8")
+
+    def record(self, path, kind, meta, title, summary, chunks):
+        """
+        Passes a section's chunks through while copying them into the new cache.
+
+        The entry is added to the new manifest once the chunks have been fully consumed.
+
+        Args:
+            path (str): Path of the source file.
+            kind (str): Section kind.
+            meta (dict): {"size", "mtime_ns", "sha256"} of the source file.
+            title (str): Section title.
+            summary (str): Markdown summary line, or None.
+            chunks (iterable): Rendered chunks of the section.
+
+        Yields:
+            str: The chunks, unchanged.
+        """
+        digest = hashlib.sha256()
+        offset = self._new_offset
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            digest.update(data)
+            self._new_sections.write(data)
+            self._new_offset += len(data)
+            yield chunk
+        self.new_entries[path] = dict(
+            meta,
+            path=path,
+            kind=kind,
+            title=title,
+            summary=summary,
+            offset=offset,
+            length=self._new_offset - offset,
+            digest=digest.hexdigest(),
+        )
+
+def check_cache(cache_path, directory=None, fingerprint=None):
+    """
+    Checks a cache for corruption and staleness without modifying it.
+
+    Args:
+        cache_path (str): Base path of the cache, usually "<output>.cache".
+        directory (str): If given, also report entries whose source file has changed or been
+            deleted, and whether the cache was generated for this directory.
+        fingerprint (str): If given, also report whether the cache was written with these
+            rendering settings; a cache written with others is discarded by the next run.
+
+    Returns:
+        dict: {"status": "ok" | "missing" | "corrupt" | "stale", "entries": int, "problems": [str]}
+    """
+    manifest_path, sections_path = cache_paths(cache_path)
+    manifest, problem = _load_manifest(manifest_path)
+    if manifest is None:
+        status = "missing" if problem == "missing" else problem.split(" ", 1)[0]
+        return {"status": status, "entries": 0, "problems": [problem]}
+
+    entries = manifest["entries"]
+    corrupt = []
+    stale = []
+    if directory is not None and manifest.get("directory") != os.path.abspath(directory):
+        stale.append(f"generated for {manifest.get('directory')}")
+    if fingerprint is not None and manifest.get("fingerprint") != fingerprint:
+        stale.append(f"generated with other settings: {manifest.get('fingerprint')}")
+    try:
+        with open(sections_path, "rb") as f:
+            for path, entry in entries.items():
+                f.seek(entry["offset"])
+                data = f.read(entry["length"])
+                if hashlib.sha256(data).hexdigest() != entry["digest"]:
+                    corrupt.append(f"bad digest: {path}")
+                if directory is None:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    stale.append(f"deleted: {path}")
+                    continue
+                if st.st_size != entry["size"] or st.st_mtime_ns != entry["mtime_ns"]:
+                    stale.append(f"changed: {path}")
+    except (OSError, KeyError, TypeError) as e:
+        corrupt.append(f"unreadable sections: {e}")
+
+    status = "corrupt" if corrupt else "stale" if stale else "ok"
+    return {"status": status, "entries": len(entries), "problems": corrupt + stale}
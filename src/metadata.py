@@ -0,0 +1,173 @@
+"""
+Markdown Metadata Extraction
+
+This module finds the title and summary of a Markdown document for its llms-full.txt section.
+Only a bounded prefix of the document is examined, so the cost per file does not grow with its
+size, and the body is emitted as slices of the original text around the lines that were taken
+out instead of as rebuilt copies of the whole document.
+
+Key Features:
+- Title: the first "# " heading, or title: from YAML front matter
+- Summary: the first "> " quote line, or description: from YAML front matter
+- Only lines starting in the first METADATA_PREFIX characters are considered
+- YAML front matter (a leading "---" block of "key:" lines) is read with a small scalar parser,
+  without importing PyYAML, and left out of the body; a leading "---" followed by prose is a
+  thematic break and stays in the body
+- body_slices() returns the body without the extracted lines, stripped, as slices of the
+  original text; a document with nothing to take out is returned as the same string object
+- read_prefix() pulls just enough of a chunk stream for extraction, so large documents can be
+  rendered while streaming the rest
+
+Usage:
+    from metadata import extract_metadata, body_slices
+
+    meta = extract_metadata(content)
+    chunks = body_slices(content, meta.removed)
+"""
+
+import re
+from collections import namedtuple
+
+# Characters of a document examined for metadata; lines starting after this are never
+# taken as the title or summary.
+METADATA_PREFIX = 8192
+
+_FRONT_MATTER = re.compile(r"---[ \t]*\n(.*?\n)??(?:---|\.\.\.)[ \t]*(?:\n|\Z)", re.DOTALL)
+# A leading "---" block is front matter if it has a "key:" line and every other line is blank,
+# indented, a list item or a comment; otherwise it starts with a thematic break.
+_YAML_KEY = r"""(?:[\w.-]+|"[^"\n]*"|'[^'\n]*')[ \t]*:(?:[ \t]|$)"""
+_FRONT_MATTER_KEY = re.compile(rf"^{_YAML_KEY}", re.MULTILINE)
+_FRONT_MATTER_OTHER = re.compile(rf"^(?!{_YAML_KEY}|[ \t]|-[ \t]|#|$)", re.MULTILINE)
+_FRONT_MATTER_FIELD = re.compile(r"^(title|description)[ \t]*:[ \t]*(.*?)[ \t]*$", re.MULTILINE)
+_TITLE = re.compile(r"^#[ \t]+(.+)", re.MULTILINE)
+_SUMMARY = re.compile(r"^>[ \t]+(.+)", re.MULTILINE)
+_NON_SPACE = re.compile(r"\S")
+
+# title and summary are None when the document has none; removed lists the (start, end) spans
+# of the text that supplied them, in document order.
+Metadata = namedtuple("Metadata", ["title", "summary", "removed"])
+
+def _scalar(value):
+    # A plain, single-quoted or double-quoted YAML scalar on one line; None for anything else.
+    if not value or value[0] in "|>[{&*!" or value.startswith("#"):
+        return None
+    if value[0] == '"' and value.endswith('"') and len(value) > 1:
+        value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    elif value[0] == "'" and value.endswith("'") and len(value) > 1:
+        value = value[1:-1].replace("''", "'")
+    else:
+        value = value.split(" #", 1)[0].rstrip()
+    return value.strip() or None
+
+def _prefix_end(text, limit):
+    # End of the line that contains position limit, so that lines are never cut in two.
+    if len(text) <= limit:
+        return len(text)
+    end = text.find("\n", limit)
+    return len(text) if end < 0 else end
+
+def extract_metadata(text, limit=METADATA_PREFIX):
+    """
+    Finds the title and summary of a Markdown document.
+
+    Front matter values take precedence over the heading and quote line; the front matter block
+    and any heading or quote line used are listed in removed.
+
+    Args:
+        text (str): The document, or at least its first limit characters up to the end of
+            that line (see read_prefix()).
+        limit (int): Only lines starting within this many characters are considered.
+
+    Returns:
+        Metadata: (title, summary, removed).
+    """
+    end = _prefix_end(text, limit)
+    title = summary = None
+    removed = []
+    start = 0
+    front = _FRONT_MATTER.match(text, 0, end)
+    if front is not None and front.group(1) and (not _FRONT_MATTER_KEY.search(front.group(1))
+                                                 or _FRONT_MATTER_OTHER.search(front.group(1))):
+        front = None
+    if front is not None:
+        for key, value in _FRONT_MATTER_FIELD.findall(front.group(1) or ""):
+            value = _scalar(value)
+            if key == "title" and title is None:
+                title = value
+            elif key == "description" and summary is None:
+                summary = value
+        removed.append(front.span())
+        start = front.end()
+    if title is None:
+        match = _TITLE.search(text, start, end)
+        if match is not None:
+            title = match.group(1).strip()
+            removed.append(match.span())
+    if summary is None:
+        match = _SUMMARY.search(text, start, end)
+        if match is not None:
+            summary = match.group(1).strip()
+            removed.append(match.span())
+    removed.sort()
+    return Metadata(title, summary, removed)
+
+def body_slices(text, removed, strip=True):
+    """
+    Returns the text without the removed spans as a list of slices of it.
+
+    Args:
+        text (str): The document.
+        removed (list): Sorted, non-overlapping (start, end) spans to leave out.
+        strip (bool): Drop leading and trailing whitespace of the result, as str.strip() would.
+
+    Returns:
+        list: Strings whose concatenation is the remaining text.
+    """
+    spans = []
+    position = 0
+    for start, end in removed:
+        if start > position:
+            spans.append((position, start))
+        position = max(position, end)
+    if position < len(text):
+        spans.append((position, len(text)))
+    if strip:
+        # Leading whitespace: find the first non-space character without copying.
+        while spans:
+            first = _NON_SPACE.search(text, *spans[0])
+            if first is not None:
+                spans[0] = (first.start(), spans[0][1])
+                break
+            spans.pop(0)
+        # Trailing whitespace: step back over it; it is short in practice.
+        while spans:
+            start, end = spans[-1]
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if end > start:
+                spans[-1] = (start, end)
+                break
+            spans.pop()
+    # A slice covering the whole string is the string itself, not a copy.
+    return [text[start:end] for start, end in spans]
+
+def read_prefix(chunks, limit=METADATA_PREFIX):
+    """
+    Reads from a chunk iterator until it holds the first limit characters up to the end of
+    that line, or the whole stream if it is shorter.
+
+    Args:
+        chunks (iterator): Decoded content chunks; the remaining ones are left in it.
+        limit (int): As for extract_metadata().
+
+    Returns:
+        str: The text read.
+    """
+    pieces = []
+    size = 0
+    for chunk in chunks:
+        pieces.append(chunk)
+        size += len(chunk)
+        if size > limit and "\n" in chunk[max(0, limit - size + len(chunk)):]:
+            break
+    return "".join(pieces)
@@ -0,0 +1,275 @@
+"""
+Per-Phase Profiling
+
+This module collects the statistics behind --profile in generate_llms, count_lines_of_code,
+count_chars_of_code and generate_toc: where the time of a run goes and what it read and wrote.
+It is opt-in; when no Profile is passed, the scan and the writers run their plain code paths.
+
+Key Features:
+- Cumulative time per phase: walk, read, decode, count, hash, cache, render (title and
+  summary extraction), stream (lazily read sections), write, and toc for the TOC builder
+- Bytes read and written, and file counts and bytes by extension
+- Decode fallbacks: files that are not valid UTF-8 and were decoded as Latin-1
+- Skipped files with their reasons, from the scan result
+- The N slowest and N largest files
+- Human-readable summary (summary()) and JSON for dashboards (to_dict(), write_json())
+
+With several workers, phases measured on worker threads add up across threads, so their sum
+can exceed the wall time.
+
+Usage:
+    from profiling import Profile
+
+    profile = Profile()
+    result = generate_llms_full("path/to/project", profile=profile)
+    profile.finish(result)
+    print(profile.summary())
+"""
+
+import os
+import json
+import heapq
+import threading
+from time import perf_counter
+
+PROFILE_VERSION = 1
+
+# Number of slowest and largest files kept, and of sample paths listed per category.
+DEFAULT_TOP = 10
+
+class Profile:
+    """
+    Statistics of one run.
+
+    Attributes:
+        phases (dict): Phase name -> [seconds, calls].
+        bytes_read (int): Bytes of the files that were read (cache hits are not read).
+        bytes_written (int): UTF-8 bytes written to the output.
+        extensions (dict): Extension -> [files, bytes] for the files that were loaded.
+        decode_fallbacks (list): Paths of files decoded as Latin-1.
+        skipped (list): utils.SkippedFile records, filled in by finish().
+    """
+
+    def __init__(self, name=None, top=DEFAULT_TOP):
+        """
+        Args:
+            name (str): What was run, e.g. the script name.
+            top (int): Number of slowest and largest files to keep.
+        """
+        self.name = name
+        self.top = top
+        self.phases = {}
+        self.files = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.extensions = {}
+        self.decode_fallbacks = []
+        self.skipped = []
+        self.wall = None
+        self._slowest = []
+        self._largest = []
+        self._lock = threading.Lock()
+        self._start = perf_counter()
+
+    def add(self, phase, seconds, calls=1):
+        """
+        Adds time to a phase.
+        """
+        with self._lock:
+            entry = self.phases.get(phase)
+            if entry is None:
+                self.phases[phase] = [seconds, calls]
+            else:
+                entry[0] += seconds
+                entry[1] += calls
+
+    def timed(self, phase, func):
+        """
+        Returns func wrapped so that the time of every call is added to phase.
+        """
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, perf_counter() - start)
+        return wrapper
+
+    def file(self, path, size, seconds, read=True, encoding=None):
+        """
+        Records one loaded file.
+
+        Args:
+            path (str): The file.
+            size (int): Its size in bytes.
+            seconds (float): Time spent loading it.
+            read (bool): Whether its content was read (False for cache hits).
+            encoding (str): The encoding it was decoded with, if it was decoded.
+        """
+        ext = os.path.splitext(path)[1].lower() or "(none)"
+        with self._lock:
+            self.files += 1
+            if read:
+                self.bytes_read += size
+            entry = self.extensions.setdefault(ext, [0, 0])
+            entry[0] += 1
+            entry[1] += size
+            if encoding == "latin-1":
+                self.decode_fallbacks.append(path)
+            _push(self._slowest, self.top, (seconds, path))
+            _push(self._largest, self.top, (size, path))
+
+    def track(self, section):
+        """
+        Returns the section with its chunks wrapped so that the time spent producing them is
+        added to "stream" and their size to bytes_written. Use for sections about to be written.
+        """
+        return section._replace(chunks=self._track(section.chunks))
+
+    def _track(self, chunks):
+        chunks = iter(chunks)
+        written = 0
+        stream = 0.0
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                finally:
+                    stream += perf_counter() - start
+                written += len(chunk) if chunk.isascii() else len(chunk.encode("utf-8", "surrogatepass"))
+                yield chunk
+        finally:
+            self.add("stream", stream)
+            self.bytes_written += written
+
+    def write(self, write, section):
+        """
+        Writes a tracked section with write(section) and adds the time to "write", leaving out
+        the time spent producing its chunks, which track() adds to "stream".
+        """
+        stream = self.phases.get("stream", (0.0,))[0]
+        start = perf_counter()
+        write(section)
+        elapsed = perf_counter() - start
+        self.add("write", elapsed - (self.phases.get("stream", (0.0,))[0] - stream))
+
+    def finish(self, result=None):
+        """
+        Ends the run: records the wall time and, from a scan.ScanResult, the skipped files.
+        """
+        self.wall = perf_counter() - self._start
+        if result is not None:
+            self.skipped = list(result.skipped)
+        return self
+
+    def to_dict(self):
+        """
+        Returns the statistics as a JSON-serialisable dict.
+        """
+        by_reason = {}
+        for skipped in self.skipped:
+            by_reason[skipped.reason] = by_reason.get(skipped.reason, 0) + 1
+        return {
+            "version": PROFILE_VERSION,
+            "name": self.name,
+            "wall_seconds": _round(self.wall),
+            "phases": {phase: {"seconds": _round(seconds), "calls": calls}
+                       for phase, (seconds, calls) in sorted(self.phases.items(), key=lambda item: -item[1][0])},
+            "files": self.files,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "extensions": {ext: {"files": files, "bytes": size}
+                           for ext, (files, size) in sorted(self.extensions.items(), key=lambda item: -item[1][1])},
+            "decode_fallbacks": {"count": len(self.decode_fallbacks),
+                                 "paths": sorted(self.decode_fallbacks)[:self.top]},
+            "skipped": {"count": len(self.skipped), "by_reason": by_reason,
+                        "files": [{"path": s.path, "reason": s.reason, "detail": s.detail}
+                                  for s in self.skipped[:self.top]]},
+            "slowest": [{"path": path, "seconds": _round(seconds)}
+                        for seconds, path in sorted(self._slowest, reverse=True)],
+            "largest": [{"path": path, "bytes": size} for size, path in sorted(self._largest, reverse=True)],
+        }
+
+    def summary(self):
+        """
+        Returns a human-readable multi-line summary.
+        """
+        data = self.to_dict()
+        lines = [f"--- Profile{' of ' + self.name if self.name else ''} ---"]
+        if data["wall_seconds"] is not None:
+            lines.append(f"Wall time: {data['wall_seconds']:.3f}s")
+        lines.append(f"Files: {data['files']}, read {_size(data['bytes_read'])}, "
+                     f"wrote {_size(data['bytes_written'])}")
+        if data["phases"]:
+            lines.append("Phases (cumulative):")
+            for phase, entry in data["phases"].items():
+                lines.append(f"  {phase:<10}{entry['seconds']:>10.3f}s  {entry['calls']:>8} calls")
+        if data["extensions"]:
+            lines.append("By extension: " + ", ".join(
+                f"{ext} {entry['files']} ({_size(entry['bytes'])})" for ext, entry in data["extensions"].items()))
+        if data["decode_fallbacks"]["count"]:
+            lines.append(f"Decoded as Latin-1: {data['decode_fallbacks']['count']} files")
+        if data["skipped"]["count"]:
+            lines.append(f"Skipped: {data['skipped']['count']} files (" + ", ".join(
+                f"{reason}: {count}" for reason, count in sorted(data["skipped"]["by_reason"].items())) + ")")
+        if data["slowest"]:
+            lines.append("Slowest files:")
+            lines.extend(f"  {entry['seconds'] * 1000:>9.2f} ms  {entry['path']}" for entry in data["slowest"])
+        if data["largest"]:
+            lines.append("Largest files:")
+            lines.extend(f"  {_size(entry['bytes']):>10}  {entry['path']}" for entry in data["largest"])
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        """
+        Writes to_dict() to a JSON file.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+def _push(heap, size, item):
+    # Keeps the size largest items in a min-heap.
+    if len(heap) < size:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+def _round(seconds):
+    return None if seconds is None else round(seconds, 6)
+
+def _size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def add_arguments(parser):
+    """
+    Adds --profile and --profile-json to a script's argument parser.
+    """
+    parser.add_argument("--profile", action="store_true",
+                        help="Print where the time went: phases, bytes, slowest and largest files")
+    parser.add_argument("--profile-json", metavar="FILE", help="Write the profile as JSON to FILE")
+
+def from_arguments(args, name):
+    """
+    Returns a Profile if --profile or --profile-json was given, else None.
+    """
+    if args.profile or args.profile_json:
+        return Profile(name)
+    return None
+
+def report(profile, args, result=None):
+    """
+    Finishes a profile and emits it as requested by --profile and --profile-json.
+    """
+    if profile is None:
+        return
+    profile.finish(result)
+    if args.profile:
+        print(profile.summary())
+    if args.profile_json:
+        profile.write_json(args.profile_json)
@@ -0,0 +1,636 @@
+"""
+Unified Single-Pass Scanner
+
+This module is the scan engine shared by the llms-full.txt generator and the line and character
+counters. It walks the directory tree once and reads every file once, then hands the same
+decoded content to every consumer that wants it: the section renderers of generate_llms and the
+line and character counters.
+
+Key Features:
+- One pruning walk (walker.py) and one read per file, however many outputs are requested
+- Sections are produced in the generator's sorted order; files that are only counted are read
+  after them
+- Optional thread pool (workers) with bounded prefetch and ordered emission
+- Files that are only counted are never decoded: counting.py works on their raw bytes
+- Every file is read once; binary, oversized and unreadable files are skipped and reported in
+  ScanResult.skipped
+- Large files are streamed in chunks and counted as they pass through
+- Integrates with the manifest cache: unchanged files are neither read nor re-rendered, and their
+  line and character counts come from the cache as well
+- Optional per-phase profiling (profiling.Profile): the file operations are timed through a
+  table of functions that holds the plain functions when no profile is given
+- Optional content-addressed deduplication (dedup): files identical to an earlier file of the
+  same group are rendered as a short reference to it instead of in full
+- Optional git enumeration (gitsource.py): files are listed from the git index instead of the
+  directory tree, and their blob ids stand in for content hashes in the cache and dedup; a
+  revision can be scanned straight from the object store
+- Archives (archive.py): a .tar[.gz|.bz2|.xz] or .zip path in place of the directory is scanned
+  in place, without extracting it
+- Optional order hook: a caller such as rank.Ranker may choose and reorder the files of each
+  group after the walk, reading only the first bytes of files through the scan's file operations
+
+Usage:
+    python -m src.scan [directory] [-o output_file] [--no-llms] [--workers N]
+
+Example:
+    python -m src.scan /path/to/project -o llms-full.txt
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+from time import perf_counter
+from collections import namedtuple
+from functools import partial
+from utils import (code_extensions, ordered_map, decode_text, detect_encoding, iter_text_chunks,
+                   read_bytes, read_head, report_skip, setup_logging, use_config, SKIP_UNREADABLE)
+from walker import walk_files
+from counting import count_buffer, count_file
+from count_table import CountTable
+
+# Files larger than this many bytes are streamed in CHUNK_SIZE pieces instead of being read whole.
+STREAM_THRESHOLD = 1 << 20
+CHUNK_SIZE = 1 << 16
+
+# Files smaller than this are always rendered in full, since a reference would be no shorter.
+DEDUP_MIN_SIZE = 128
+
+# Characters str.splitlines() treats as line boundaries ("\r\n" never survives newline translation).
+_LINE_BREAKS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+
+# One rendered unit of llms-full.txt. kind is "heading", "markdown" or "code"; path is None for
+# headings; chunks is an iterable of strings whose concatenation is the rendered text; summary is
+# the Markdown summary line when there is one.
+Section = namedtuple("Section", ["kind", "path", "title", "chunks", "summary"], defaults=(None,))
+
+# A family of files rendered into llms-full.txt. matches(filename) selects the files; heading is
+# the Section emitted before them; render(filepath, content) and render_stream(filepath, chunks)
+# build a file's Section from its whole content or from a lazy iterable of text chunks;
+# render_duplicate(filepath, original) builds the reference Section for a file whose content is
+# identical to the earlier section original (None: the group is never deduplicated).
+SectionGroup = namedtuple("SectionGroup", ["kind", "heading", "matches", "render", "render_stream",
+                                           "render_duplicate"], defaults=(None,))
+
+class ScanResult:
+    """
+    Line and character counts gathered during a scan.
+
+    Attributes:
+        total_lines (int): Sum of all per-file line counts.
+        total_chars (int): Sum of all per-file character counts.
+        counts (CountTable): The per-file counts, stored in columns (see count_table.py).
+        line_counts (CountView): Read-only mapping of absolute file path -> number of lines.
+        char_counts (CountView): Read-only mapping of absolute file path -> number of characters.
+        skipped (list): utils.SkippedFile records for files left out, with the reason.
+        duplicates (dict): Path of each file rendered as a reference -> path of the earlier
+            file with the same content (only filled in when deduplicating).
+    """
+
+    def __init__(self):
+        self.total_lines = 0
+        self.total_chars = 0
+        self.counts = CountTable()
+        self.line_counts = self.counts.view("lines")
+        self.char_counts = self.counts.view("chars")
+        self.skipped = []
+        self.duplicates = {}
+
+    def skip_summary(self):
+        """
+        Returns a one-line summary of skipped files by reason, or "" if none were skipped.
+        """
+        by_reason = {}
+        for skipped in self.skipped:
+            by_reason[skipped.reason] = by_reason.get(skipped.reason, 0) + 1
+        if not by_reason:
+            return ""
+        details = ", ".join(f"{reason}: {count}" for reason, count in sorted(by_reason.items()))
+        return f"Skipped {len(self.skipped)} files ({details})"
+
+    def add(self, path, lines=None, chars=None):
+        if lines is None and chars is None:
+            return
+        if lines is not None:
+            self.total_lines += lines
+        if chars is not None:
+            self.total_chars += chars
+        self.counts.add(path, lines, chars)
+
+def _count_chunks(chunks, counts):
+    # Passes chunks through while counting them; counts["lines"] and counts["chars"] are set once
+    # the chunks have been exhausted, and equal len(text.splitlines()) and len(text).
+    breaks = 0
+    chars = 0
+    last = ""
+    for chunk in chunks:
+        if chunk:
+            lines = len(chunk.splitlines())
+            breaks += lines if chunk[-1] in _LINE_BREAKS else lines - 1
+            chars += len(chunk)
+            last = chunk[-1]
+        yield chunk
+    counts["lines"] = breaks + (1 if last and last not in _LINE_BREAKS else 0)
+    counts["chars"] = chars
+
+def collect(directory, groups=(), count=False, honor_gitignore=False, on_skip=None, ignore=None, source=None):
+    """
+    Walks a directory once and sorts its files into section groups and count-only files.
+
+    Exclusions and the size limit from config.yaml are applied by the walker.
+
+    Args:
+        directory (str): The root directory to scan.
+        groups (sequence): SectionGroups; a file belongs to the first group that matches it.
+        count (bool): Whether to also collect files with utils.code_extensions() for counting.
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree.
+        on_skip (callable): Called with a utils.SkippedFile for each file over the size limit.
+        ignore (callable): Called with the absolute path of every file; files for which it
+            returns True are left out, e.g. the output being written inside the tree.
+        source (GitSource or ArchiveSource): List the files tracked by git, or the members of an
+            archive, instead of walking the tree; honor_gitignore does not apply to them.
+
+    Returns:
+        tuple: (group_files, counted, stats) where group_files is a list of sorted path lists,
+        one per group, counted maps each path to count to its absolute path, and stats maps
+        every collected path to the stat result obtained while walking.
+    """
+    group_files = [[] for _ in groups]
+    extensions = code_extensions() if count else ()
+    counted = {}
+    stats = {}
+    abs_root = os.path.abspath(directory)
+
+    if source is not None:
+        walk = source.walk(on_skip=on_skip)
+    else:
+        walk = walk_files(directory, honor_gitignore=honor_gitignore, on_skip=on_skip)
+    for root, files in walk:
+        rel = os.path.relpath(root, directory)
+        abs_prefix = os.path.join(abs_root if rel == os.curdir else os.path.join(abs_root, rel), "")
+        prefix = os.path.join(root, "")
+        for filename, st in files:
+            if ignore is not None and ignore(abs_prefix + filename):
+                continue
+            filepath = prefix + filename
+            collected = False
+            for index, group in enumerate(groups):
+                if group.matches(filename):
+                    group_files[index].append(filepath)
+                    collected = True
+                    break
+            if count and filename.lower().endswith(extensions):
+                counted[filepath] = abs_prefix + filename
+                collected = True
+            if collected and st is not None:
+                stats[filepath] = st
+
+    # Sort files for consistent output
+    for paths in group_files:
+        paths.sort()
+    want = getattr(source, "want", None)
+    if want is not None:
+        # Only the files collected here are read; the archive buffers nothing else.
+        want([path for paths in group_files for path in paths] + list(counted))
+    return group_files, counted, stats
+
+def _file_digest(filepath, opener=None):
+    # SHA-256 of a file's raw bytes, read in CHUNK_SIZE blocks, or None if it cannot be read.
+    # opener opens archive members (see utils.read_bytes).
+    digest = hashlib.sha256()
+    try:
+        with open(filepath, "rb") if opener is None else opener(filepath) as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def _dedup_sizes(files, stats):
+    # Sizes shared by at least two files of a group; only files of these sizes can be duplicates.
+    seen = set()
+    shared = set()
+    for path in files:
+        st = stats.get(path)
+        if st is not None and st.st_size >= DEDUP_MIN_SIZE:
+            if st.st_size in seen:
+                shared.add(st.st_size)
+            seen.add(st.st_size)
+    return shared
+
+class _DedupIndex:
+    # Finds earlier files with identical content, by size first and then by digest (SHA-256, or
+    # the git blob id when scanning with git). Digests of streamed files are only computed once
+    # another file of the same size turns up.
+
+    def __init__(self, file_digest=_file_digest):
+        self._by_size = {}
+        self._file_digest = file_digest
+
+    def match(self, kind, size, section, counts, digest=None):
+        # Returns (section, counts) of an earlier identical file, or remembers this one (section
+        # without its chunks) and returns None.
+        candidates = self._by_size.setdefault((kind, size), [])
+        if candidates:
+            if digest is None:
+                digest = self._file_digest(section.path)
+            for candidate in candidates:
+                if candidate[0] is None:
+                    candidate[0] = self._file_digest(candidate[1].path)
+                if digest is not None and candidate[0] == digest:
+                    return candidate[1], candidate[2]
+        candidates.append([digest, section._replace(chunks=()), counts])
+        return None
+
+# Result of loading one file: section is a Section or None; counts is a dict that may be filled
+# in later for streamed files; meta is the cache key data, or None when the cache is bypassed;
+# hit is the (entry, data) pair of a cache hit; digest is the SHA-256 of the content when it was
+# computed while loading; encoding is the encoding the content was decoded with.
+_Loaded = namedtuple("_Loaded", ["filepath", "section", "counts", "meta", "hit", "digest", "encoding"],
+                     defaults=(None, None))
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+# The file operations used by _load, and head(filepath, size) for the order hook of iter_scan
+# (None where reading the start of a file costs as much as reading all of it). A profiled scan
+# swaps in timed versions (see _profile_ops).
+_Ops = namedtuple("_Ops", ["read", "decode", "detect", "count", "count_file", "digest", "lookup", "chunks",
+                           "head"])
+_PLAIN_OPS = _Ops(read_bytes, decode_text, detect_encoding, count_buffer, count_file, _sha256, None,
+                  iter_text_chunks, read_head)
+
+def _profile_ops(profile, cache, ops=_PLAIN_OPS):
+    return _Ops(
+        profile.timed("read", ops.read),
+        profile.timed("decode", ops.decode),
+        profile.timed("decode", ops.detect) if ops.detect is not None else None,
+        profile.timed("count", ops.count),
+        profile.timed("read+count", ops.count_file),
+        profile.timed("hash", ops.digest),
+        profile.timed("cache", cache.lookup) if cache is not None else None,
+        ops.chunks,
+        ops.head,
+    )
+
+def _archive_ops(source, ops=_PLAIN_OPS):
+    # Members are opened through the archive; large ones are still streamed.
+    return ops._replace(read=partial(read_bytes, opener=source.open),
+                        detect=partial(detect_encoding, opener=source.open),
+                        count_file=partial(count_file, opener=source.open),
+                        chunks=partial(iter_text_chunks, opener=source.open),
+                        head=None if source.sequential else partial(read_head, opener=source.open))
+
+def _git_ops(source, ops=_PLAIN_OPS):
+    # Content keys become git blob ids, so that the ids in the index can stand in for hashing.
+    # A revision is read from the object store and never streamed (detect is None).
+    from gitsource import blob_id
+
+    ops = ops._replace(digest=blob_id)
+    if source.revision is not None:
+        ops = ops._replace(read=source.read, detect=None, count_file=source.count_file, head=None)
+    return ops
+
+def _profile_load(profile, load, stats, filepath):
+    # Times a whole file load for the slowest-files list, and records what was read.
+    start = perf_counter()
+    loaded = load(filepath)
+    seconds = perf_counter() - start
+    st = stats.get(filepath)
+    if loaded is not None:
+        profile.file(filepath, st.st_size if st is not None else 0, seconds,
+                     read=loaded.hit is None, encoding=loaded.encoding)
+    return loaded
+
+def _load(group, counting, cache, stats, on_skip, dedup_sizes, ops, filepath):
+    st = stats.get(filepath)
+    if st is None:
+        try:
+            st = os.stat(filepath)
+        except OSError as e:
+            report_skip(on_skip, filepath, SKIP_UNREADABLE, str(e))
+            return None
+
+    if group is None:
+        counted = ops.count_file(filepath, size=st.st_size, on_skip=on_skip)
+        if counted is None:
+            return None
+        return _Loaded(filepath, None, dict(zip(("lines", "chars"), counted)), None, None)
+
+    # The git blob id of the content, when the index or revision vouches for it.
+    blob = getattr(st, "blob", None)
+    if st.st_size > STREAM_THRESHOLD and ops.detect is not None:
+        encoding = ops.detect(filepath, CHUNK_SIZE, on_skip)
+        if encoding is None:
+            return None
+        counts = {}
+        chunks = ops.chunks(filepath, encoding, CHUNK_SIZE)
+        if counting:
+            chunks = _count_chunks(chunks, counts)
+        return _Loaded(filepath, group.render_stream(filepath, chunks), counts, None, None, blob,
+                       encoding)
+
+    meta = None
+    if cache is not None and group is not None:
+        lookup = ops.lookup or cache.lookup
+        meta = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        hit = lookup(filepath, group.kind, st.st_size, st.st_mtime_ns, blob)
+        if hit is not None and (not counting or "lines" in hit[0]):
+            meta["sha256"] = hit[0]["sha256"]
+            return _Loaded(filepath, None, {}, meta, hit, meta["sha256"])
+
+    data = ops.read(filepath, on_skip)
+    if data is None:
+        return None
+    if meta is not None:
+        if blob is None:
+            meta["sha256"] = ops.digest(data)
+            hit = lookup(filepath, group.kind, st.st_size, st.st_mtime_ns, meta["sha256"])
+            if hit is not None and (not counting or "lines" in hit[0]):
+                return _Loaded(filepath, None, {}, meta, hit, meta["sha256"])
+        else:
+            meta["sha256"] = blob
+        digest = meta["sha256"]
+    elif dedup_sizes and st.st_size in dedup_sizes:
+        digest = blob or ops.digest(data)
+    else:
+        digest = None
+
+    counts = {}
+    if counting:
+        counts["lines"], counts["chars"] = ops.count(data)
+        if meta is not None:
+            meta.update(counts)
+    content, encoding = ops.decode(data)
+    del data
+    return _Loaded(filepath, group.render(filepath, content), counts, meta, None, digest, encoding)
+
+def _add_counts(result, path, counts, count_lines, count_chars):
+    result.add(
+        path,
+        counts.get("lines") if count_lines else None,
+        counts.get("chars") if count_chars else None,
+    )
+
+def _finish_counts(chunks, result, path, counts, count_lines, count_chars):
+    # Records a streamed file's counts once its section has been consumed.
+    yield from chunks
+    _add_counts(result, path, counts, count_lines, count_chars)
+
+def iter_scan(directory, groups=(), count_lines=False, count_chars=False, workers=1, cache=None, result=None,
+              honor_gitignore=False, dedup=False, profile=None, ignore=None, git=False, order=None):
+    """
+    Scans a directory once, yielding rendered sections and filling in line and character counts.
+
+    Sections are yielded group by group, each group preceded by its heading and its files in
+    sorted path order. Files that are only counted are read after all sections. Counts of a
+    streamed file are recorded once its section's chunks have been consumed.
+
+    Args:
+        directory (str): The root directory to scan.
+        groups (sequence): SectionGroups to render (default: none, counting only).
+        count_lines (bool): Record per-file line counts in result.
+        count_chars (bool): Record per-file character counts in result.
+        workers (int): Number of threads used to read files (default: 1, serial).
+        cache (ManifestCache): Open manifest cache to serve unchanged files from (default: None).
+        result (ScanResult): Receives the counts (default: a new, discarded ScanResult).
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree.
+        dedup (bool): Render files whose content is identical to an earlier file of the same
+            group with the group's render_duplicate. The first file in output order is always
+            the one rendered in full, so the output does not depend on workers.
+        profile (profiling.Profile): Collects per-phase timings and file statistics.
+        ignore (callable): Leaves out files whose absolute path it returns True for (see collect).
+        git (bool or str): True lists the files tracked in the git index instead of walking the
+            tree; a revision (commit, branch, tag or tree id) scans that revision's files from
+            the object store without a checkout. See gitsource.py.
+        order (callable): Chooses and orders the files to render: called as
+            order(directory, group_files, stats, head) with the sorted path lists of collect(),
+            its stats and a function that reads the first bytes of a file (head(path, size);
+            None for compressed tar streams and git revisions, where that costs a full read),
+            it returns the path lists to render, in output order (see rank.Ranker). Files it
+            leaves out are still counted.
+
+    directory may also be a tar or zip archive (see archive.is_archive), which is scanned in
+    place as if it had been extracted; paths are then "<archive>/<member path>".
+
+    Yields:
+        Section: The rendered sections, in output order.
+
+    Raises:
+        ValueError: If git is set and directory is not in a git work tree, or the revision is
+            unknown; or if an archive cannot be read.
+    """
+    if result is None:
+        result = ScanResult()
+    source, ops, file_digest = open_source(directory, git)
+    try:
+        yield from _iter_scan(directory, groups, count_lines, count_chars, workers, cache, result,
+                              honor_gitignore, dedup, profile, ignore, source, ops, file_digest, order)
+    finally:
+        if source is not None:
+            source.close()
+
+def open_source(directory, git=False):
+    """
+    Opens the source of the files to scan: the git index or a revision, an archive, or None for
+    a plain directory.
+
+    Args:
+        directory (str): The root directory, or a tar or zip archive.
+        git (bool or str): As for iter_scan.
+
+    Returns:
+        tuple: (source, ops, file_digest): the source (close it when done), the file operations
+        reading through it (ops.count_file counts one file) and the content digest of a file.
+
+    Raises:
+        ValueError: If git is set and directory is not in a git work tree, or the revision is
+            unknown; or if an archive cannot be read.
+    """
+    if git:
+        # Imported here so that plain directory runs do not pay for it.
+        from gitsource import GitSource, file_blob_id
+
+        source = GitSource(directory, None if git is True else git)
+        return source, _git_ops(source), file_blob_id
+    if not os.path.isdir(directory):
+        from archive import ArchiveSource, is_archive
+
+        if is_archive(directory):
+            source = ArchiveSource(directory)
+            return source, _archive_ops(source), partial(_file_digest, opener=source.open)
+    return None, _PLAIN_OPS, _file_digest
+
+# The body of iter_scan, run while the git source (if any) is open.
+def _iter_scan(directory, groups, count_lines, count_chars, workers, cache, result, honor_gitignore, dedup,
+               profile, ignore, source, ops, file_digest, order):
+    counting = count_lines or count_chars
+    if getattr(source, "sequential", False):
+        # A compressed tar stream is read in order; threads would only make it seek back.
+        workers = 1
+    if profile is None:
+        group_files, counted, stats = collect(directory, groups, counting, honor_gitignore, result.skipped.append,
+                                              ignore, source)
+    else:
+        ops = _profile_ops(profile, cache, ops)
+        groups = [group._replace(render=profile.timed("render", group.render)) for group in groups]
+        group_files, counted, stats = profile.timed("walk", collect)(directory, groups, counting, honor_gitignore,
+                                                                     result.skipped.append, ignore, source)
+    if order is not None:
+        if profile is not None:
+            order = profile.timed("rank", order)
+        group_files = order(directory, group_files, stats, ops.head)
+
+    jobs = [(group, files) for group, files in zip(groups, group_files)]
+    if counting:
+        grouped = set()
+        for files in group_files:
+            grouped.update(files)
+        jobs.append((None, sorted(path for path in counted if path not in grouped)))
+
+    originals = _DedupIndex(file_digest) if dedup else None
+    for group, files in jobs:
+        if group is not None and group.heading is not None:
+            yield group.heading
+        dedup_sizes = None
+        if dedup and group is not None and group.render_duplicate is not None:
+            dedup_sizes = _dedup_sizes(files, stats)
+        load = partial(_load, group, counting, cache, stats, result.skipped.append, dedup_sizes, ops)
+        if profile is not None:
+            load = partial(_profile_load, profile, load, stats)
+        for loaded in ordered_map(load, files, workers):
+            if loaded is None:
+                continue
+            abs_path = counted.get(loaded.filepath) if counting else None
+            section = loaded.section
+            if loaded.hit is not None:
+                cache.hits += 1
+                entry, data = loaded.hit
+                text = cache.carry_over(entry, loaded.meta, data)
+                section = Section(group.kind, entry["path"], entry["title"], (text,), entry["summary"])
+                loaded.counts.update((key, entry[key]) for key in ("lines", "chars") if key in entry)
+            elif loaded.meta is not None:
+                cache.misses += 1
+                chunks = cache.record(section.path, group.kind, loaded.meta, section.title,
+                                      section.summary, section.chunks)
+                section = section._replace(chunks=chunks)
+
+            st = stats.get(loaded.filepath)
+            if dedup_sizes and section is not None and st is not None and st.st_size in dedup_sizes:
+                match = originals.match(group.kind, st.st_size, section, loaded.counts, loaded.digest)
+                if match is not None:
+                    original, original_counts = match
+                    if loaded.meta is not None and loaded.hit is None:
+                        # Keep the cache complete; these chunks are already in memory.
+                        for _ in section.chunks:
+                            pass
+                    # Identical bytes have identical counts, so streamed duplicates are never read.
+                    for key, value in original_counts.items():
+                        loaded.counts.setdefault(key, value)
+                    result.duplicates[loaded.filepath] = original.path
+                    section = group.render_duplicate(loaded.filepath, original)
+
+            if abs_path is None:
+                pass
+            elif loaded.counts or section is None:
+                _add_counts(result, abs_path, loaded.counts, count_lines, count_chars)
+            else:
+                section = section._replace(chunks=_finish_counts(section.chunks, result, abs_path,
+                                                                  loaded.counts, count_lines, count_chars))
+            if section is not None:
+                yield section
+
+def scan_tree(directory, groups=(), count_lines=True, count_chars=True, workers=1, sink=None, cache=None,
+              honor_gitignore=False, dedup=False, profile=None, git=False):
+    """
+    Runs a complete scan and returns its counts.
+
+    Args:
+        directory (str): The root directory to scan.
+        groups (sequence): SectionGroups to render (default: none, counting only).
+        count_lines (bool): Count lines per file (default: True).
+        count_chars (bool): Count characters per file (default: True).
+        workers (int): Number of threads used to read files (default: 1, serial).
+        sink (file-like): Object with write(str) receiving the rendered sections, if any.
+        cache (ManifestCache): Open manifest cache to serve unchanged files from (default: None).
+        honor_gitignore (bool): Skip paths ignored by .gitignore files in the tree.
+        dedup (bool): Render files identical to an earlier one as references (see iter_scan).
+        profile (profiling.Profile): Collects per-phase timings and file statistics.
+        git (bool or str): Scan the files tracked by git, or a revision (see iter_scan).
+
+    Returns:
+        ScanResult: The collected counts.
+    """
+    result = ScanResult()
+    for section in iter_scan(directory, groups, count_lines, count_chars, workers, cache, result,
+                             honor_gitignore, dedup, profile, git=git):
+        if profile is not None:
+            section = profile.track(section)
+        for chunk in section.chunks:
+            if sink is not None:
+                sink.write(chunk)
+    return result
+
+def add_git_arguments(parser):
+    """
+    Adds the --git and --git-rev options to an argument parser.
+    """
+    parser.add_argument("--git", action="store_true",
+                        help="List files from the git index instead of walking the directory")
+    parser.add_argument("--git-rev", metavar="REV",
+                        help="Read the files of a commit, branch, tag or tree from git, without a checkout")
+
+def git_argument(args):
+    """
+    Returns the git parameter of iter_scan selected by the options from add_git_arguments.
+    """
+    return args.git_rev or args.git
+
+def main():
+    from archive import is_archive
+    import profiling
+
+    parser = argparse.ArgumentParser(
+        description="Generate llms-full.txt and count lines and characters in a single pass.")
+    parser.add_argument("directory", help="Root directory, or a tar or zip archive, to process")
+    parser.add_argument("-o", "--output", default="llms-full.txt", help="Output file (default: llms-full.txt)")
+    parser.add_argument("--no-llms", action="store_true", help="Only count lines and characters")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of threads used to read files (default: 1)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse unchanged sections from <output>.cache.* and update it")
+    parser.add_argument("--gitignore", action="store_true", help="Skip paths ignored by .gitignore files")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Render files identical to an earlier file as a reference to it")
+    add_git_arguments(parser)
+    parser.add_argument("--config", help="Configuration file (default: config.yaml)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    setup_logging()
+    if args.config:
+        use_config(args.config)
+
+    if not (os.path.isdir(args.directory) or is_archive(args.directory)):
+        print(f"Error: Directory '{os.path.abspath(args.directory)}' not found.")
+        sys.exit(1)
+
+    profile = profiling.from_arguments(args, "scan")
+    if args.no_llms:
+        result = scan_tree(args.directory, workers=args.workers, honor_gitignore=args.gitignore,
+                           profile=profile, git=git_argument(args))
+    else:
+        from generate_llms import generate_llms_full
+        result = generate_llms_full(args.directory, args.output, workers=args.workers, cache=args.cache,
+                                    count_lines=True, count_chars=True, honor_gitignore=args.gitignore,
+                                    dedup=args.dedup, profile=profile, git=git_argument(args))
+
+    print(f"\n--- Counts for '{args.directory}' ---")
+    print(f"Files: {len(result.line_counts)}")
+    print(f"Total Lines of Code: {result.total_lines}")
+    print(f"Total Characters: {result.total_chars}")
+    if result.skipped:
+        print(result.skip_summary())
+    profiling.report(profile, args, result)
+
+if __name__ == "__main__":
+    main()
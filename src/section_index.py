@@ -0,0 +1,319 @@
+"""
+Section Index and Random-Access Reader
+
+This module writes a sidecar index next to a generated llms-full.txt that maps every section to
+its byte offset and length, and reads single sections back without scanning the document. It is
+meant for services that pull a few sections per request out of documents of hundreds of MB.
+
+Key Features:
+- The index is written while the document is generated, one JSON line per section, from the
+  same section stream; nothing is read back or parsed afterwards
+- Entries record kind, source path, title, byte offset and length, and for deduplicated files the
+  path whose content they share
+- SectionReader memory-maps the document and returns a section with one dictionary lookup and
+  one slice; compressed (.gz/.xz) documents are read through their frame table instead, so only
+  the frames holding the section are decompressed
+- The index records the document size, so a reader refuses an index that does not match
+
+Usage:
+    python -m src.section_index llms-full.txt src/utils.py
+    python -m src.section_index llms-full.txt --list
+
+    from section_index import SectionReader
+
+    with SectionReader("llms-full.txt") as reader:
+        print(reader.get("src/utils.py"))
+"""
+
+import os
+import sys
+import json
+import mmap
+import argparse
+from compression import codec_for, load_frame_table, read_range
+
+INDEX_VERSION = 1
+
+def index_path(output_file):
+    """
+    Returns the path of the section index stored next to an output file.
+    """
+    return output_file + ".index.jsonl"
+
+def written_length(chunk, newline="\n"):
+    """
+    Returns the length in bytes of a string once written: UTF-8 encoded, with every "\\n"
+    written as newline.
+    """
+    length = len(chunk) if chunk.isascii() else len(chunk.encode("utf-8"))
+    if newline != "\n":
+        length += chunk.count("\n") * (len(newline) - 1)
+    return length
+
+def _dump(f, record):
+    f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+    f.write("\n")
+
+class SectionIndex:
+    """
+    Records the byte range of every section passed through track() into an index file.
+
+    The index is written to a temporary file and moved into place by close(commit=True), so an
+    index on disk always describes a complete document.
+    """
+
+    def __init__(self, path, directory, newline="\n", duplicates=None):
+        """
+        Args:
+            path (str): Where to write the index (usually index_path(output_file)).
+            directory (str): The directory the document was generated from, as given.
+            newline (str): What each "\\n" becomes in the written document (os.linesep for
+                files opened in text mode).
+            duplicates (dict): Duplicate path -> original path, as filled in by the scan.
+        """
+        self.path = path
+        self.newline = newline
+        self.duplicates = duplicates if duplicates is not None else {}
+        self.size = 0
+        self.count = 0
+        self._prefix = None
+        self._file = open(path + ".tmp", "w", encoding="utf-8")
+        self._write({"version": INDEX_VERSION, "directory": directory})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+    def _write(self, record):
+        _dump(self._file, record)
+
+    def track(self, section):
+        """
+        Returns the section with its chunks wrapped so that its byte range is recorded once they
+        have been consumed.
+
+        Args:
+            section (Section): The section about to be written.
+
+        Returns:
+            Section: The same section.
+        """
+        return section._replace(chunks=self._track(section))
+
+    def _track(self, section):
+        offset = self.size
+        for chunk in section.chunks:
+            self.size += written_length(chunk, self.newline)
+            yield chunk
+        record = {"kind": section.kind, "path": section.path, "title": section.title,
+                  "offset": offset, "length": self.size - offset}
+        original = self.duplicates.get(section.path)
+        if original is not None:
+            record["same_as"] = original
+        self._write(record)
+        self.count += 1
+
+    def prepend(self, kind, title, length):
+        """
+        Records a section that is placed in front of the tracked ones once they have been
+        written, such as a table of contents; the tracked offsets move back by length on close().
+
+        Args:
+            kind (str): The section kind.
+            title (str): The section title.
+            length (int): Its length in bytes, as written.
+        """
+        self._prefix = {"kind": kind, "path": None, "title": title, "offset": 0, "length": length}
+
+    def close(self, commit=True):
+        if self._file is None:
+            return
+        if commit:
+            self._write({"end": True, "size": self.size, "sections": self.count})
+        self._file.close()
+        self._file = None
+        if commit and self._prefix is not None:
+            self._shift()
+        if commit:
+            os.replace(self.path + ".tmp", self.path)
+        else:
+            os.remove(self.path + ".tmp")
+
+    def _shift(self):
+        # Rewrites the temporary index with the prefix section first and every offset after it.
+        shift = self._prefix["length"]
+        self.size += shift
+        self.count += 1
+        with open(self.path + ".tmp", "r", encoding="utf-8") as source, \
+                open(self.path + ".shift", "w", encoding="utf-8") as target:
+            target.write(next(source))
+            _dump(target, self._prefix)
+            for line in source:
+                record = json.loads(line)
+                if record.get("end"):
+                    record.update(size=self.size, sections=self.count)
+                else:
+                    record["offset"] += shift
+                _dump(target, record)
+        os.replace(self.path + ".shift", self.path + ".tmp")
+
+def load_index(path):
+    """
+    Loads a section index.
+
+    Args:
+        path (str): The index path.
+
+    Returns:
+        tuple: (header, entries, trailer), where entries is the list of section records in
+        document order.
+
+    Raises:
+        ValueError: If the index is unreadable, of another version or incomplete.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read section index {path}: {e}") from e
+    if not records or records[0].get("version") != INDEX_VERSION:
+        raise ValueError(f"Unsupported section index {path}")
+    if len(records) < 2 or not records[-1].get("end"):
+        raise ValueError(f"Section index {path} is incomplete")
+    return records[0], records[1:-1], records[-1]
+
+class SectionReader:
+    """
+    Random access to the sections of a generated document through its section index.
+
+    Plain documents are memory-mapped, so get() costs one dictionary lookup and one slice
+    however large the document is. Compressed documents are read through their frame table.
+    """
+
+    def __init__(self, output_file, index_file=None):
+        """
+        Args:
+            output_file (str): The generated document (plain, .gz or .xz).
+            index_file (str): Its section index (default: index_path(output_file)).
+
+        Raises:
+            ValueError: If the index is missing, incomplete or does not match the document.
+        """
+        self.output_file = output_file
+        header, self.entries, trailer = load_index(index_file or index_path(output_file))
+        self.directory = header.get("directory")
+        self.by_path = {entry["path"]: entry for entry in self.entries if entry["path"] is not None}
+        self._file = None
+        self._map = None
+        self._frames = None
+        if codec_for(output_file):
+            self._frames = load_frame_table(output_file)
+            size = self._frames["size"]
+        else:
+            size = os.path.getsize(output_file)
+            if size:
+                self._file = open(output_file, "rb")
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if size != trailer["size"]:
+            self.close()
+            raise ValueError(f"Section index does not match {output_file}: "
+                             f"indexed {trailer['size']} bytes, found {size}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return len(self.by_path)
+
+    def __contains__(self, path):
+        return self.lookup(path) is not None
+
+    def lookup(self, path):
+        """
+        Returns the index entry of a source file, or None.
+
+        Args:
+            path (str): The source path as it appears in the document, or relative to the
+                directory the document was generated from.
+        """
+        entry = self.by_path.get(path)
+        if entry is None and self.directory is not None:
+            entry = self.by_path.get(os.path.join(self.directory, path))
+        return entry
+
+    def read(self, entry):
+        """
+        Returns the raw bytes of an index entry's section.
+        """
+        offset, length = entry["offset"], entry["length"]
+        if self._frames is not None:
+            return read_range(self.output_file, offset, length, self._frames)
+        if self._map is None:
+            return b""
+        return self._map[offset:offset + length]
+
+    def get(self, path, follow_duplicates=False):
+        """
+        Returns the rendered section of a source file.
+
+        Args:
+            path (str): The source path (see lookup()).
+            follow_duplicates (bool): For a deduplicated file, return the section of the file
+                whose content it shares instead of the short reference section.
+
+        Returns:
+            str: The section text.
+
+        Raises:
+            KeyError: If the file has no section in the document.
+        """
+        entry = self.lookup(path)
+        if entry is None:
+            raise KeyError(path)
+        if follow_duplicates and "same_as" in entry:
+            entry = self.by_path[entry["same_as"]]
+        return self.read(entry).decode("utf-8")
+
+def main():
+    parser = argparse.ArgumentParser(description="Print sections of a generated llms-full.txt using its index.")
+    parser.add_argument("document", help="The generated document (plain, .gz or .xz)")
+    parser.add_argument("paths", nargs="*", help="Source paths whose sections to print")
+    parser.add_argument("--index", help="Index file (default: <document>.index.jsonl)")
+    parser.add_argument("--list", action="store_true", help="List the indexed sections")
+    parser.add_argument("--follow", action="store_true",
+                        help="Print the original section for deduplicated files")
+    args = parser.parse_args()
+
+    try:
+        reader = SectionReader(args.document, args.index)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    status = 0
+    with reader:
+        if args.list:
+            for entry in reader.entries:
+                print(f"{entry['offset']:>12} {entry['length']:>10}  {entry['kind']:<8} {entry['path'] or entry['title']}")
+        for path in args.paths:
+            try:
+                sys.stdout.write(reader.get(path, args.follow))
+            except KeyError:
+                print(f"Error: no section for {path}", file=sys.stderr)
+                status = 1
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
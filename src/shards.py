@@ -0,0 +1,366 @@
+"""
+Token-Budget Sharding of llms-full.txt
+
+This module splits the generated document into numbered shards that each fit a token budget,
+so that a large project can be fed to a model with a fixed context window one shard at a time.
+llms-full.txt becomes llms-full.001.txt, llms-full.002.txt, ... plus llms-full.index.txt, which
+lists the sections in every shard.
+
+Key Features:
+- Built-in token estimator (estimate_tokens) that approximates how BPE tokenizers split code and
+  prose from a few byte-level passes; no network access or model files needed
+- Sections are never split when they fit in a shard; a section that does not fit in the current
+  shard starts the next one
+- Sections larger than a whole shard are split at line boundaries, with the code fence closed at
+  the end of each part and reopened under a "(continued)" heading in the next shard; fenced
+  blocks inside Markdown files are closed and reopened the same way
+- The current group heading is repeated at the top of every shard, so each shard stands alone
+- Streams sections through: memory is bounded by the shard budget, not by the document size
+- Any other token counter can be plugged in as a callable taking a string
+
+Usage:
+    from shards import ShardWriter, estimate_tokens
+
+    with ShardWriter("llms-full.txt", max_tokens=100000) as shards:
+        for section in iter_section_records(directory):
+            shards.add(section)
+"""
+
+import os
+import re
+from itertools import chain
+
+# The estimate works on the UTF-8 bytes with a few C-level passes instead of a tokenizer: every
+# run of letters and digits, every other visible character and every line break counts as one
+# token, and long runs (identifiers, hex, base64) cost one more token per 20 characters, rounded
+# up. This comes to about 3.2-3.5 characters per token on Markdown and Python code, a little more
+# than common BPE vocabularies produce, so shards err on the small side. Splitting a text never
+# lowers its estimate, so the sum over a section's chunks is an upper bound for the whole.
+_ALNUM = bytes(range(48, 58)) + bytes(range(65, 91)) + bytes(range(97, 123))
+_NOT_SYMBOL = _ALNUM + b" \t\n\r\v\f" + bytes(range(0x80, 0xC0))
+# Maps every byte to its class: "a" for letters and digits, "#" for other visible characters
+# (lead bytes of multi-byte characters included) and " " for the rest, so that one translation
+# and a few substring counts give all the totals below.
+_CLASSES = bytes.maketrans(bytes(range(256)), bytes(
+    ord("a") if b in _ALNUM else ord(" ") if b in _NOT_SYMBOL else ord("#") for b in range(256)))
+
+_FENCE_PATTERN = re.compile(r"^ {0,3}(`{3,}|~{3,})(.*)$", re.MULTILINE)
+
+# Longest string handed to the token counter at once when a section has to be split.
+PIECE_SIZE = 1 << 16
+
+def estimate_tokens(text):
+    """
+    Estimates the number of model tokens in a string without a tokenizer.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated token count.
+    """
+    data = text.encode("utf-8", "surrogatepass")
+    classes = data.translate(_CLASSES)
+    alnum = classes.count(b"a")
+    words = classes.count(b" a") + classes.count(b"#a") + classes.startswith(b"a")
+    # Multi-byte characters count once, by their lead byte.
+    symbols = classes.count(b"#")
+    lines = data.count(b"\n") - data.count(b"\n\n")
+    return words + -(-alnum // 20) + symbols + lines
+
+def shard_path(output_file, number):
+    """
+    Returns the path of a numbered shard, e.g. "llms-full.003.txt" for "llms-full.txt".
+
+    Args:
+        output_file (str): The unsharded output path.
+        number (int): The shard number, starting at 1.
+
+    Returns:
+        str: The shard path.
+    """
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.{number:03d}{ext}"
+
+def index_path(output_file):
+    """
+    Returns the path of the shard index, e.g. "llms-full.index.txt" for "llms-full.txt".
+    """
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.index{ext}"
+
+def _stale_shards(output_file, count):
+    # Numbered shards of output_file beyond the first count, left over from an earlier run.
+    directory = os.path.dirname(output_file) or "."
+    root, ext = os.path.splitext(os.path.basename(output_file))
+    pattern = re.compile(re.escape(root) + r"\.([0-9]{3,})" + re.escape(ext) + r"\Z")
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match and int(match.group(1)) > count:
+            yield os.path.join(directory, name)
+
+def _pieces(texts):
+    # Slices long strings so that splitting a huge section never re-measures the whole text.
+    for text in texts:
+        for start in range(0, len(text), PIECE_SIZE):
+            yield text[start:start + PIECE_SIZE]
+
+def _cut(text, room, count, force):
+    # Returns (head, rest), where head is the longest run of whole lines of text that fits in room
+    # tokens. With force, at least one character is cut off even if not a single line fits.
+    ends = []
+    newline = text.find("\n")
+    while newline >= 0:
+        ends.append(newline + 1)
+        newline = text.find("\n", newline + 1)
+    low, high = 0, len(ends)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count(text[:ends[middle - 1]]) <= room:
+            low = middle
+        else:
+            high = middle - 1
+    end = ends[low - 1] if low else 0
+    if end == 0 and force:
+        end = max(1, len(text) * max(room, 1) // max(count(text), 1))
+    return text[:end], text[end:]
+
+class _FenceState:
+    # Follows Markdown fenced code blocks through text written in arbitrary pieces.
+
+    def __init__(self):
+        self.opening = None     # the line that opened the current fence, if inside one
+        self.marker = None      # its backticks or tildes, which also close it
+        self._partial = ""
+
+    def feed(self, text):
+        text = self._partial + text
+        end = text.rfind("\n") + 1
+        self._partial = text[end:]
+        for match in _FENCE_PATTERN.finditer(text, 0, end):
+            marker, info = match.groups()
+            if self.marker is None:
+                self.opening = match.group(0).strip()
+                self.marker = marker
+            elif marker[0] == self.marker[0] and len(marker) >= len(self.marker) and not info.strip():
+                self.opening = self.marker = None
+
+    def after(self, text):
+        # A copy of the state, fed text.
+        state = _FenceState()
+        state.opening, state.marker, state._partial = self.opening, self.marker, self._partial
+        state.feed(text)
+        return state
+
+class ShardWriter:
+    """
+    Writes a stream of Sections into numbered shard files of at most max_tokens tokens each.
+
+    The token budget is approximate: it is measured with token_counter, and a single line longer
+    than a whole shard is cut mid-line. close() writes the index and removes shards left over
+    from an earlier run that produced more of them.
+
+    Attributes:
+        shards (list): One dict per shard written: {"path", "tokens", "sections"}, where
+            sections lists the titles and paths of the sections (or parts) in the shard.
+    """
+
+    def __init__(self, output_file, max_tokens, token_counter=estimate_tokens, continuation=None):
+        """
+        Args:
+            output_file (str): The unsharded output path; shards and the index are named after it.
+            max_tokens (int): Token budget per shard.
+            token_counter (callable): Returns the token count of a string (default: estimate_tokens).
+            continuation (callable): Given a Section that has to be split, returns (close, reopen):
+                the text ending one part and the text starting the next (default: nothing).
+        """
+        if max_tokens < 1:
+            raise ValueError(f"max_tokens must be positive, got {max_tokens}")
+        self.output_file = output_file
+        self.max_tokens = max_tokens
+        self.count = token_counter
+        self.continuation = continuation
+        self.shards = []
+        self._file = None
+        self._used = False      # the current shard holds more than its repeated heading
+        self._heading = None    # (text, tokens) of the current group heading
+        self._pending = None    # the current heading, if not written yet
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+    def _room(self):
+        return self.max_tokens - self.shards[-1]["tokens"]
+
+    def _write(self, text, tokens):
+        self._file.write(text)
+        self.shards[-1]["tokens"] += tokens
+
+    def _new_shard(self):
+        if self._file is not None:
+            self._file.close()
+        path = shard_path(self.output_file, len(self.shards) + 1)
+        self._file = open(path, "w", encoding="utf-8")
+        self.shards.append({"path": path, "tokens": 0, "sections": []})
+        self._used = False
+        self._pending = None
+        if self._heading is not None:
+            self._write(*self._heading)
+
+    def _flush_pending(self):
+        if not self.shards:
+            self._new_shard()
+        elif self._pending is not None:
+            self._write(*self._pending)
+            self._used = True
+        self._pending = None
+
+    def _label(self, section, part=None):
+        label = f"{section.title} ({section.path})" if section.path else section.title
+        return label if part is None else f"{label}, part {part}"
+
+    def add(self, section):
+        """
+        Adds the next section of the document.
+
+        Args:
+            section (Section): A heading, Markdown or code section; its chunks are consumed.
+        """
+        if section.kind == "heading":
+            if self._pending is not None:
+                self._flush_pending()
+            text = "".join(section.chunks)
+            self._heading = self._pending = (text, self.count(text))
+            return
+
+        heading_tokens = self._heading[1] if self._heading is not None else 0
+        pieces = []
+        tokens = 0
+        chunks = iter(section.chunks)
+        oversized = False
+        for chunk in chunks:
+            chunk_tokens = self.count(chunk)
+            pieces.append((chunk, chunk_tokens))
+            tokens += chunk_tokens
+            if tokens > self.max_tokens - heading_tokens:
+                oversized = True
+                break
+
+        pending_tokens = self._pending[1] if self._pending is not None else 0
+        if not self.shards or (self._used and (oversized or tokens + pending_tokens > self._room())):
+            self._new_shard()
+        elif self._pending is not None:
+            self._flush_pending()
+
+        if oversized:
+            self._write_split(section, chain((piece for piece, _ in pieces), chunks))
+        else:
+            for piece, piece_tokens in pieces:
+                self._write(piece, piece_tokens)
+            self.shards[-1]["sections"].append(self._label(section))
+        self._used = True
+
+    def _tail(self, fences, line_open, close_tokens):
+        # Tokens that end a part: the line break after a cut mid-line, the closing fence of a
+        # Markdown code block left open (given the fence state before that line break) and the
+        # closing text.
+        tokens = close_tokens
+        if line_open:
+            tokens += self.count("\n")
+            if fences is not None:
+                fences = fences.after("\n")
+        if fences is not None and fences.opening is not None:
+            tokens += self.count(fences.marker + "\n")
+        return tokens
+
+    def _write_split(self, section, texts):
+        close, reopen = self.continuation(section) if self.continuation else ("", "")
+        close_tokens = self.count(close)
+        reopen_tokens = self.count(reopen)
+        fences = _FenceState() if section.kind == "markdown" else None
+        line_open = False   # the text written last ends mid-line
+        part = 1
+        self.shards[-1]["sections"].append(self._label(section, part))
+        written = False
+        for text in _pieces(texts):
+            while text:
+                # Room is kept free at the end of every part for what ends it (see _tail()).
+                tokens = self.count(text)
+                state = fences.after(text) if fences is not None else None
+                text_open = not text.endswith("\n")
+                if tokens + self._tail(state, text_open, close_tokens) <= self._room():
+                    self._write(text, tokens)
+                    fences, line_open, written = state, text_open, True
+                    break
+                # The fence left open and the line break depend on where the text is cut, so
+                # the cut is made again with more room kept free until what ends it fits.
+                reserve = self._tail(fences, True, close_tokens)
+                while True:
+                    head, rest = _cut(text, self._room() - reserve, self.count, force=not written)
+                    state = fences.after(head) if fences is not None and head else fences
+                    head_open = not head.endswith("\n") if head else line_open
+                    needed = self._tail(state, head_open, close_tokens)
+                    if needed <= reserve or not head:
+                        break
+                    reserve = needed
+                text = rest
+                if head:
+                    self._write(head, self.count(head))
+                if head_open:
+                    self._write("\n", self.count("\n"))
+                    if state is not None:
+                        state = state.after("\n")
+                fences = state
+                opening = fences.opening if fences is not None else None
+                if opening is not None:
+                    self._write(fences.marker + "\n", self.count(fences.marker + "\n"))
+                self._write(close, close_tokens)
+                self._new_shard()
+                self._write(reopen, reopen_tokens)
+                if opening is not None:
+                    self._write(opening + "\n", self.count(opening) + 1)
+                part += 1
+                self.shards[-1]["sections"].append(self._label(section, part))
+                line_open = written = False
+
+    def close(self, commit=True):
+        """
+        Finishes the last shard and, if commit, writes the index and removes stale shards.
+
+        Returns:
+            str or None: The index path, if it was written.
+        """
+        if commit and (self._pending is not None or not self.shards):
+            self._flush_pending()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not commit:
+            return None
+        for path in list(_stale_shards(self.output_file, len(self.shards))):
+            os.remove(path)
+        return self.write_index()
+
+    def write_index(self):
+        """
+        Writes the shard index next to the shards.
+
+        Returns:
+            str: The index path.
+        """
+        path = index_path(self.output_file)
+        total = sum(shard["tokens"] for shard in self.shards)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# Shards of {os.path.basename(self.output_file)}\n")
+            f.write(f"> {len(self.shards)} shards of at most {self.max_tokens} estimated tokens each, "
+                    f"{total} estimated tokens in total.\n\n")
+            for shard in self.shards:
+                f.write(f"## {os.path.basename(shard['path'])}\n")
+                f.write(f"> ~{shard['tokens']} tokens, {len(shard['sections'])} sections\n\n")
+                for label in shard["sections"]:
+                    f.write(f"- {label}\n")
+                f.write("\n")
+        return path
@@ -8,8 +8,31 @@ generation, table of contents creation, and utility functions.
 Test Coverage:
 - TestCountFunctions: Tests character and line counting functionality
 - TestGenerateLLMSFull: Tests the main llms-full.txt generation process
+- TestIterSections: Tests the streaming section generator
+- TestManifestCache: Tests the incremental section cache and its staleness checks
+- TestSingleScan: Tests counting and generating from one read of every file
+- TestWalker: Tests directory walking, exclusions and .gitignore handling
+- TestByteCounting: Tests counting raw bytes as safe_read would decode them
+- TestSharding: Tests splitting the output into token-budgeted shards
+- TestDedup: Tests rendering duplicate files as references
+- TestCompressedOutput: Tests compressed and framed output
+- TestSectionIndex: Tests the byte-offset index of sections
+- TestBatch: Tests batch manifests and their worker processes
+- TestBenchmark: Tests the synthetic trees and regression checks of the benchmark harness
+- TestProfiling: Tests per-phase profiling and its reports
+- TestMarkdownMetadata: Tests titles and descriptions taken from Markdown front matter
+- TestGitSource: Tests reading the git index and revisions
+- TestArchiveSource: Tests scanning tar and zip archives in place
+- TestCountTable: Tests the columnar per-file counts and their reports
+- TestEstimate: Tests sampled estimates of line and character counts
+- TestCompact: Tests compaction of code sections
+- TestRank: Tests relevance ranking and budget-constrained selection
+- TestChunkExport: Tests the JSONL chunk export
+- TestWatch: Tests regenerating the output when files change
+- TestStartup: Tests that importing the scripts stays cheap and side-effect free
 - TestGenerateTOC: Tests table of contents generation from markdown
 - TestSafeRead: Tests the safe file reading utility function
+- TestBinarySkipping: Tests that binary and oversized files are skipped and reported
 
 Key Features:
 - Uses temporary directories for isolated testing
@@ -26,10 +49,24 @@ The tests ensure reliability and correctness of all project components and help
 regressions during development.
 """
 
+import io
+import ast
+import inspect
+import json
+import hashlib
 import os
+import time
+import gzip
+import lzma
 import shutil
+import tarfile
 import tempfile
 import unittest
+import zipfile
+import threading
+import subprocess
+from contextlib import redirect_stdout
+from unittest import mock
 
 # Add the src directory to the Python path so we can import modules.
 import sys
@@ -39,9 +76,33 @@ if SRC_DIR not in sys.path:
 
 from count_chars_of_code import count_characters
 from count_lines_of_code import count_lines_of_code
-from generate_llms import generate_llms_full
-from generate_toc import generate_toc
-from utils import safe_read, CODE_EXTENSIONS
+import batch
+import benchmark
+import chunk_export
+import compact
+import estimate
+import archive
+import generate_llms
+import gitsource
+import llms
+import profiling
+import rank
+import utils
+import watch
+import scan
+import shards
+from generate_llms import generate_llms_full, iter_sections
+from generate_toc import generate_toc, generate_toc_file, TocBuilder
+from metadata import extract_metadata, body_slices, METADATA_PREFIX
+from manifest_cache import check_cache
+from walker import walk_files
+from counting import ByteCounter, count_buffer, count_file
+from count_table import CountTable
+from shards import estimate_tokens
+from compression import load_frame_table, read_range
+from section_index import SectionReader, index_path
+from utils import decode_bytes, is_binary, SKIP_BINARY, SKIP_TOO_LARGE, SKIP_UNREADABLE
+from utils import safe_read, strip_chunks, CODE_EXTENSIONS
 
 class TestCountFunctions(unittest.TestCase):
     def setUp(self):
@@ -122,6 +183,1492 @@ class TestGenerateLLMSFull(unittest.TestCase):
         self.assertIn("## example.py", output_content)
         self.assertIn("print('example code')", output_content)
 
+    def test_generate_llms_full_parallel_matches_serial(self):
+        # Add enough files that several reads are in flight at once.
+        for i in range(20):
+            with open(os.path.join(self.test_dir, f"module_{i:02d}.py"), "w", encoding="utf-8") as f:
+                f.write(f"value = {i}\n")
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        serial_output = os.path.join(output_dir, "serial.txt")
+        parallel_output = os.path.join(output_dir, "parallel.txt")
+        generate_llms_full(self.test_dir, output_file=serial_output)
+        generate_llms_full(self.test_dir, output_file=parallel_output, workers=4)
+
+        with open(serial_output, "rb") as f:
+            serial_bytes = f.read()
+        with open(parallel_output, "rb") as f:
+            parallel_bytes = f.read()
+        self.assertEqual(serial_bytes, parallel_bytes)
+
+class TestIterSections(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.test_dir, "guide.md"), "w", encoding="utf-8") as f:
+            f.write("# Guide\n> Short summary.\n\nBody text.\n")
+        with open(os.path.join(self.test_dir, "app.py"), "w", encoding="utf-8") as f:
+            f.write("\n\n  import os\n" + "x = 'caf\u00e9'\n" * 500 + "  \n\n")
+        with open(os.path.join(self.test_dir, "legacy.txt"), "wb") as f:
+            f.write(b"  caf\xe9\r\nend \xff\n\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.output_dir)
+
+    def _generate_to_file(self):
+        output_file = os.path.join(self.output_dir, "llms-full.txt")
+        generate_llms_full(self.test_dir, output_file=output_file)
+        with open(output_file, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_iter_sections_matches_file_output(self):
+        self.assertEqual("".join(iter_sections(self.test_dir)), self._generate_to_file())
+
+    def test_generate_to_file_like_sink(self):
+        buffer = io.StringIO()
+        generate_llms_full(self.test_dir, output_file=buffer)
+        self.assertEqual(buffer.getvalue(), self._generate_to_file())
+
+    def test_streamed_large_files_match_in_memory_rendering(self):
+        expected = self._generate_to_file()
+        with mock.patch.object(scan, "STREAM_THRESHOLD", 0), \
+                mock.patch.object(scan, "CHUNK_SIZE", 7):
+            streamed = "".join(iter_sections(self.test_dir))
+        self.assertEqual(streamed, expected)
+
+    def test_strip_chunks(self):
+        for chunks in (["  a", "b  ", "  ", "c \n"], ["\n", " "], ["x"], ["", " a b ", ""]):
+            self.assertEqual("".join(strip_chunks(chunks)), "".join(chunks).strip())
+
+class TestManifestCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.output_dir, "llms-full.txt")
+        self.cache_path = self.output_file + ".cache"
+        self.files = {
+            "intro.md": "# Intro\n> Summary line.\n\nHello.\n",
+            "notes.md": "No title here.\n",
+            "main.py": "print('main')\n",
+            "helper.py": "def helper():\n    return 1\n",
+        }
+        for name, content in self.files.items():
+            self._write(name, content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.output_dir)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.test_dir, name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def _generate(self, **kwargs):
+        with mock.patch("builtins.print"):
+            generate_llms_full(self.test_dir, output_file=self.output_file, cache=True, **kwargs)
+        with open(self.output_file, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _uncached(self):
+        return "".join(iter_sections(self.test_dir))
+
+    def test_second_run_reuses_all_sections(self):
+        first = self._generate()
+        with mock.patch.object(generate_llms, "render_markdown") as render_markdown, \
+                mock.patch.object(generate_llms, "render_code") as render_code:
+            second = self._generate()
+        render_markdown.assert_not_called()
+        render_code.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(second, self._uncached())
+        self.assertEqual(check_cache(self.cache_path, self.test_dir)["status"], "ok")
+
+    def test_changes_deletions_and_renames(self):
+        self._generate()
+        self._write("main.py", "print('changed')\n")
+        os.remove(os.path.join(self.test_dir, "notes.md"))
+        os.rename(os.path.join(self.test_dir, "helper.py"), os.path.join(self.test_dir, "helpers.py"))
+        self.assertEqual(check_cache(self.cache_path, self.test_dir)["status"], "stale")
+
+        output = self._generate(workers=2)
+        self.assertEqual(output, self._uncached())
+        self.assertIn("print('changed')", output)
+        self.assertNotIn("No title here.", output)
+        self.assertIn("helpers.py", output)
+        self.assertEqual(check_cache(self.cache_path, self.test_dir)["status"], "ok")
+
+    def test_corrupt_cache_is_detected_and_repaired(self):
+        self._generate()
+        with open(self.cache_path + ".sections", "r+b") as f:
+            f.write(b"XXXX")
+        self.assertEqual(check_cache(self.cache_path)["status"], "corrupt")
+        self.assertEqual(self._generate(), self._uncached())
+        self.assertEqual(check_cache(self.cache_path)["status"], "ok")
+
+        with open(self.cache_path + ".json", "w", encoding="utf-8") as f:
+            f.write("{not json")
+        self.assertEqual(check_cache(self.cache_path)["status"], "corrupt")
+        self.assertEqual(self._generate(), self._uncached())
+
+    def test_check_reports_other_settings_as_stale(self):
+        self._generate(compact="docstrings")
+        fingerprint = generate_llms._cache_fingerprint(compact=compact.Compactor("docstrings"))
+        self.assertEqual(check_cache(self.cache_path, self.test_dir, fingerprint)["status"], "ok")
+        report = check_cache(self.cache_path, self.test_dir, generate_llms._cache_fingerprint())
+        self.assertEqual(report["status"], "stale")
+        self.assertIn("other settings", report["problems"][0])
+        with redirect_stdout(io.StringIO()) as printed, self.assertRaises(SystemExit) as exit:
+            generate_llms.main([self.test_dir, "-o", self.output_file, "--check-cache"])
+        self.assertEqual(exit.exception.code, 1)
+        self.assertIn("Cache status: stale", printed.getvalue())
+
+class TestSingleScan(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        files = {
+            "readme.md": b"# Readme\n> About.\n\nText\r\nmore\n",
+            "main.py": b"a = 1\r\nb = 2\rc = 3",
+            "style.css": b"body {}\n",
+            "legacy.txt": b"caf\xe9\x85done\n",
+        }
+        for name, data in files.items():
+            with open(os.path.join(self.test_dir, name), "wb") as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.output_dir)
+
+    def test_combined_scan_matches_separate_runs(self):
+        output_file = os.path.join(self.output_dir, "llms-full.txt")
+        with mock.patch("builtins.open", wraps=open) as opened, mock.patch("builtins.print"):
+            result = generate_llms_full(self.test_dir, output_file=output_file,
+                                        count_lines=True, count_chars=True)
+        read_paths = [call.args[0] for call in opened.call_args_list
+                      if not call.args[0].startswith(output_file)]
+        self.assertEqual(len(read_paths), len(set(read_paths)))
+        self.assertEqual(len(read_paths), 4)
+
+        self.assertEqual((result.total_lines, result.line_counts), count_lines_of_code(self.test_dir))
+        self.assertEqual((result.total_chars, result.char_counts), count_characters(self.test_dir))
+        self.assertEqual(result.line_counts[os.path.join(self.test_dir, "main.py")], 3)
+        with open(output_file, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "".join(iter_sections(self.test_dir)))
+
+    def test_streamed_counts_match_in_memory_counts(self):
+        expected = scan.scan_tree(self.test_dir)
+        with mock.patch.object(scan, "STREAM_THRESHOLD", 0), mock.patch.object(scan, "CHUNK_SIZE", 3):
+            streamed = scan.scan_tree(self.test_dir)
+        self.assertEqual(streamed.line_counts, expected.line_counts)
+        self.assertEqual(streamed.char_counts, expected.char_counts)
+
+class TestWalker(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        for relpath, content in {
+            "keep.py": "a\n",
+            "debug.log": "log\n",
+            "big.txt": "x" * 100,
+            "node_modules/pkg/index.js": "js\n",
+            "src/app.py": "b\n",
+            "src/__pycache__/app.cpython.pyc": "c",
+            "src/generated/out.py": "d\n",
+            "src/generated/keep_me.py": "e\n",
+            "src/.gitignore": "generated/*\n!generated/keep_me.py\n*.tmp\n",
+            "src/scratch.tmp": "f\n",
+        }.items():
+            path = os.path.join(self.test_dir, relpath)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _walk(self, **kwargs):
+        paths = []
+        for dirpath, files in walk_files(self.test_dir, **kwargs):
+            for filename, st in files:
+                path = os.path.join(dirpath, filename)
+                self.assertEqual(st.st_size, os.path.getsize(path))
+                paths.append(os.path.relpath(path, self.test_dir).replace(os.sep, "/"))
+        return sorted(paths)
+
+    def test_excluded_directories_are_pruned(self):
+        with mock.patch("walker.os.scandir", wraps=os.scandir) as scandir:
+            paths = self._walk(exclude_patterns=["node_modules", "*__pycache__*", "*.log"], max_file_size=50)
+        scanned = [os.path.basename(call.args[0]) for call in scandir.call_args_list]
+        self.assertNotIn("node_modules", scanned)
+        self.assertNotIn("__pycache__", scanned)
+        self.assertEqual(paths, ["keep.py", "src/.gitignore", "src/app.py", "src/generated/keep_me.py",
+                                 "src/generated/out.py", "src/scratch.tmp"])
+
+    def test_gitignore(self):
+        paths = self._walk(exclude_patterns=[".git*", "node_modules"], max_file_size=0, honor_gitignore=True)
+        self.assertEqual(paths, ["big.txt", "debug.log", "keep.py", "src/__pycache__/app.cpython.pyc",
+                                 "src/app.py", "src/generated/keep_me.py"])
+
+    def test_counters_use_walker(self):
+        total_lines, file_counts = count_lines_of_code(self.test_dir)
+        counted = sorted(os.path.relpath(path, self.test_dir) for path in file_counts)
+        self.assertNotIn(os.path.join("node_modules", "pkg", "index.js"), counted)
+        self.assertIn("keep.py", counted)
+
+    def test_counter_commands_honor_gitignore(self):
+        def run(*args):
+            with redirect_stdout(io.StringIO()) as output:
+                llms.main([*args, self.test_dir])
+            return output.getvalue()
+
+        total_lines = count_lines_of_code(self.test_dir)[0]
+        self.assertIn(f"Total Lines of Code: {total_lines}\n", run("count-lines"))
+        # src/generated/out.py is ignored.
+        self.assertIn(f"Total Lines of Code: {total_lines - 1}\n", run("count-lines", "--gitignore"))
+        self.assertIn(f"Estimated total lines: {total_lines - 1} ", run("count-lines", "--gitignore", "--estimate"))
+        total_chars = count_characters(self.test_dir, honor_gitignore=True)[0]
+        self.assertIn(f"Total Characters: {total_chars}\n", run("count-chars", "--gitignore"))
+
+class TestByteCounting(unittest.TestCase):
+    SAMPLES = [
+        b"",
+        b"plain\nascii\n",
+        b"no trailing newline",
+        b"crlf\r\nlines\r\n\r\n",
+        b"lone\rcarriage\rreturns",
+        b"form\x0cfeed\x0bvertical\x1cfile\x1dgroup\x1erecord",
+        "caf\u00e9 \u20ac \U0001f600\n".encode("utf-8"),
+        "next\x85line\u2028sep\u2029para".encode("utf-8"),
+        b"\xef\xbb\xbfbom\r\n",
+        b"latin-1 caf\xe9\x85end\r",
+        b"mixed \xc3\xa9 then invalid \xff\n",
+    ]
+
+    def _expected(self, data):
+        text = decode_bytes(data)
+        return len(text.splitlines()), len(text)
+
+    def test_count_buffer_matches_decoding(self):
+        for data in self.SAMPLES:
+            self.assertEqual(count_buffer(data), self._expected(data), data)
+
+    def test_blocks_split_anywhere(self):
+        for data in self.SAMPLES:
+            for block_size in (1, 2, 3, 5):
+                counter = ByteCounter()
+                for start in range(0, len(data), block_size):
+                    counter.feed(data[start:start + block_size])
+                self.assertEqual(counter.result(), self._expected(data), (data, block_size))
+
+    def test_count_file(self):
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        path = os.path.join(test_dir, "sample.txt")
+        data = b"".join(self.SAMPLES)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.assertEqual(count_file(path, block_size=4), self._expected(data))
+        self.assertEqual(count_file(path, size=len(data)), self._expected(data))
+        self.assertIsNone(count_file(os.path.join(test_dir, "missing.txt")))
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.out_dir, "llms-full.txt")
+        for i in range(6):
+            with open(os.path.join(self.test_dir, f"mod{i}.py"), "w", encoding="utf-8") as f:
+                f.write(f"def function_{i}(value):\n    return value * {i}\n" * 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.out_dir)
+
+    def read(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_sections_are_kept_whole_within_budget(self):
+        # Every file lands in exactly one shard, each shard fits the budget and the index lists them.
+        with open(os.path.join(self.out_dir, "llms-full.009.txt"), "w") as f:
+            f.write("stale")
+        generate_llms_full(self.test_dir, self.output, max_tokens=900)
+        shards = sorted(name for name in os.listdir(self.out_dir) if name[10:13].isdigit())
+        self.assertGreater(len(shards), 1)
+        self.assertNotIn("llms-full.009.txt", shards)
+        index = self.read(os.path.join(self.out_dir, "llms-full.index.txt"))
+        for i in range(6):
+            holders = [name for name in shards if f"## mod{i}.py\n" in self.read(os.path.join(self.out_dir, name))]
+            self.assertEqual(len(holders), 1)
+        for name in shards:
+            content = self.read(os.path.join(self.out_dir, name))
+            self.assertLessEqual(estimate_tokens(content), 900)
+            self.assertIn("# Code and Other Files", content.split("\n## ", 1)[0])
+            self.assertIn(f"## {name}", index)
+
+    def test_oversized_sections_are_split_cleanly(self):
+        # A file larger than a shard is split at line boundaries with its fence closed and reopened.
+        with open(os.path.join(self.test_dir, "notes.md"), "w", encoding="utf-8") as f:
+            f.write("# Notes\n\n```python\n" + "print('inside the fence')\n" * 300 + "```\n")
+        generate_llms_full(self.test_dir, self.output, max_tokens=500)
+        shards = sorted(name for name in os.listdir(self.out_dir) if name[10:13].isdigit())
+        lines_seen = 0
+        for name in shards:
+            content = self.read(os.path.join(self.out_dir, name))
+            self.assertLessEqual(estimate_tokens(content), 500)
+            fences = [line for line in content.splitlines() if line.startswith("```")]
+            self.assertEqual(len(fences) % 2, 0, name)
+            lines_seen += content.count("print('inside the fence')\n")
+        self.assertEqual(lines_seen, 300)
+        self.assertIn("## Notes (continued)\n\n```python\n", self.read(os.path.join(self.out_dir, shards[1])))
+        notes = os.path.join(self.test_dir, "notes.md")
+        self.assertIn(f"- Notes ({notes}), part 2\n", self.read(os.path.join(self.out_dir, "llms-full.index.txt")))
+
+    def test_split_parts_keep_room_for_what_ends_them(self):
+        # Counting characters, a part cut mid-line gets its line break and a long closing fence
+        # without going over the budget.
+        sections = [scan.Section("code", "a.py", "a.py", ["## a.py\n\n```\n" + "y" * 2000 + "\n```\n\n"]),
+                    scan.Section("markdown", "b.md", "B", ["## B\n\n`````\n" + "z" * 2000 + "\n" + "q\n" * 200 + "`````\n"])]
+        for section in sections:
+            for max_tokens in (100, 137):
+                with shards.ShardWriter(self.output, max_tokens, len, generate_llms._continuation) as writer:
+                    writer.add(section)
+                for shard in writer.shards:
+                    content = self.read(shard["path"])
+                    self.assertLessEqual(len(content), max_tokens, shard["path"])
+                    self.assertEqual(len(content), shard["tokens"])
+                    self.assertEqual(content.count("`````") % 2, 0)
+
+    def test_sharding_needs_an_output_path(self):
+        with self.assertRaises(ValueError):
+            generate_llms_full(self.test_dir, io.StringIO(), max_tokens=1000)
+
+    def test_estimate_tokens(self):
+        # Words, symbols and line breaks are counted; splitting text never lowers the estimate.
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("x = f(1)\n"), 8)
+        text = "def function(value):\n\n    return value * 2\n"
+        for cut in range(len(text)):
+            self.assertLessEqual(estimate_tokens(text), estimate_tokens(text[:cut]) + estimate_tokens(text[cut:]))
+
+class TestDedup(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.out_dir, "llms-full.txt")
+        body = "def shared(value):\n    return value + 1\n" * 20
+        for name in ("a", "b", "c"):
+            os.makedirs(os.path.join(self.test_dir, name))
+            with open(os.path.join(self.test_dir, name, "utils.py"), "w", encoding="utf-8") as f:
+                f.write(body)
+        # Same size as the copies above, different content.
+        with open(os.path.join(self.test_dir, "c", "other.py"), "w", encoding="utf-8") as f:
+            f.write(body.replace("shared", "unique"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.out_dir)
+
+    def generate(self, **kwargs):
+        result = generate_llms_full(self.test_dir, self.output, dedup=True, count_lines=True, **kwargs)
+        with open(self.output, "r", encoding="utf-8") as f:
+            return result, f.read()
+
+    def test_identical_files_are_emitted_once(self):
+        # The first copy is rendered in full and later copies refer to it; counts cover every file.
+        result, content = self.generate()
+        first = os.path.join(self.test_dir, "a", "utils.py")
+        self.assertEqual(content.count("def shared(value)"), 20)
+        self.assertEqual(content.count(f"> Same content as: {first}\n"), 2)
+        self.assertIn("def unique(value)", content)
+        self.assertEqual(sorted(result.duplicates), [os.path.join(self.test_dir, name, "utils.py") for name in "bc"])
+        self.assertEqual(len(result.line_counts), 4)
+        self.assertEqual(set(result.line_counts.values()), {40})
+
+    def test_streamed_duplicates_match_in_memory_ones(self):
+        # Large files are hashed on demand and give the same output, serially and in parallel.
+        _, in_memory = self.generate()
+        with mock.patch.object(scan, "STREAM_THRESHOLD", 100), mock.patch.object(scan, "CHUNK_SIZE", 64):
+            result, streamed = self.generate(workers=4)
+        self.assertEqual(streamed, in_memory)
+        self.assertEqual(set(result.line_counts.values()), {40})
+
+    def test_dedup_is_off_by_default(self):
+        generate_llms_full(self.test_dir, self.output)
+        with open(self.output, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read().count("def shared(value)"), 60)
+
+class TestCompressedOutput(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        for i in range(12):
+            with open(os.path.join(self.test_dir, f"mod{i:02d}.py"), "w", encoding="utf-8") as f:
+                f.write(f"VALUE_{i} = {i}\n" * (40 + 30 * i))
+        self.plain = os.path.join(self.out_dir, "llms-full.txt")
+        generate_llms_full(self.test_dir, self.plain)
+        with open(self.plain, "rb") as f:
+            self.expected = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.out_dir)
+
+    def test_compressed_output_matches_plain_output(self):
+        # Concatenated frames are an ordinary gzip or xz file of the same document.
+        for ext, decompress in (("gz", gzip.decompress), ("xz", lzma.decompress)):
+            output = f"{self.plain}.{ext}"
+            generate_llms_full(self.test_dir, output, frame_size=1024)
+            with open(output, "rb") as f:
+                self.assertEqual(decompress(f.read()), self.expected)
+            table = load_frame_table(output)
+            self.assertGreater(len(table["frames"]), 1)
+            self.assertEqual(table["size"], len(self.expected))
+
+    def test_frames_start_at_sections(self):
+        # Every frame after the first starts with a section heading when sections fit in frames.
+        output = self.plain + ".gz"
+        generate_llms_full(self.test_dir, output, frame_size=8192)
+        table = load_frame_table(output)
+        self.assertGreater(len(table["frames"]), 1)
+        for _, _, offset, _ in table["frames"][1:]:
+            self.assertEqual(self.expected[offset:offset + 3], b"## ")
+
+    def test_read_range_decompresses_part_of_the_document(self):
+        output = self.plain + ".gz"
+        generate_llms_full(self.test_dir, output, frame_size=1024)
+        for offset, length in ((0, 10), (1500, 5000), (len(self.expected) - 7, 100)):
+            self.assertEqual(read_range(output, offset, length), self.expected[offset:offset + length])
+
+    def test_compression_needs_an_output_path(self):
+        with self.assertRaises(ValueError):
+            generate_llms_full(self.test_dir, io.StringIO(), compress="gzip")
+
+class TestSectionIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.out_dir, "llms-full.txt")
+        with open(os.path.join(self.test_dir, "guide.md"), "w", encoding="utf-8") as f:
+            f.write("# Guide\n> How to use it.\n\nNon-ASCII text: caf\u00e9 \u2014 \u65e5\u672c\n")
+        for name in ("a.py", "b.py"):
+            with open(os.path.join(self.test_dir, name), "w", encoding="utf-8") as f:
+                f.write(f"# {name}\n" + "print('hello')\n" * 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.out_dir)
+
+    def test_sections_are_read_back_by_path(self):
+        # Every indexed byte range holds exactly that section; relative paths are accepted.
+        generate_llms_full(self.test_dir, self.output, index=True)
+        with open(self.output, "rb") as f:
+            document = f.read()
+        with SectionReader(self.output) as reader:
+            self.assertEqual(sum(entry["length"] for entry in reader.entries), len(document))
+            self.assertEqual(len(reader), 3)
+            guide = reader.get("guide.md")
+            self.assertTrue(guide.startswith("## Guide\n> How to use it."))
+            self.assertIn("caf\u00e9", guide)
+            self.assertEqual(reader.get(os.path.join(self.test_dir, "b.py")).encode("utf-8"),
+                             document[document.index(b"## b.py"):])
+            with self.assertRaises(KeyError):
+                reader.get("missing.py")
+
+    def test_compressed_and_deduplicated_documents(self):
+        # Compressed documents are read through their frame table; duplicates can be followed.
+        with open(os.path.join(self.test_dir, "b.py"), "w", encoding="utf-8") as f:
+            f.write("# a.py\n" + "print('hello')\n" * 20)
+        output = self.output + ".gz"
+        generate_llms_full(self.test_dir, output, index=True, dedup=True, frame_size=64)
+        with SectionReader(output) as reader:
+            self.assertIn("> Same content as:", reader.get("b.py"))
+            self.assertEqual(reader.get("b.py", follow_duplicates=True), reader.get("a.py"))
+
+    def test_stale_index_is_rejected(self):
+        generate_llms_full(self.test_dir, self.output, index=True)
+        with open(self.output, "a", encoding="utf-8") as f:
+            f.write("extra")
+        with self.assertRaises(ValueError):
+            SectionReader(self.output)
+        self.assertTrue(os.path.exists(index_path(self.output)))
+
+def _sleep_job(directory, output, **options):
+    time.sleep(30)
+
+def _crash_job(directory, output, **options):
+    os._exit(3)
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.test_dir, "repo"))
+        with open(os.path.join(self.test_dir, "repo", "a.py"), "w", encoding="utf-8") as f:
+            f.write("print('a')\n")
+        self.manifest = os.path.join(self.test_dir, "manifest.yaml")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _write_manifest(self, text):
+        with open(self.manifest, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_load_manifest(self):
+        # Defaults apply to every job, paths are relative to the manifest and typos are caught.
+        self._write_manifest("defaults: {dedup: true, timeout: 5}\n"
+                             "jobs:\n  - {directory: repo, output: out/a.txt, index: true, git: HEAD}\n")
+        (job,) = batch.load_manifest(self.manifest)
+        self.assertEqual(job.directory, os.path.join(self.test_dir, "repo"))
+        self.assertEqual(job.output, os.path.join(self.test_dir, "out", "a.txt"))
+        self.assertEqual(job.options, {"dedup": True, "index": True, "git": "HEAD"})
+        self.assertEqual(job.timeout, 5)
+        self._write_manifest("[{directory: repo, output: a.txt, dedupe: true}]\n")
+        with self.assertRaises(ValueError):
+            batch.load_manifest(self.manifest)
+
+    def test_failures_are_isolated(self):
+        # A missing directory fails its own job; the others still produce their output.
+        self._write_manifest("- {directory: repo, output: out/a.txt}\n"
+                             "- {directory: missing, output: out/b.txt}\n"
+                             "- {directory: repo, output: out/c.txt.gz}\n")
+        results = batch.run_batch(batch.load_manifest(self.manifest), max_parallel=2)
+        self.assertEqual([result.status for result in results], ["ok", "failed", "ok"])
+        self.assertIn("NotADirectoryError", results[1].error)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "out", "a.txt")))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "out", "c.txt.gz")))
+        self.assertEqual(batch.summarize(results), "3 jobs: 2 ok, 1 failed")
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork to patch the worker")
+    def test_timeouts_and_crashes(self):
+        # Hung and crashing workers are killed or reported without taking the batch down.
+        jobs = [batch.Job(os.path.join(self.test_dir, "repo"), os.path.join(self.test_dir, name), {}, None)
+                for name in ("a.txt", "b.txt")]
+        with mock.patch.object(batch, "generate_llms_full", _sleep_job):
+            start = time.monotonic()
+            (result,) = batch.run_batch(jobs[:1], timeout=0.2)
+            self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(result.status, "timeout")
+        with mock.patch.object(batch, "generate_llms_full", _crash_job):
+            (result,) = batch.run_batch(jobs[1:])
+        self.assertEqual(result.status, "crashed")
+        self.assertIn("code 3", result.error)
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _snapshot(self, root):
+        snapshot = {}
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                with open(os.path.join(dirpath, name), "rb") as f:
+                    snapshot[os.path.relpath(os.path.join(dirpath, name), root)] = f.read()
+        return snapshot
+
+    def test_make_tree_is_deterministic(self):
+        # The same seed gives the same files; the requested kinds of files are all there.
+        options = dict(files=60, size_median=512, non_utf8=0.2, binary=0.1, depth=2, seed=7)
+        first = benchmark.make_tree(os.path.join(self.test_dir, "a"), **options)
+        second = benchmark.make_tree(os.path.join(self.test_dir, "b"), **options)
+        self.assertEqual(first, second)
+        self.assertEqual(first["files"], 60)
+        self.assertGreater(first["binary"], 0)
+        self.assertGreater(first["non_utf8"], 0)
+        self.assertEqual(self._snapshot(os.path.join(self.test_dir, "a")),
+                         self._snapshot(os.path.join(self.test_dir, "b")))
+        result = scan.scan_tree(os.path.join(self.test_dir, "a"), count_lines=True)
+        self.assertEqual(len(result.skipped), first["binary"])
+
+    def test_compare_flags_regressions(self):
+        baseline = {"generate_toc": {"seconds": 1.0, "peak_rss_kb": 1000},
+                    "count_characters": {"seconds": 1.0, "peak_rss_kb": 1000}}
+        results = {"generate_toc": {"seconds": 1.05, "peak_rss_kb": 1500},
+                   "count_characters": {"seconds": 1.5, "peak_rss_kb": 900},
+                   "count_lines_of_code": {"seconds": 9.0, "peak_rss_kb": 900}}
+        regressions = benchmark.compare(results, baseline, threshold=0.10)
+        self.assertEqual([(name, metric) for name, metric, *_ in regressions],
+                         [("generate_toc", "peak_rss_kb"), ("count_characters", "seconds")])
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.output = os.path.join(tempfile.mkdtemp(), "llms-full.txt")
+        with open(os.path.join(self.test_dir, "guide.md"), "w", encoding="utf-8") as f:
+            f.write("# Guide\n> How to use it.\n\nText.\n")
+        with open(os.path.join(self.test_dir, "legacy.py"), "wb") as f:
+            f.write("# caf\u00e9\nprint(1)\n".encode("cp1252"))
+        with open(os.path.join(self.test_dir, "blob.py"), "wb") as f:
+            f.write(b"\0binary")
+        for number in range(5):
+            with open(os.path.join(self.test_dir, f"m{number}.py"), "w", encoding="utf-8") as f:
+                f.write("x = 1\n" * (number + 1) * 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(os.path.dirname(self.output))
+
+    def test_generate_profile(self):
+        # The profile covers the phases, bytes, fallbacks and skips without changing the output.
+        generate_llms_full(self.test_dir, self.output)
+        with open(self.output, "rb") as f:
+            expected = f.read()
+        profile = profiling.Profile("test", top=3)
+        result = generate_llms_full(self.test_dir, self.output, profile=profile)
+        profile.finish(result)
+        with open(self.output, "rb") as f:
+            self.assertEqual(f.read(), expected)
+        data = json.loads(json.dumps(profile.to_dict()))
+        for phase in ("walk", "read", "decode", "render", "write"):
+            self.assertIn(phase, data["phases"])
+        self.assertEqual(data["files"], 7)
+        self.assertEqual(data["bytes_written"], len(expected))
+        self.assertEqual(data["extensions"][".py"]["files"], 6)
+        self.assertEqual(data["decode_fallbacks"]["paths"], [os.path.join(self.test_dir, "legacy.py")])
+        self.assertEqual(data["skipped"]["by_reason"], {SKIP_BINARY: 1})
+        self.assertEqual(len(data["slowest"]), 3)
+        self.assertEqual(data["largest"][0]["path"], os.path.join(self.test_dir, "m4.py"))
+        self.assertIn("Skipped: 1 files (binary: 1)", profile.summary())
+
+    def test_counter_profile(self):
+        profile = profiling.Profile()
+        total, _ = count_lines_of_code(self.test_dir, profile=profile)
+        self.assertEqual(total, 10 + 20 + 30 + 40 + 50 + 2 + 4)
+        self.assertIn("read+count", profile.phases)
+        self.assertEqual(len(profile.skipped), 1)
+
+class TestMarkdownMetadata(unittest.TestCase):
+    def render(self, content):
+        return "".join(generate_llms.render_markdown("docs/page.md", content).chunks)
+
+    def test_front_matter(self):
+        content = ('---\ntitle: "Install \\"Guide\\""\ndescription: \'It\'\'s quick\'\nlayout: page\n---\n'
+                   "\n# Heading\n> Quote\n\nBody.\n")
+        meta = extract_metadata(content)
+        self.assertEqual((meta.title, meta.summary), ('Install "Guide"', "It's quick"))
+        self.assertEqual(self.render(content),
+                         '## Install "Guide"\n> It\'s quick\n\n# Heading\n> Quote\n\nBody.\n\n')
+        # Front matter without the fields is still left out; the heading and quote are used.
+        self.assertEqual(self.render("---\nlayout: page\n---\n# Heading\n> Quote\nBody.\n"),
+                         "## Heading\n> Quote\n\nBody.\n\n")
+        # A document opening with a thematic break has no front matter, even with a later one.
+        content = "---\n\n# Heading\n\nNote: the intro.\nIt goes on.\n\n---\n\nMore.\n"
+        meta = extract_metadata(content)
+        self.assertEqual((meta.title, meta.summary), ("Heading", None))
+        self.assertIn("Note: the intro.\nIt goes on.\n\n---\n\nMore.", self.render(content))
+
+    def test_bounded_prefix(self):
+        filler = "text\n" * (METADATA_PREFIX // 5)
+        meta = extract_metadata("intro\n" + filler + "# Late title\n> Late summary\n")
+        self.assertEqual(meta, (None, None, []))
+        # A line that starts inside the prefix is read to its end.
+        content = "x" * (METADATA_PREFIX - 3) + "\n# Title that crosses the limit\nBody\n"
+        self.assertEqual(extract_metadata(content).title, "Title that crosses the limit")
+        self.assertEqual(self.render("# T\n> S\n\nBody\n# Not a title\n"),
+                         "## T\n> S\n\nBody\n# Not a title\n\n")
+
+    def test_body_is_sliced_not_copied(self):
+        content = "No metadata here.\nJust text."
+        (body,) = body_slices(content, [])
+        self.assertIs(body, content)
+        self.assertEqual(body_slices(" \n# T\n\n> S\n  Body  \n", [(2, 5), (7, 10)]), ["Body"])
+
+    def test_streamed_markdown_matches(self):
+        # Large Markdown files are streamed; the section is the same as from the whole text.
+        content = "\n\n# Big\n" + "line of text\n" * 3000 + "> not a summary\n" + "more\n" * 100 + "\n \n"
+        pieces = [content[i:i + 100] for i in range(0, len(content), 100)]
+        section = generate_llms._render_markdown_stream("docs/big.md", iter(pieces))
+        expected = generate_llms.render_markdown("docs/big.md", content)
+        self.assertEqual((section.title, section.summary), (expected.title, expected.summary))
+        self.assertEqual("".join(section.chunks), "".join(expected.chunks))
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class TestGitSource(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.git("init", "-q")
+        os.makedirs(os.path.join(self.test_dir, "docs"))
+        os.makedirs(os.path.join(self.test_dir, "generated"))
+        self.write("docs/guide.md", "# Guide\n> Committed.\n")
+        self.write("tool.py", "print(1)\n")
+        self.write("old.py", "print('old')\n")
+        self.write("generated/module.py", "print('untracked')\n")
+        # Old mtimes, so that the index entries are not "racily clean" and carry usable blob ids.
+        for name in ("docs/guide.md", "tool.py", "old.py"):
+            os.utime(os.path.join(self.test_dir, name), (1_000_000_000, 1_000_000_000))
+        self.git("add", "docs", "tool.py", "old.py")
+        self.git("-c", "user.name=Test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "Initial")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def git(self, *args):
+        return subprocess.run(["git", "-C", self.test_dir, *args], check=True, stdout=subprocess.PIPE).stdout
+
+    def write(self, name, text):
+        with open(os.path.join(self.test_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def generate(self, **options):
+        output = io.StringIO()
+        generate_llms_full(self.test_dir, output, count_lines=True, **options)
+        return output.getvalue()
+
+    def test_index_matches_ls_files(self):
+        expected = sorted(line.split(None, 3)[1::2] for line in self.git("ls-files", "-s").decode().splitlines())
+        for version in ("2", "4"):
+            self.git("update-index", "--index-version", version)
+            entries = gitsource.read_index(os.path.join(self.test_dir, ".git", "index"))
+            self.assertEqual(sorted([entry.blob, entry.path] for entry in entries), expected)
+            self.assertTrue(all(entry.valid for entry in entries))
+        self.assertEqual(gitsource.file_blob_id(os.path.join(self.test_dir, "tool.py")),
+                         self.git("hash-object", "tool.py").decode().strip())
+        # From a subdirectory, paths are relative to it.
+        self.assertEqual([entry.path for entry in gitsource.index_entries(os.path.join(self.test_dir, "docs"))],
+                         ["guide.md"])
+
+    def test_untracked_files_are_left_out(self):
+        self.write("tool.py", "print(2)\n")
+        output = self.generate(git=True)
+        self.assertIn("print(2)", output)
+        self.assertIn("## Guide", output)
+        self.assertNotIn("untracked", output)
+        self.assertIn("untracked", self.generate())
+
+    def test_revision_without_checkout(self):
+        self.write("tool.py", "print(2)\n")
+        os.remove(os.path.join(self.test_dir, "old.py"))
+        output = io.StringIO()
+        result = generate_llms_full(self.test_dir, output, count_lines=True, git="HEAD")
+        self.assertIn("print(1)", output.getvalue())
+        self.assertIn("print('old')", output.getvalue())
+        self.assertNotIn("print(2)", output.getvalue())
+        # guide.md, tool.py and old.py as committed.
+        self.assertEqual(result.total_lines, 4)
+        self.assertEqual(count_lines_of_code(self.test_dir, git="HEAD")[0], 4)
+        with self.assertRaises(ValueError):
+            self.generate(git="no-such-revision")
+
+    def test_blob_id_serves_cache_without_reading(self):
+        output = os.path.join(tempfile.mkdtemp(), "llms-full.txt")
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        with mock.patch("builtins.print"):
+            generate_llms_full(self.test_dir, output, cache=True, git=True)
+        # New mtimes, same content: the refreshed index still vouches for the blobs.
+        for name in ("docs/guide.md", "tool.py", "old.py"):
+            os.utime(os.path.join(self.test_dir, name), (1_100_000_000, 1_100_000_000))
+        self.git("update-index", "--refresh")
+        with mock.patch("builtins.print") as printed, mock.patch("utils.open", create=True) as opened:
+            generate_llms_full(self.test_dir, output, cache=True, git=True)
+        opened.assert_not_called()
+        self.assertIn(mock.call("Cache: 3 unchanged, 0 re-rendered"), printed.call_args_list)
+
+class TestArchiveSource(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.tree = os.path.join(self.test_dir, "tree")
+        for name, text in (("docs/guide.md", "# Guide\n> Read me.\n" + "Text.\n" * 30),
+                           ("docs/copy.md", "# Guide\n> Read me.\n" + "Text.\n" * 30),
+                           ("src/app.py", "print('app')\n" * 20), ("src/big.py", "x = 1\n" * 400),
+                           ("node_modules/dep.js", "ignored();\n"), ("latin.txt", "caf\xe9\n")):
+            path = os.path.join(self.tree, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="latin-1" if name == "latin.txt" else "utf-8") as f:
+                f.write(text)
+        with open(os.path.join(self.tree, "src", "blob.py"), "wb") as f:
+            f.write(b"\x89PNG\x00\x00")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def make_tar(self, mode="w:gz", name="snapshot.tar.gz"):
+        path = os.path.join(self.test_dir, name)
+        with tarfile.open(path, mode) as tar:
+            tar.add(self.tree, arcname=".")
+        return path
+
+    def make_zip(self):
+        path = os.path.join(self.test_dir, "snapshot.zip")
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for root, _, files in os.walk(self.tree):
+                for filename in files:
+                    filepath = os.path.join(root, filename)
+                    archive.write(filepath, os.path.relpath(filepath, self.tree))
+        return path
+
+    def generate(self, directory):
+        output = io.StringIO()
+        # A low threshold, so that src/big.py is streamed from the archive.
+        with mock.patch.object(scan, "STREAM_THRESHOLD", 1024):
+            result = generate_llms_full(directory, output, count_lines=True, dedup=True)
+        return output.getvalue().replace(directory, "<root>"), result
+
+    def test_matches_directory_run(self):
+        expected, expected_result = self.generate(self.tree)
+        for archive_path in (self.make_tar(), self.make_tar("w", "snapshot.tar"), self.make_zip()):
+            output, result = self.generate(archive_path)
+            self.assertEqual(output, expected, archive_path)
+            self.assertEqual(result.total_lines, expected_result.total_lines)
+            self.assertEqual(len(result.duplicates), 1)
+            self.assertEqual([skipped.reason for skipped in result.skipped], [SKIP_BINARY])
+        self.assertNotIn("ignored()", expected)
+        self.assertEqual(count_lines_of_code(self.make_zip())[0], expected_result.total_lines)
+
+    def test_reads_in_any_order_with_bounded_read_ahead(self):
+        archive_path = self.make_tar()
+        for read_ahead in (0, 64, archive.READ_AHEAD):
+            with archive.ArchiveSource(archive_path, read_ahead) as source:
+                paths = [os.path.join(dirpath, filename) for dirpath, files in source.walk() for filename, _ in files]
+                source.want(paths)
+                self.assertTrue(source.sequential)
+                for path in sorted(paths, reverse=True):
+                    with source.open(path) as f:
+                        data = f.read()
+                    with open(path.replace(archive_path, self.tree), "rb") as f:
+                        self.assertEqual(data, f.read(), path)
+
+    def test_only_collected_members_are_buffered(self):
+        with open(os.path.join(self.tree, "notes.bin"), "w") as f:
+            f.write("not collected\n")
+        archive_path = self.make_tar()
+        with archive.ArchiveSource(archive_path) as source:
+            _, counted, _ = scan.collect(archive_path, count=True, source=source)
+            wanted = {member.path for member in source._tar_reader._wanted.values()}
+        self.assertEqual(wanted, {os.path.relpath(path, archive_path).replace(os.sep, "/") for path in counted})
+        self.assertNotIn("notes.bin", wanted)
+        self.assertIn("src/app.py", wanted)
+
+    def test_unsafe_and_special_members_are_left_out(self):
+        archive_path = os.path.join(self.test_dir, "odd.tar")
+        with tarfile.open(archive_path, "w") as tar:
+            for name in ("../escape.py", "/absolute.py", "./ok.py"):
+                info = tarfile.TarInfo(name)
+                info.size = 5
+                tar.addfile(info, io.BytesIO(b"x = 1"))
+            link = tarfile.TarInfo("link.py")
+            link.type = tarfile.SYMTYPE
+            link.linkname = "/etc/passwd"
+            tar.addfile(link)
+        with archive.ArchiveSource(archive_path) as source:
+            self.assertEqual([files for _, files in source.walk()], [[("ok.py", archive.ArchiveStat(5, 0))]])
+        self.assertFalse(archive.is_archive(self.tree))
+
+class TestCountTable(unittest.TestCase):
+    def make_table(self):
+        table = CountTable()
+        root = os.path.join(os.sep, "repo")
+        for relpath, lines, chars in (("src/app.py", 120, 4000), ("src/util/io.py", 30, 900),
+                                      ("README.md", 10, 300), (".bashrc", 3, 40), ("src/data.bin", None, 64)):
+            table.add(os.path.join(root, *relpath.split("/")), lines, chars)
+        return table, root
+
+    def test_views_behave_like_dicts(self):
+        table, root = self.make_table()
+        lines = table.view("lines")
+        readme = os.path.join(root, "README.md")
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[readme], 10)
+        self.assertNotIn(os.path.join(root, "src", "data.bin"), lines)
+        self.assertIn(os.path.join(root, "src", "data.bin"), table.view("chars"))
+        with self.assertRaises(KeyError):
+            lines[os.path.join(root, "missing.py")]
+        self.assertEqual(dict(lines.items()), dict(lines))
+        self.assertEqual(sorted(lines.values()), [3, 10, 30, 120])
+        self.assertEqual(lines, {path: value for path, value in lines.items()})
+        # Rows added after the lookup index was built are found too.
+        table.add(os.path.join(root, "late.py"), 7, 70)
+        self.assertEqual(lines[os.path.join(root, "late.py")], 7)
+
+    def test_aggregations(self):
+        table, root = self.make_table()
+        src = os.path.join(root, "src")
+        self.assertEqual(table.by_directory("lines"), {src: 120, os.path.join(src, "util"): 30, root: 13})
+        self.assertEqual(table.by_directory("chars", recursive=True),
+                         {root: 5304, src: 4964, os.path.join(src, "util"): 900})
+        self.assertEqual(table.by_extension("lines"), {".py": 150, ".md": 10, "": 3})
+        self.assertEqual(table.top(2, "chars"), [(os.path.join(src, "app.py"), 4000), (os.path.join(src, "util", "io.py"), 900)])
+        self.assertEqual(len(table.top(10, "lines")), 4)
+
+    def test_save_and_load(self):
+        table, root = self.make_table()
+        table.add(os.path.join(root, "caf\udce9.py"), 1, 4)
+        path = os.path.join(tempfile.mkdtemp(), "counts.bin")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        table.save(path)
+        loaded = CountTable.load(path)
+        self.assertEqual(dict(loaded.view("lines")), dict(table.view("lines")))
+        self.assertEqual(dict(loaded.view("chars")), dict(table.view("chars")))
+        self.assertEqual(loaded.by_extension("chars"), table.by_extension("chars"))
+        with open(path, "wb") as f:
+            f.write(b"not a table")
+        with self.assertRaises(ValueError):
+            CountTable.load(path)
+
+class TestEstimate(unittest.TestCase):
+    def make_tree(self, files_per_directory):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for index in range(files_per_directory):
+            for directory, extension in (("src", ".py"), ("docs", ".md")):
+                os.makedirs(os.path.join(root, directory), exist_ok=True)
+                line = "x" * (index % 37) + "\n"
+                with open(os.path.join(root, directory, f"f{index}{extension}"), "w") as f:
+                    f.write(line * (1 + index % 50))
+        return root
+
+    def test_small_strata_are_counted_exactly(self):
+        root = self.make_tree(2)
+        result = estimate.estimate_counts(root)
+        total_lines, _ = count_lines_of_code(root)
+        total_chars, _ = count_characters(root)
+        self.assertEqual(result.lines, (total_lines, total_lines, total_lines))
+        self.assertEqual(result.chars, (total_chars, total_chars, total_chars))
+        self.assertEqual(result.exact_strata, result.strata)
+        self.assertEqual(result.files_read, result.total_files)
+
+    def test_interval_covers_exact_counts(self):
+        root = self.make_tree(1500)
+        total_lines, _ = count_lines_of_code(root)
+        total_chars, _ = count_characters(root)
+        result = estimate.estimate_counts(root, target_error=0.05, seed=1)
+        self.assertLess(result.files_read, result.total_files)
+        self.assertLessEqual(result.lines.low, total_lines)
+        self.assertLessEqual(total_lines, result.lines.high)
+        self.assertLessEqual(result.chars.low, total_chars)
+        self.assertLessEqual(total_chars, result.chars.high)
+        self.assertEqual(result.total_files, 3000)
+        # The same seed draws the same sample.
+        again = estimate.estimate_counts(root, target_error=0.05, seed=1)
+        self.assertEqual((again.lines, again.chars, again.files_read), (result.lines, result.chars, result.files_read))
+
+    def test_time_budget_stops_after_pilot(self):
+        root = self.make_tree(1500)
+        result = estimate.estimate_counts(root, target_error=0.0, time_budget=0)
+        self.assertLessEqual(result.files_read, result.strata * estimate.PILOT_SIZE)
+        self.assertLessEqual(result.lines.low, result.lines.estimate)
+        self.assertLessEqual(result.lines.estimate, result.lines.high)
+
+    def test_command_line(self):
+        root = self.make_tree(2)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            llms.main(["count-lines", root, "--estimate", "--seed", "3"])
+        self.assertIn("Estimated total lines:", output.getvalue())
+        self.assertIn("strata counted exactly", output.getvalue())
+
+    def test_archives_are_sampled_like_the_exact_count(self):
+        root = self.make_tree(2)
+        archive = os.path.join(root, "tree.tar")
+        with tarfile.open(archive, "w") as tar:
+            tar.add(os.path.join(root, "src"), "src")
+            tar.add(os.path.join(root, "docs"), "docs")
+        total_lines, _ = count_lines_of_code(archive)
+        self.assertGreater(total_lines, 0)
+        self.assertEqual(estimate.estimate_counts(archive).lines.estimate, total_lines)
+        compressed = os.path.join(root, "tree.tgz")
+        with tarfile.open(compressed, "w:gz") as tar:
+            tar.add(os.path.join(root, "src"), "src")
+        with self.assertRaises(ValueError):
+            estimate.estimate_counts(compressed)
+
+class TestCompact(unittest.TestCase):
+    JS = (
+        "/*\n * Copyright 2024 Example Corp.\n * Licensed under the MIT License.\n */\n\n"
+        "// Adds one.\n"
+        "function inc(x) {   \n"
+        "    return x + 1; // trailing\n\n\n\n"
+        "}\n"
+        "const url = \"http://example.com/*not a comment*/\";\n"
+    )
+    PY = (
+        "#!/usr/bin/env python\n# Copyright 2024 Example Corp.\n\n"
+        '"""Module docstring."""\n\n'
+        "def f(x):\n"
+        '    """Returns x."""\n'
+        "    # explain\n"
+        "    return x  # why\n\n"
+        "def g():\n"
+        '    """Only statement, kept."""\n'
+        "text = '# not a comment'\n"
+    )
+
+    def test_basic_drops_license_and_whitespace(self):
+        compactor = compact.Compactor("basic")
+        result = compactor.text("a.js", self.JS)
+        # The license header is the whole leading comment block.
+        self.assertTrue(result.startswith("function inc(x) {\n"))
+        self.assertNotIn("Copyright", result)
+        self.assertNotIn("\n\n\n", result)
+        self.assertIn("// trailing", result)
+        self.assertEqual(compactor.files, 1)
+        self.assertLess(compactor.bytes_after, compactor.bytes_before)
+        self.assertGreater(compactor.tokens_saved, 0)
+
+    def test_comments_level(self):
+        result = compact.Compactor("comments").text("a.js", self.JS)
+        self.assertEqual(result, "function inc(x) {\n    return x + 1;\n\n}\n"
+                                 "const url = \"http://example.com/*not a comment*/\";\n")
+        result = compact.Compactor("comments").text("a.py", self.PY)
+        self.assertTrue(result.startswith("#!/usr/bin/env python\n"))
+        self.assertNotIn("explain", result)
+        self.assertIn("    return x\n", result)
+        self.assertIn("'# not a comment'", result)
+        self.assertIn("Returns x.", result)
+
+    def test_docstrings_level(self):
+        result = compact.Compactor("docstrings").text("a.py", self.PY)
+        self.assertNotIn("Module docstring", result)
+        self.assertNotIn("Returns x.", result)
+        self.assertIn("Only statement, kept.", result)
+        ast.parse(result)
+        # Source with an unclosed string is left as it is.
+        self.assertEqual(compact.strip_docstrings('def f(:\n    """x\n'), 'def f(:\n    """x\n')
+
+    def test_docstrings_are_told_from_other_strings(self):
+        kept = (
+            'x = {\n    "a":\n        "b"\n    ,\n}\n'
+            'if x:\n    "%s" % x\n    y = 1\n'
+            'z = "no docstring:" \\\n    "here"\n'
+            'class A: "same line"; y = 1\n'
+            'def f():\n    "only"\n'
+        )
+        self.assertEqual(compact.strip_docstrings(kept), kept)
+        source = "# note\nr'''Module.'''\nclass A:  # why\n\n    u'Class.'  # doc\n    y = {'k': 1}\n"
+        self.assertEqual(compact.strip_docstrings(source), "# note\nclass A:  # why\n\n    y = {'k': 1}\n")
+
+    def test_unknown_languages_get_whitespace_rules(self):
+        result = compact.Compactor("comments").text("notes.txt", "# keep   \n\n\n\nend\n")
+        self.assertEqual(result, "# keep\n\nend\n")
+
+    def test_streamed_output_matches_whole_text(self):
+        for level in compact.LEVELS:
+            for filepath, content in (("a.js", self.JS), ("a.py", self.PY)):
+                expected = compact.Compactor(level).text(filepath, content) if level != "docstrings" or \
+                    filepath != "a.py" else compact.Compactor("comments").text(filepath, content)
+                for size in (1, 3, 7, 64):
+                    chunks = [content[i:i + size] for i in range(0, len(content), size)]
+                    streamed = "".join(compact.Compactor(level).chunks(filepath, chunks))
+                    self.assertEqual(streamed, expected, (level, filepath, size))
+        compactor = compact.Compactor("docstrings")
+        "".join(compactor.chunks("a.py", [self.PY]))
+        self.assertIn("1 streamed Python files kept their docstrings", compactor.summary())
+
+    def test_generate_llms_full(self):
+        test_dir, out_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        self.addCleanup(shutil.rmtree, out_dir)
+        with open(os.path.join(test_dir, "a.js"), "w", encoding="utf-8") as f:
+            f.write(self.JS)
+        output = os.path.join(out_dir, "llms-full.txt")
+        with redirect_stdout(io.StringIO()) as printed:
+            generate_llms_full(test_dir, output, compact="comments")
+        with open(output, encoding="utf-8") as f:
+            content = f.read()
+        self.assertIn("function inc(x) {\n    return x + 1;\n", content)
+        self.assertNotIn("Adds one", content)
+        self.assertIn("Compacted 1 files (comments)", printed.getvalue())
+        self.assertNotEqual(generate_llms._cache_fingerprint(compact=compact.Compactor("basic")),
+                            generate_llms._cache_fingerprint(compact=compact.Compactor("comments")))
+        with self.assertRaises(ValueError):
+            compact.Compactor("everything")
+
+class TestRank(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.addCleanup(shutil.rmtree, self.out_dir)
+        self.output = os.path.join(self.out_dir, "llms-full.txt")
+        files = {
+            "README.md": "# Project\n\nSee [the guide](docs/guide.md).\n",
+            "docs/guide.md": "# Guide\n\nUsage.\n",
+            "core.py": "def run():\n    return 1\n" * 20,
+            "app.py": "import core\n\ncore.run()\n",
+            "helpers.py": "from core import run\n" + "x = 1\n" * 400,
+            "tests/test_core.py": "import core\n\ndef test_run():\n    assert core.run()\n",
+            "vendor/dep.py": "import core\n" + "y = 2\n" * 50,
+        }
+        for name, content in files.items():
+            path = os.path.join(self.test_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+    def titles(self, content):
+        return [line[3:] for line in content.splitlines() if line.startswith("## ")]
+
+    def test_path_signals(self):
+        self.assertIn("top_readme", rank.path_signals("README.md"))
+        self.assertNotIn("top_readme", rank.path_signals("pkg/README.md"))
+        self.assertIn("test", rank.path_signals("tests/test_core.py"))
+        self.assertIn("test", rank.path_signals("src/parser_test.go"))
+        self.assertIn("vendored", rank.path_signals("vendor/github.com/x/y.go"))
+        self.assertIn("generated", rank.path_signals("static/app.min.js"))
+        self.assertIn("entry_point", rank.path_signals("__main__.py"))
+
+    def test_references(self):
+        self.assertEqual(rank.references(b"import os.path\nfrom pkg.sub import name\n", ".py"),
+                         {"os", "path", "pkg", "sub"})
+        self.assertEqual(rank.references(b"import a from './lib/util.js';\nconst b = require('../b')\n", ".js"),
+                         {"util", "b"})
+        self.assertEqual(rank.references(b'#include "core/parser.h"\n#include <stdio.h>\n', ".c"), {"parser", "stdio"})
+        self.assertEqual(rank.references(b"[x](docs/guide.md) [y](https://example.com/z)", ".md"), {"guide"})
+        self.assertEqual(rank.references(b"import core\n", ".json"), set())
+
+    def test_inbound_references_raise_the_score(self):
+        _, _, stats = scan.collect(self.test_dir, generate_llms._section_groups())
+        paths = sorted(stats)
+        with_references = {item.path: item for item in rank.rank_files(paths, stats, self.test_dir, utils.read_head)}
+        without = {item.path: item for item in rank.rank_files(paths, stats, self.test_dir)}
+        core = os.path.join(self.test_dir, "core.py")
+        self.assertGreater(with_references[core].signals["references"], 1)
+        self.assertNotIn("references", without[core].signals)
+        ranked = [os.path.relpath(item.path, self.test_dir) for item in rank.rank_files(paths, stats, self.test_dir,
+                                                                                     utils.read_head)]
+        self.assertEqual(ranked[0], "README.md")
+        self.assertLess(ranked.index("core.py"), ranked.index("tests/test_core.py"))
+        self.assertEqual(ranked[-1], os.path.join("vendor", "dep.py"))
+
+    def test_rank_reorders_without_dropping(self):
+        with redirect_stdout(io.StringIO()):
+            generate_llms_full(self.test_dir, self.output, rank_references=True)
+        with open(self.output, encoding="utf-8") as f:
+            titles = self.titles(f.read())
+        self.assertEqual(titles[:2], ["Project", "Guide"])
+        code = titles[2:]
+        self.assertEqual(sorted(code), ["app.py", "core.py", "dep.py", "helpers.py", "test_core.py"])
+        self.assertEqual(code[0], "core.py")
+        self.assertEqual(code[-1], "dep.py")
+
+    def test_references_are_only_read_on_request(self):
+        ranker = rank.Ranker()
+        head = mock.Mock(return_value=b"")
+        _, _, stats = scan.collect(self.test_dir, generate_llms._section_groups())
+        ranker.order(self.test_dir, [sorted(stats)], stats, head)
+        head.assert_not_called()
+        self.assertFalse(any("references" in item.signals for item in ranker.ranked))
+        # Without references, the entry point leads the code.
+        with redirect_stdout(io.StringIO()):
+            generate_llms_full(self.test_dir, self.output, rank=True)
+        with open(self.output, encoding="utf-8") as f:
+            self.assertEqual(self.titles(f.read())[2], "app.py")
+
+    def test_git_and_archive_sources(self):
+        # Their stats only carry st_size and st_mtime_ns.
+        sources = []
+        for name, mode in (("tree.tar.gz", "w:gz"), ("tree.zip", None)):
+            path = os.path.join(self.out_dir, name)
+            if mode:
+                with tarfile.open(path, mode) as tar:
+                    tar.add(self.test_dir, "tree")
+            else:
+                with zipfile.ZipFile(path, "w") as archive:
+                    for directory, _, files in os.walk(self.test_dir):
+                        for file in files:
+                            full = os.path.join(directory, file)
+                            archive.write(full, os.path.join("tree", os.path.relpath(full, self.test_dir)))
+            sources.append((path, {}))
+        if shutil.which("git"):
+            git = ["git", "-C", self.test_dir, "-c", "user.name=Test", "-c", "user.email=test@example.com"]
+            subprocess.run(git + ["init", "-q"], check=True)
+            subprocess.run(git + ["add", "."], check=True)
+            subprocess.run(git + ["commit", "-q", "-m", "Initial"], check=True)
+            sources += [(self.test_dir, {"git": True}), (self.test_dir, {"git": "HEAD"})]
+        for directory, options in sources:
+            for references in (False, True):
+                with self.subTest(directory=os.path.basename(directory), references=references, **options):
+                    output = io.StringIO()
+                    with redirect_stdout(io.StringIO()):
+                        generate_llms_full(directory, output, rank_references=references, **options)
+                    titles = self.titles(output.getvalue())
+                    self.assertEqual(titles[0], "Project")
+                    self.assertEqual(len(titles), 7)
+                    self.assertEqual(titles[-1], "dep.py")
+                    ranker = rank.Ranker(600, "bytes", references=references)
+                    output = io.StringIO()
+                    with redirect_stdout(io.StringIO()):
+                        generate_llms_full(directory, output, rank=ranker, **options)
+                    self.assertLessEqual(len(output.getvalue().encode("utf-8")), 600)
+                    self.assertEqual(self.titles(output.getvalue())[0], "Project")
+                    self.assertLess(ranker.emitted, len(ranker.ranked))
+
+    def test_budget(self):
+        for unit, measure in (("bytes", lambda text: len(text.encode("utf-8"))), ("tokens", estimate_tokens)):
+            ranker = rank.Ranker(600, unit)
+            with redirect_stdout(io.StringIO()) as printed:
+                result = generate_llms_full(self.test_dir, self.output, rank=ranker, count_lines=True)
+            with open(self.output, encoding="utf-8") as f:
+                content = f.read()
+            # Estimates of the pieces add up to at least the estimate of the whole.
+            self.assertLessEqual(measure(content), ranker.used)
+            self.assertLessEqual(ranker.used, 600)
+            titles = self.titles(content)
+            self.assertEqual(titles[0], "Project")
+            self.assertLess(ranker.emitted, len(ranker.ranked))
+            self.assertNotIn("dep.py", titles)
+            self.assertIn("Selected", printed.getvalue())
+            # Files left out are still counted.
+            self.assertEqual(len(result.line_counts), 7)
+        with self.assertRaises(ValueError):
+            rank.Ranker(100, "pages")
+
+    def test_budget_drops_references_to_dropped_originals(self):
+        sections = [scan.Section("code", "a", "a", ["x" * 50]), scan.Section("code", "b", "b", ["see a"]),
+                    scan.Section("code", "c", "c", ["y" * 10])]
+        ranker = rank.Ranker(20, "bytes")
+        kept = [section.path for section in ranker.fit(sections, {"b": "a"})]
+        self.assertEqual(kept, ["c"])
+        self.assertEqual(ranker.dropped, 2)
+
+class TestChunkExport(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.addCleanup(shutil.rmtree, self.out_dir)
+        self.output = os.path.join(self.out_dir, "llms-full.txt")
+        self.path = chunk_export.chunks_path(self.output)
+        files = {
+            "README.md": "# Project\n\n" + "An introduction to the project.\n" * 30
+                         + "\n## Install\n\n" + "Run the installer.\n" * 30
+                         + "\n```sh\n# not a heading\n```\n",
+            "core.py": "".join(f"def f{i}(x):\n    return x + {i}\n\n" for i in range(200)),
+            "app.py": "import core\n\nprint(core.f1(2))\n",
+        }
+        for name, content in files.items():
+            with open(os.path.join(self.test_dir, name), "w", encoding="utf-8") as f:
+                f.write(content)
+
+    def export(self, sections, **options):
+        # Exports sections fed in small pieces and returns the chunk records.
+        with chunk_export.ChunkExporter(self.path, self.test_dir, **options) as exporter:
+            for section in map(exporter.track, sections):
+                for _ in section.chunks:
+                    pass
+        return chunk_export.load_chunks(self.path)[1]
+
+    def pieces(self, text, size=7):
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def test_windows_fit_and_overlap(self):
+        text = "".join(f"line {i} of the file\n" for i in range(300))
+        for unit, measure in (("tokens", estimate_tokens), ("chars", len)):
+            chunks = self.export([scan.Section("code", "a.py", "a.py", self.pieces(text))],
+                                 size=60, overlap=25, unit=unit)
+            self.assertGreater(len(chunks), 5)
+            for chunk in chunks:
+                self.assertLessEqual(measure(chunk["text"]), chunk[unit])
+                self.assertLessEqual(chunk[unit], 60)
+                self.assertTrue(chunk["text"].endswith("\n"))
+            for previous, chunk in zip(chunks, chunks[1:]):
+                # The next window starts inside the previous one, on a line boundary.
+                self.assertLess(chunk["offset"], previous["offset"] + previous["length"])
+                self.assertGreater(chunk["offset"], previous["offset"])
+                self.assertEqual(text.encode()[chunk["offset"] - 1:chunk["offset"]], b"\n")
+            self.assertEqual(chunks[0]["offset"], 0)
+            self.assertEqual(chunks[-1]["offset"] + chunks[-1]["length"], len(text))
+
+    def test_headings_start_chunks(self):
+        text = ("# Guide\n\n" + "Some words about it.\n" * 10 + "## Setup\n\n" + "Step one.\n" * 10
+                + "```md\n## Inside a fence\n```\n" + "### Usage\n\n" + "Call it.\n" * 5)
+        chunks = self.export([scan.Section("markdown", "guide.md", "Guide", self.pieces(text, 5))],
+                             size=80, overlap=10, unit="tokens")
+        starts = [chunk["text"].splitlines()[0] for chunk in chunks]
+        self.assertEqual(starts, ["# Guide", "## Setup", "### Usage"])
+        self.assertEqual([chunk["heading"] for chunk in chunks], ["Guide", "Setup", "Usage"])
+        self.assertEqual("".join(chunk["text"] for chunk in chunks), text)
+
+    def test_long_lines_are_cut(self):
+        text = "x" * 950 + "\nshort\n"
+        chunks = self.export([scan.Section("code", "min.js", "min.js", [text])], size=100, overlap=20,
+                             unit="chars")
+        self.assertTrue(all(len(chunk["text"]) <= 100 for chunk in chunks))
+        # Cuts inside a line are not overlapped.
+        self.assertEqual("".join(chunk["text"] for chunk in chunks), text)
+        self.assertEqual(chunks[-1]["text"], "x" * 50 + "\nshort\n")
+
+    def test_offsets_match_document(self):
+        with redirect_stdout(io.StringIO()) as printed:
+            generate_llms_full(self.test_dir, self.output, chunks=True, chunk_size=100, chunk_overlap=20)
+        self.assertIn("Chunks:", printed.getvalue())
+        with open(self.output, "rb") as f:
+            document = f.read()
+        header, chunks, trailer = chunk_export.load_chunks(self.path)
+        self.assertEqual((header["unit"], header["size"], header["overlap"]), ("tokens", 100, 20))
+        self.assertEqual(trailer["size"], len(document))
+        self.assertEqual(trailer["chunks"], len(chunks))
+        self.assertEqual({chunk["path"] for chunk in chunks},
+                         {os.path.join(self.test_dir, name) for name in ("README.md", "core.py", "app.py")})
+        for chunk in chunks:
+            data = document[chunk["offset"]:chunk["offset"] + chunk["length"]]
+            self.assertEqual(data.decode("utf-8"), chunk["text"])
+            self.assertEqual(hashlib.sha256(data).hexdigest(), chunk["hash"])
+
+    def test_unchanged_chunks_are_skipped(self):
+        def run():
+            with redirect_stdout(io.StringIO()):
+                generate_llms_full(self.test_dir, self.output, chunks=True, chunk_size=100,
+                                   chunk_overlap=20, chunks_changed=True)
+            return chunk_export.load_chunks(self.path)
+        _, first, trailer = run()
+        self.assertEqual(trailer["new"], len(first))
+        self.assertTrue(all("text" in chunk for chunk in first))
+        _, second, trailer = run()
+        self.assertEqual((trailer["new"], trailer["unchanged"], trailer["removed"]), (0, len(first), 0))
+        self.assertTrue(all(chunk["unchanged"] and "text" not in chunk for chunk in second))
+        self.assertEqual([chunk["hash"] for chunk in second], [chunk["hash"] for chunk in first])
+        with open(os.path.join(self.test_dir, "app.py"), "w", encoding="utf-8") as f:
+            f.write("import core\n\nprint(core.f2(3))\n")
+        _, third, trailer = run()
+        changed = [chunk for chunk in third if "text" in chunk]
+        self.assertEqual({chunk["title"] for chunk in changed}, {"app.py"})
+        self.assertEqual(trailer["new"], len(changed))
+        self.assertEqual(trailer["removed"], len(changed))
+
+    def test_options_are_checked(self):
+        with self.assertRaises(ValueError):
+            chunk_export.ChunkExporter(self.path, self.test_dir, size=10, overlap=10)
+        with self.assertRaises(ValueError):
+            chunk_export.ChunkExporter(self.path, self.test_dir, unit="lines")
+        with self.assertRaises(ValueError):
+            generate_llms_full(self.test_dir, self.output, chunks=True, max_tokens=1000)
+        with self.assertRaises(ValueError):
+            generate_llms_full(self.test_dir, io.StringIO(), chunks=True)
+        self.assertFalse(os.path.exists(self.path))
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.test_dir, "docs"))
+        self.write("docs/guide.md", "# Guide\n> First version.\n")
+        self.write("tool.py", "print(1)\n")
+        self.output = os.path.join(self.test_dir, "llms-full.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, name, text):
+        with open(os.path.join(self.test_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read_output(self):
+        with open(self.output, encoding="utf-8") as f:
+            return f.read()
+
+    def test_output_inside_tree_is_not_a_source(self):
+        with mock.patch("builtins.print"):
+            generate_llms_full(self.test_dir, self.output, cache=True)
+            generate_llms_full(self.test_dir, self.output, cache=True)
+        self.assertNotIn("llms-full.txt", self.read_output())
+        self.assertEqual(sorted(os.listdir(self.test_dir)),
+                         ["docs", "llms-full.txt", "llms-full.txt.cache.json",
+                          "llms-full.txt.cache.sections", "tool.py"])
+
+    def run_watch(self, backend):
+        stop = threading.Event()
+        updates = []
+        updated = threading.Semaphore(0)
+
+        def on_update(changed, result, error):
+            updates.append((changed, error))
+            updated.release()
+
+        thread = threading.Thread(target=watch.watch, args=(self.test_dir, self.output),
+                                  kwargs=dict(interval=0.05, debounce=0.1, backend=backend, stop=stop,
+                                              on_update=on_update))
+        with mock.patch("builtins.print"):
+            thread.start()
+            try:
+                self.assertTrue(updated.acquire(timeout=10))
+                self.assertIn("First version.", self.read_output())
+                # A burst of changes becomes one update, which re-renders only what changed.
+                self.write("docs/guide.md", "# Guide\n> Second version.\n")
+                os.makedirs(os.path.join(self.test_dir, "docs", "new"))
+                self.write("docs/new/extra.md", "# Extra\n")
+                self.assertTrue(updated.acquire(timeout=10))
+                time.sleep(0.3)
+            finally:
+                stop.set()
+                thread.join(10)
+        self.assertFalse(thread.is_alive())
+        changed, error = updates[1]
+        self.assertIsNone(error)
+        self.assertIn(os.path.join(self.test_dir, "docs", "guide.md"), changed)
+        self.assertEqual(len(updates), 2)
+        output = self.read_output()
+        self.assertIn("Second version.", output)
+        self.assertIn("# Extra", output)
+        self.assertNotIn(self.output + ".tmp", os.listdir(self.test_dir))
+
+    def test_watch_poll(self):
+        self.run_watch("poll")
+
+    def test_watch_inotify(self):
+        try:
+            watch.InotifyWatcher(self.test_dir).close()
+        except OSError:
+            self.skipTest("inotify is not available")
+        self.run_watch("inotify")
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        for name, text in (("a.py", "x = 1\ny = 2\n"), ("b.foo", "one\n"), ("guide.md", "# Guide\n## Setup\n")):
+            with open(os.path.join(self.test_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        utils.use_config(None)
+
+    def test_import_has_no_side_effects(self):
+        # Importing the scripts reads no configuration, configures no logging and imports
+        # neither PyYAML nor tqdm, nor the modules of optional features.
+        src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        lazy = ("yaml", "tqdm", "compact", "rank", "chunk_export", "manifest_cache", "generate_toc", "calendar",
+                "estimate", "profiling", "archive")
+        code = ("import sys, logging, generate_llms, count_lines_of_code, count_chars_of_code, llms; "
+                f"print(sorted(m for m in {lazy!r} if m in sys.modules), "
+                "len(logging.getLogger().handlers))")
+        output = subprocess.run([sys.executable, "-c", code], cwd=self.test_dir, capture_output=True,
+                                text=True, env={**os.environ, "PYTHONPATH": src}, check=True)
+        self.assertEqual(output.stdout.split(), ["[]", "0"])
+        self.assertEqual(output.stderr, "")
+        defaults = inspect.signature(generate_llms_full).parameters
+        self.assertEqual((defaults["chunk_size"].default, defaults["chunk_overlap"].default),
+                         (chunk_export.DEFAULT_SIZE, chunk_export.DEFAULT_OVERLAP))
+
+    def test_explicit_config(self):
+        config_path = os.path.join(self.test_dir, "custom.yaml")
+        with open(config_path, "w", encoding="utf-8") as f:
+            f.write("file_extensions: ['.FOO']\n")
+        utils.use_config(config_path)
+        self.assertEqual(utils.code_extensions(), (".foo",))
+        self.assertIs(utils.get_config(), utils.get_config())
+        total, counts = count_lines_of_code(self.test_dir)
+        self.assertEqual((total, list(counts)), (1, [os.path.join(self.test_dir, "b.foo")]))
+
+    def test_llms_subcommands(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            llms.main(["count-lines", self.test_dir])
+            llms.main(["count-chars", self.test_dir])
+        self.assertIn("Total Lines of Code: 4", out.getvalue())
+        self.assertIn("Total Characters: 29", out.getvalue())
+        toc_file = os.path.join(self.test_dir, "toc.md")
+        with redirect_stdout(io.StringIO()):
+            llms.main(["toc", os.path.join(self.test_dir, "guide.md"), "-o", toc_file])
+        with open(toc_file, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "* [Guide](#guide)\n  * [Setup](#setup)")
+        # Without the input() fallback, a missing argument is an error rather than a prompt.
+        with mock.patch("builtins.input", side_effect=AssertionError), \
+                mock.patch("sys.stderr", io.StringIO()), self.assertRaises(SystemExit):
+            llms.main(["generate"])
+
 class TestGenerateTOC(unittest.TestCase):
     def test_generate_toc(self):
         # Create a sample markdown string with various heading levels.
@@ -142,6 +1689,71 @@ class TestGenerateTOC(unittest.TestCase):
         self.assertIn("    * [Subsection A](#subsection-a)", toc)
         self.assertIn("  * [Section Two](#section-two)", toc)
 
+    def test_headers_in_code_fences_are_skipped(self):
+        # Comments in fenced code are not headers, whatever the fence style or length.
+        markdown_text = (
+            "# Module\n"
+            "```python\n"
+            "# a comment\n"
+            "```\n"
+            "~~~~\n"
+            "## inside tildes\n"
+            "~~~\n"
+            "## still inside\n"
+            "~~~~\n"
+            "## After\n"
+            "#hashtag\n"
+        )
+        self.assertEqual(generate_toc(markdown_text), "* [Module](#module)\n  * [After](#after)")
+
+    def test_anchors_are_unique(self):
+        toc = generate_toc("## utils.py\n## utils.py\n## utils.py-1\n## utils.py ##\n")
+        self.assertEqual(toc.splitlines(), [
+            "  * [utils.py](#utilspy)",
+            "  * [utils.py](#utilspy-1)",
+            "  * [utils.py-1](#utilspy-1-1)",
+            "  * [utils.py](#utilspy-2)",
+        ])
+
+    def test_streaming_matches_whole_text(self):
+        # Feeding the text in pieces that split lines and fences gives the same TOC.
+        markdown_text = "# A\n```\n# x\n```\n## B & C\n### D\n" * 50
+        builder = TocBuilder()
+        for start in range(0, len(markdown_text), 7):
+            builder.feed(markdown_text[start:start + 7])
+        builder.finish()
+        self.assertEqual(builder.render(), generate_toc(markdown_text))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(markdown_text)
+            self.assertEqual(generate_toc_file(path), generate_toc(markdown_text))
+
+    def test_toc_in_generated_output(self):
+        # The TOC heads llms-full.txt, leaves out code comments and keeps the index consistent.
+        with tempfile.TemporaryDirectory() as test_dir, tempfile.TemporaryDirectory() as out_dir:
+            with open(os.path.join(test_dir, "guide.md"), "w", encoding="utf-8") as f:
+                f.write("# Guide\n> How to use it.\n\n## Table of Contents\n")
+            for name in ("a.py", "b.py"):
+                with open(os.path.join(test_dir, name), "w", encoding="utf-8") as f:
+                    f.write(f"# {name} comment\nprint('hello')\n")
+            output = os.path.join(out_dir, "llms-full.txt")
+            generate_llms_full(test_dir, output, toc=True, index=True)
+            with open(output, "r", encoding="utf-8") as f:
+                document = f.read()
+            self.assertEqual(sorted(os.listdir(out_dir)), ["llms-full.txt", "llms-full.txt.index.jsonl"])
+            self.assertTrue(document.startswith("# Table of Contents\n"))
+            toc = document[:document.index("# Project Documentation")]
+            self.assertIn("  * [Guide](#guide)\n", toc)
+            self.assertIn("  * [Table of Contents](#table-of-contents-1)\n", toc)
+            self.assertIn("  * [a.py](#apy)\n", toc)
+            self.assertNotIn("comment", toc)
+            with SectionReader(output) as reader:
+                self.assertEqual(reader.entries[0]["kind"], "toc")
+                self.assertTrue(reader.get("b.py").startswith("## b.py\n"))
+            with self.assertRaises(ValueError):
+                generate_llms_full(test_dir, io.StringIO(), toc=True)
+
 class TestSafeRead(unittest.TestCase):
     def setUp(self):
         # Create a temporary file to test safe_read.
@@ -165,5 +1777,58 @@ class TestSafeRead(unittest.TestCase):
         result = safe_read(non_existent)
         self.assertIsNone(result)
 
+    def test_safe_read_reports_skip_reason(self):
+        # Binary and unreadable files are reported through on_skip with a reason.
+        binary = os.path.join(self.test_dir, "data.mat")
+        with open(binary, "wb") as f:
+            f.write(b"MATLAB 5.0\x00\x01\x02" * 100)
+        skipped = []
+        self.assertIsNone(safe_read(binary, on_skip=skipped.append))
+        self.assertIsNone(safe_read(os.path.join(self.test_dir, "nofile.txt"), on_skip=skipped.append))
+        self.assertEqual([s.reason for s in skipped], [SKIP_BINARY, SKIP_UNREADABLE])
+        self.assertEqual(skipped[0].path, binary)
+
+    def test_latin1_is_not_binary(self):
+        # Latin-1 text decodes through the fallback rather than being sniffed as binary.
+        with open(self.file_path, "wb") as f:
+            f.write("caf\xe9 na\xefve\r\n".encode("latin-1"))
+        self.assertFalse(is_binary("caf\xe9".encode("latin-1")))
+        self.assertEqual(safe_read(self.file_path), "caf\xe9 na\xefve\n")
+
+class TestBinarySkipping(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.test_dir, "good.py"), "w", encoding="utf-8") as f:
+            f.write("print('ok')\n")
+        with open(os.path.join(self.test_dir, "blob.txt"), "wb") as f:
+            f.write(bytes(range(256)) * 64)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.out_dir)
+
+    def test_binary_files_are_left_out(self):
+        # A binary file with a text extension is skipped by the generator and the counters alike.
+        output = os.path.join(self.out_dir, "llms-full.txt")
+        result = generate_llms_full(self.test_dir, output, count_lines=True, count_chars=True)
+        with open(output, "r", encoding="utf-8") as f:
+            content = f.read()
+        self.assertIn("good.py", content)
+        self.assertNotIn("blob.txt", content)
+        self.assertEqual(len(result.line_counts), 1)
+        self.assertEqual([s.reason for s in result.skipped], [SKIP_BINARY])
+        with redirect_stdout(io.StringIO()) as printed:
+            self.assertEqual(count_lines_of_code(self.test_dir)[0], 1)
+            self.assertEqual(count_characters(self.test_dir)[0], len("print('ok')\n"))
+        self.assertEqual(printed.getvalue().count("Skipped 1 files (binary: 1)"), 2)
+
+    def test_oversized_files_are_reported(self):
+        # Files over max_file_size are reported with their size.
+        skipped = []
+        list(walk_files(self.test_dir, max_file_size=100, on_skip=skipped.append))
+        self.assertEqual([s.reason for s in skipped], [SKIP_TOO_LARGE])
+        self.assertIn("16384 bytes", skipped[0].detail)
+
 if __name__ == "__main__":
     unittest.main()
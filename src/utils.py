@@ -6,30 +6,50 @@ Generator project. It includes file handling utilities, configuration management
 constants for file type detection.
 
 Key Components:
-- safe_read(): Robust file reading with encoding fallback
+- safe_read(): Robust file reading with encoding fallback; reads each file once and skips binaries
+- read_bytes() / is_binary(): Single-read access to raw file content and a binary sniff
+- SkippedFile / report_skip(): Structured reporting of files that were skipped and why
+- decode_bytes() / decode_text(): Decodes an already-read buffer exactly as safe_read would
+- detect_encoding() / iter_text_chunks(): Chunked reading of large files with bounded memory
+- ordered_map(): Thread-pool map with bounded prefetch that preserves input order
 - load_config(): YAML configuration file loading with error handling
-- CODE_EXTENSIONS: Comprehensive tuple of supported file extensions for code analysis
-- Logging configuration for consistent error reporting and debugging
+- get_config() / use_config(): The configuration, loaded on first use and cached, from
+  config.yaml in the current directory or from an explicitly chosen file
+- code_extensions(): Comprehensive tuple of supported file extensions for code analysis
+  (file_extensions from the configuration when present); also available as CODE_EXTENSIONS
+- text_extensions(): Additional text file extensions for llms generation (text_extensions);
+  also available as TEXT_EXTENSIONS
+- setup_logging(): Logging configuration for the command-line scripts
 
 Usage:
-    from utils import safe_read, CODE_EXTENSIONS, load_config
+    from utils import safe_read, code_extensions, get_config
 
-The module automatically loads configuration from config.yaml on import and sets up logging
-for consistent error reporting across the project.
+Importing the module has no side effects: the configuration is read (and PyYAML imported) the
+first time it is needed, and logging is only configured by the scripts' entry points.
 """
 
+import io
 import os
 import logging
-import yaml
+from collections import deque, namedtuple
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+DEFAULT_CONFIG_PATH = 'config.yaml'
+
+_config_path = DEFAULT_CONFIG_PATH
+_config_cache = {}
+
+def setup_logging(level=logging.INFO):
+    """
+    Configures logging for a command-line run; library use leaves logging to the application.
+    """
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Load configuration
-def load_config(config_path='config.yaml'):
+def load_config(config_path=DEFAULT_CONFIG_PATH):
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+            import yaml
+            return yaml.safe_load(f) or {}
     except FileNotFoundError:
         logging.warning(f"Config file {config_path} not found, using defaults")
         return {}
@@ -37,10 +57,67 @@ def load_config(config_path='config.yaml'):
         logging.error(f"Error loading config: {e}")
         return {}
 
-config = load_config()
+def use_config(config_path):
+    """
+    Selects the configuration file used from now on (default: config.yaml in the current
+    directory); it is read on first use.
+
+    Args:
+        config_path (str): Path to a YAML configuration file, or None for the default.
+    """
+    global _config_path
+    _config_path = config_path or DEFAULT_CONFIG_PATH
+
+def get_config():
+    """
+    Returns the configuration from the selected file, reading it the first time it is needed.
+
+    Returns:
+        dict: The parsed configuration ({} if the file is missing or invalid).
+    """
+    return _settings()[0]
+
+def _settings():
+    # (config, code extensions, text extensions) of the selected file, loaded once per path.
+    path = os.path.abspath(_config_path)
+    settings = _config_cache.get(path)
+    if settings is None:
+        settings = _config_cache[path] = _derive(load_config(_config_path))
+    return settings
+
+def _derive(config):
+    code = DEFAULT_CODE_EXTENSIONS
+    if config.get('file_extensions'):
+        code = tuple(dict.fromkeys(ext.lower() for ext in config['file_extensions']))
+    text = tuple(config.get('text_extensions') or DEFAULT_TEXT_EXTENSIONS)
+    return config, code, text
+
+def code_extensions():
+    """
+    Returns the file extensions counted as code: file_extensions from the configuration, or
+    DEFAULT_CODE_EXTENSIONS.
+    """
+    return _settings()[1]
+
+def text_extensions():
+    """
+    Returns the extensions of text files included in llms-full.txt: text_extensions from the
+    configuration, or DEFAULT_TEXT_EXTENSIONS.
+    """
+    return _settings()[2]
+
+def __getattr__(name):
+    # config, CODE_EXTENSIONS and TEXT_EXTENSIONS are resolved on first access.
+    if name == 'config':
+        return get_config()
+    if name == 'CODE_EXTENSIONS':
+        return code_extensions()
+    if name == 'TEXT_EXTENSIONS':
+        return text_extensions()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Common file extensions for code and text files.
-CODE_EXTENSIONS = (
+DEFAULT_CODE_EXTENSIONS = (
     '.py', '.txt', '.java', '.c', '.cpp', '.h', '.hpp', '.js', '.jsx', '.ts', '.tsx',
     '.html', '.htm', '.css', '.scss', '.less', '.sh', '.bash', '.go', '.rb', '.php',
     '.sql', '.xml', '.json', '.yaml', '.yml', '.ini', '.toml', '.md', '.markdown',
@@ -52,24 +129,298 @@ CODE_EXTENSIONS = (
     '.ps1', '.bat',
 )
 
-def safe_read(filepath):
+DEFAULT_TEXT_EXTENSIONS = ('.txt', '.md', '.markdown', '.rst', '.adoc')
+
+# Reasons a file is left out of the output and the counts.
+SKIP_BINARY = 'binary'
+SKIP_TOO_LARGE = 'too-large'
+SKIP_UNREADABLE = 'unreadable'
+
+# A skipped file: path, one of the SKIP_* reasons, and a human-readable detail.
+SkippedFile = namedtuple('SkippedFile', ['path', 'reason', 'detail'])
+
+# Number of leading bytes inspected by is_binary().
+SNIFF_SIZE = 8192
+
+# Bytes that occur in text: printable ASCII, common whitespace and control characters (\b, \t,
+# \n, \v, \f, \r, ESC), and everything >= 0x80 (UTF-8 sequences and Latin-1 letters).
+_TEXT_BYTES = bytes({7, 8, 9, 10, 11, 12, 13, 27} | set(range(0x20, 0x7F)) | set(range(0x80, 0x100)))
+
+def report_skip(on_skip, path, reason, detail=''):
+    """
+    Record that a file was skipped.
+
+    The skip is logged (as a warning for unreadable files, at debug level otherwise) and, if
+    on_skip is given, passed to it as a SkippedFile.
+
+    Args:
+        on_skip (callable): Called with a SkippedFile, or None.
+        path (str): The skipped file.
+        reason (str): One of SKIP_BINARY, SKIP_TOO_LARGE or SKIP_UNREADABLE.
+        detail (str): Additional information, such as the error message.
+    """
+    if reason == SKIP_UNREADABLE:
+        logging.warning(f"Skipping {path}: {detail}")
+    else:
+        logging.debug(f"Skipping {path}: {reason} {detail}".rstrip())
+    if on_skip is not None:
+        on_skip(SkippedFile(path, reason, detail))
+
+def is_binary(sample):
+    """
+    Guess whether a file is binary from its first bytes.
+
+    A file is binary if the sample contains a NUL byte or if more than 30% of it consists of
+    control characters that do not occur in text.
+
+    Args:
+        sample (bytes): The first bytes of the file (SNIFF_SIZE is plenty).
+
+    Returns:
+        bool: True if the content looks binary.
+    """
+    sample = sample[:SNIFF_SIZE]
+    if not sample:
+        return False
+    if b'\x00' in sample:
+        return True
+    return len(sample.translate(None, _TEXT_BYTES)) * 10 > len(sample) * 3
+
+def _open_binary(filepath):
+    return open(filepath, 'rb')
+
+def read_bytes(filepath, on_skip=None, sniff=True, opener=_open_binary):
+    """
+    Read a file's raw content with a single read, skipping binary files.
+
+    Args:
+        filepath (str): The path to the file.
+        on_skip (callable): Called with a SkippedFile if the file is skipped.
+        sniff (bool): Skip files that is_binary() classifies as binary (default: True).
+        opener (callable): Opens filepath as a binary file object (default: the file system);
+            archive members are read through their archive's opener.
+
+    Returns:
+        bytes or None: The file content, or None if the file was skipped.
+    """
+    try:
+        with opener(filepath) as f:
+            data = f.read()
+    except Exception as e:
+        report_skip(on_skip, filepath, SKIP_UNREADABLE, str(e))
+        return None
+    if sniff and is_binary(data[:SNIFF_SIZE]):
+        report_skip(on_skip, filepath, SKIP_BINARY)
+        return None
+    return data
+
+def read_head(filepath, size, opener=None):
+    """
+    Reads up to size bytes from the start of a file.
+
+    Args:
+        filepath (str): The path to the file.
+        size (int): The most bytes to read.
+        opener (callable): As for read_bytes() (default: the file system, read without a
+            buffered file object, which halves the cost of small reads).
+
+    Returns:
+        bytes or None: The bytes read, or None if the file could not be read.
+    """
+    try:
+        if opener is None:
+            fd = os.open(filepath, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+            try:
+                return os.read(fd, size)
+            finally:
+                os.close(fd)
+        with opener(filepath) as f:
+            return f.read(size)
+    except Exception:
+        return None
+
+def safe_read(filepath, on_skip=None):
     """
     Safely read the content of a file by trying UTF-8 and falling back to Latin-1 encoding.
 
+    The file is read once; both decodings are tried on the same buffer. Binary files are
+    detected from their first bytes and skipped.
+
     Args:
         filepath (str): The path to the file.
+        on_skip (callable): Called with a SkippedFile if the file is skipped.
 
     Returns:
         str or None: The file content if successful; otherwise, None.
     """
-    for encoding in ('utf-8', 'latin-1'):
+    data = read_bytes(filepath, on_skip)
+    if data is None:
+        return None
+    return decode_bytes(data)
+
+def decode_bytes(data):
+    """
+    Decode raw file bytes the same way safe_read decodes a file.
+
+    UTF-8 is tried first with Latin-1 as the fallback, and newlines are translated as text-mode
+    reads do ("\\r\\n" and "\\r" become "\\n").
+
+    Args:
+        data (bytes): The file content.
+
+    Returns:
+        str: The decoded text.
+    """
+    return decode_text(data)[0]
+
+def decode_text(data):
+    """
+    Like decode_bytes(), but also tells which encoding was used.
+
+    Args:
+        data (bytes): The file content.
+
+    Returns:
+        tuple: (text, encoding), where encoding is 'utf-8' or 'latin-1'.
+    """
+    try:
+        text = data.decode('utf-8')
+        encoding = 'utf-8'
+    except UnicodeDecodeError:
+        text = data.decode('latin-1')
+        encoding = 'latin-1'
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text, encoding
+
+def detect_encoding(filepath, chunk_size=1 << 16, on_skip=None, opener=_open_binary):
+    """
+    Determine which encoding safe_read would use for a file, without holding it in memory.
+
+    The file is validated as UTF-8 in fixed-size chunks; any invalid sequence selects Latin-1.
+    Binary files are recognised from the first chunk and skipped like safe_read skips them.
+
+    Args:
+        filepath (str): The path to the file.
+        chunk_size (int): Number of bytes read at a time.
+        on_skip (callable): Called with a SkippedFile if the file is skipped.
+        opener (callable): Opens filepath as a binary file object (see read_bytes()).
+
+    Returns:
+        str or None: 'utf-8' or 'latin-1', or None if the file was skipped.
+    """
+    import codecs
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with opener(filepath) as f:
+            block = f.read(max(chunk_size, SNIFF_SIZE))
+            if is_binary(block):
+                report_skip(on_skip, filepath, SKIP_BINARY)
+                return None
+            while True:
+                decoder.decode(block, final=not block)
+                if not block:
+                    return 'utf-8'
+                block = f.read(chunk_size)
+    except UnicodeDecodeError:
+        return 'latin-1'
+    except Exception as e:
+        report_skip(on_skip, filepath, SKIP_UNREADABLE, str(e))
+        return None
+
+def iter_text_chunks(filepath, encoding, chunk_size=1 << 16, opener=None):
+    """
+    Yield the decoded content of a file in chunks of at most chunk_size characters.
+
+    Newlines are translated exactly as in safe_read, so joining the chunks gives the same
+    string safe_read returns.
+
+    Args:
+        filepath (str): The path to the file.
+        encoding (str): Encoding to decode with, usually from detect_encoding().
+        chunk_size (int): Maximum number of characters per chunk.
+        opener (callable): Opens filepath as a binary file object (default: the file system;
+            see read_bytes()).
+
+    Yields:
+        str: Successive pieces of the file content.
+    """
+    if opener is None:
+        f = open(filepath, 'r', encoding=encoding)
+    else:
+        f = io.TextIOWrapper(opener(filepath), encoding=encoding)
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def strip_chunks(chunks):
+    """
+    Streaming equivalent of str.strip() over an iterable of string chunks.
+
+    Leading whitespace is dropped, and trailing whitespace of a chunk is held back until a later
+    chunk shows it is not at the end of the text.
+
+    Args:
+        chunks (iterable): String chunks.
+
+    Yields:
+        str: Chunks whose concatenation equals "".join(chunks).strip().
+    """
+    started = False
+    pending = ''
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        stripped = chunk.rstrip()
+        if stripped:
+            if pending:
+                yield pending
+            yield stripped
+            pending = chunk[len(stripped):]
+        else:
+            pending += chunk
+
+def ordered_map(func, items, workers=1, prefetch=None):
+    """
+    Apply func to each item, optionally on a thread pool, yielding results in input order.
+
+    At most `prefetch` calls are in flight at any time, so memory stays bounded no matter how
+    many items there are. With workers <= 1 the items are processed serially in the calling
+    thread.
+
+    Args:
+        func (callable): Function applied to each item.
+        items (iterable): Input items.
+        workers (int): Number of worker threads (default: 1, serial).
+        prefetch (int): Maximum number of pending results (default: 4 * workers).
+
+    Yields:
+        The result of func(item) for each item, in the order of `items`.
+    """
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    prefetch = max(prefetch or workers * 4, 1)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
         try:
-            with open(filepath, 'r', encoding=encoding) as f:
-                return f.read()
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            print(f"Error reading file {filepath}: {e}")
-            return None
-    print(f"Skipping file due to encoding issues: {filepath}")
-    return None
\ No newline at end of file
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
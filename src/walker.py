@@ -0,0 +1,260 @@
+"""
+Pruning Directory Walker
+
+This module provides the directory walker used by every script in the project. It is built on
+os.scandir and applies the exclusion rules from config.yaml while walking, so excluded
+directories such as .git, node_modules or __pycache__ are never descended into.
+
+Key Features:
+- Excluded directories are pruned before descending, not filtered afterwards
+- exclude_patterns from config.yaml are compiled into a single regular expression and matched
+  against file and directory names
+- performance.max_file_size is enforced from the stat results scandir already produced, and the
+  stat results are handed to the caller so files are not stat'ed twice
+- Optional support for .gitignore files found along the way (negation, anchored and
+  directory-only patterns, ** wildcards)
+- Same shape as os.walk: yields (dirpath, files) per directory, never follows directory symlinks
+
+Usage:
+    from walker import walk_files
+
+    for dirpath, files in walk_files(directory, honor_gitignore=True):
+        for filename, st in files:
+            ...
+"""
+
+import os
+import re
+import logging
+import fnmatch
+from utils import get_config, report_skip, SKIP_TOO_LARGE
+
+DEFAULT_EXCLUDE_PATTERNS = (
+    '*.log', '*__pycache__*', '*.pyc', '.git*', '.DS_Store',
+    'node_modules', '.venv', 'venv', '.tox', 'build', 'dist',
+)
+DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024
+
+def compile_patterns(patterns):
+    """
+    Compiles glob patterns into one regular expression matching any of them.
+
+    Args:
+        patterns (iterable): fnmatch-style glob patterns.
+
+    Returns:
+        re.Pattern or None: The combined pattern, or None if there are no patterns.
+    """
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+def exclusion_rules(exclude_patterns=None, max_file_size=None):
+    """
+    Resolves the exclusion rules of a walk, filling in the configured defaults.
+
+    Args:
+        exclude_patterns (iterable): Glob patterns (default: exclude_patterns from config.yaml,
+            or DEFAULT_EXCLUDE_PATTERNS).
+        max_file_size (int): Size limit in bytes (default: performance.max_file_size from
+            config.yaml, or DEFAULT_MAX_FILE_SIZE; 0 disables).
+
+    Returns:
+        tuple: (excluded, match_relpath, max_file_size), where excluded is the compiled pattern
+        (or None) and match_relpath tells whether it must also be matched against relative paths.
+    """
+    config = get_config()
+    if exclude_patterns is None:
+        exclude_patterns = config.get('exclude_patterns', DEFAULT_EXCLUDE_PATTERNS)
+    if max_file_size is None:
+        max_file_size = config.get('performance', {}).get('max_file_size', DEFAULT_MAX_FILE_SIZE)
+    exclude_patterns = list(exclude_patterns)
+    # Patterns with a slash are also matched against the path relative to the root.
+    match_relpath = any("/" in pattern for pattern in exclude_patterns)
+    return compile_patterns(exclude_patterns), match_relpath, max_file_size
+
+def group_by_directory(entries, excluded=None, match_relpath=False):
+    """
+    Groups a flat list of relative paths by directory, applying exclusion rules as a pruning walk
+    would: a file is left out when its name, or the name of any directory above it, matches.
+
+    Used for file lists that do not come from the file system, such as a git index or an archive.
+
+    Args:
+        entries (iterable): (relpath, value) pairs, with "/" as the separator.
+        excluded (re.Pattern): Compiled exclusion pattern, as from exclusion_rules(), or None.
+        match_relpath (bool): Also match the pattern against relative paths.
+
+    Returns:
+        dict: Relative directory ("" for the root) -> list of (filename, value) pairs, in the
+        order of entries.
+    """
+    by_directory = {}
+    for relpath, value in entries:
+        reldir, _, filename = relpath.rpartition("/")
+        by_directory.setdefault(reldir, []).append((filename, value))
+    if excluded is None:
+        return by_directory
+
+    pruned = {"": False}
+
+    def is_pruned(reldir):
+        if reldir not in pruned:
+            parent, _, name = reldir.rpartition("/")
+            pruned[reldir] = (is_pruned(parent) or excluded.match(name) is not None
+                              or (match_relpath and excluded.match(reldir) is not None))
+        return pruned[reldir]
+
+    return {
+        reldir: [(filename, value) for filename, value in files
+                 if not excluded.match(filename)
+                 and not (match_relpath and excluded.match(f"{reldir}/{filename}" if reldir else filename))]
+        for reldir, files in by_directory.items() if not is_pruned(reldir)}
+
+def _gitignore_regex(pattern):
+    # Translates one .gitignore glob into a regex matched against paths relative to the
+    # directory containing the .gitignore file.
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            body = pattern[i + 1:end].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(prefix + "".join(out) + r"\Z")
+
+def parse_gitignore(path):
+    """
+    Parses a .gitignore file into rules.
+
+    Args:
+        path (str): Path to the .gitignore file.
+
+    Returns:
+        list: (regex, negate, dir_only) tuples in file order.
+    """
+    rules = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        if not line.strip() or line.startswith("#"):
+            continue
+        line = line.rstrip()
+        if line.startswith("\\"):
+            line = line[1:]
+            negate = False
+        else:
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if line:
+            rules.append((_gitignore_regex(line), negate, dir_only))
+    return rules
+
+def _gitignored(rule_sets, relpath, is_dir):
+    # rule_sets is a list of (base, rules) from the root down; the last matching rule wins.
+    ignored = False
+    for base, rules in rule_sets:
+        if base:
+            if not relpath.startswith(base + "/"):
+                continue
+            local = relpath[len(base) + 1:]
+        else:
+            local = relpath
+        for regex, negate, dir_only in rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(local):
+                ignored = not negate
+    return ignored
+
+def walk_files(directory, exclude_patterns=None, max_file_size=None, honor_gitignore=False, on_skip=None):
+    """
+    Walks a directory tree, pruning excluded directories and skipping excluded or oversized files.
+
+    Args:
+        directory (str): The root directory to walk.
+        exclude_patterns (iterable): Glob patterns matched against file and directory names
+            (default: exclude_patterns from config.yaml, or DEFAULT_EXCLUDE_PATTERNS).
+        max_file_size (int): Files larger than this many bytes are skipped (default:
+            performance.max_file_size from config.yaml, or DEFAULT_MAX_FILE_SIZE; 0 disables).
+        honor_gitignore (bool): Also skip paths ignored by .gitignore files in the tree.
+        on_skip (callable): Called with a utils.SkippedFile for each file over max_file_size.
+            Excluded and ignored paths are not reported.
+
+    Yields:
+        tuple: (dirpath, files) for each directory visited, top-down, where files is a list of
+        (filename, stat_result) pairs. dirpath is built from directory like os.walk's.
+    """
+    excluded, match_relpath, max_file_size = exclusion_rules(exclude_patterns, max_file_size)
+
+    stack = [(directory, "", [])]
+    while stack:
+        dirpath, reldir, rule_sets = stack.pop()
+        if honor_gitignore:
+            rules = parse_gitignore(os.path.join(dirpath, ".gitignore"))
+            if rules:
+                rule_sets = rule_sets + [(reldir, rules)]
+        try:
+            entries = list(os.scandir(dirpath))
+        except OSError as e:
+            logging.warning(f"Cannot list directory {dirpath}: {e}")
+            continue
+
+        files = []
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            relpath = f"{reldir}/{name}" if reldir else name
+            if excluded is not None and (excluded.match(name) or (match_relpath and excluded.match(relpath))):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if rule_sets and _gitignored(rule_sets, relpath, is_dir):
+                continue
+            if is_dir:
+                if not entry.is_symlink():
+                    subdirs.append((entry.path, relpath, rule_sets))
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                # Broken symlinks and vanished files are reported when they are read.
+                st = None
+            if st is not None and max_file_size and st.st_size > max_file_size:
+                report_skip(on_skip, entry.path, SKIP_TOO_LARGE, f"{st.st_size} bytes > {max_file_size}")
+                continue
+            files.append((name, st))
+
+        yield dirpath, files
+        # Reverse so that directories are visited in scandir order.
+        stack.extend(reversed(subdirs))
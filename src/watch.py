@@ -0,0 +1,360 @@
+"""
+Watch Mode
+
+This script keeps llms-full.txt up to date while the source tree is being edited. It waits for
+changes, lets a burst of them settle, and regenerates the output through the manifest cache, so
+only the files that changed are read and rendered again; every other section is copied from the
+cache.
+
+Key Features:
+- inotify on Linux (through ctypes, no extra dependency): the process sleeps in the kernel while
+  nothing changes; elsewhere, or when inotify watches run out, the tree is polled with the same
+  pruning walker the generator uses, comparing sizes and modification times
+- Excluded directories (.git, node_modules, ...) are neither watched nor polled, and the
+  output's own files (<output>, its .tmp, cache, index and frame table) are ignored
+- Debouncing: an update starts once no change has been seen for --debounce seconds, or after
+  --max-delay seconds of continuous changes
+- Incremental: each update is a generate_llms_full run with the cache enabled, so unchanged
+  files are neither read nor rendered
+- Atomic: the output is written next to the target and moved into place, so readers never see
+  a half-written file
+- Bounded memory over long runs: the watcher keeps one entry per directory (inotify) or per file
+  (polling), and each update is a fresh run that keeps nothing afterwards
+- An update that fails is logged and the watch carries on
+
+Usage:
+    python -m src.watch directory [-o output_file] [--debounce SECONDS] [--backend poll]
+
+Example:
+    python -m src.watch docs -o site/llms-full.txt --toc
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+import argparse
+import threading
+from generate_llms import generate_llms_full, own_files
+from walker import walk_files, exclusion_rules
+from utils import setup_logging, use_config
+
+BACKENDS = ("auto", "inotify", "poll")
+
+# Seconds between polls, and between checks for a stop request with inotify.
+DEFAULT_INTERVAL = 1.0
+# Quiet seconds after the last change before an update starts.
+DEFAULT_DEBOUNCE = 0.5
+# Longest an update is put off while changes keep coming.
+DEFAULT_MAX_DELAY = 10.0
+
+# inotify constants from <sys/inotify.h>.
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+               | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+class PollWatcher:
+    """
+    Detects changes by walking the tree and comparing sizes and modification times.
+    """
+
+    def __init__(self, directory, ignore=None, honor_gitignore=False, sleep=time.sleep):
+        """
+        Args:
+            directory (str): The tree to watch.
+            ignore (callable): True for the absolute paths whose changes are ignored.
+            honor_gitignore (bool): Also skip paths ignored by .gitignore files.
+            sleep (callable): Waits for a number of seconds, e.g. threading.Event.wait.
+        """
+        self.directory = os.path.abspath(directory)
+        self.ignore = ignore
+        self.honor_gitignore = honor_gitignore
+        self._sleep = sleep
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dirpath, files in walk_files(self.directory, honor_gitignore=self.honor_gitignore):
+            for filename, st in files:
+                path = os.path.join(dirpath, filename)
+                if self.ignore is None or not self.ignore(path):
+                    snapshot[path] = (st.st_size, st.st_mtime_ns) if st is not None else None
+        return snapshot
+
+    def wait(self, timeout):
+        """
+        Sleeps for timeout seconds, then returns the set of paths added, removed or modified
+        since the previous call.
+        """
+        self._sleep(timeout)
+        snapshot = self._scan()
+        old, self._snapshot = self._snapshot, snapshot
+        if snapshot == old:
+            return set()
+        changed = {path for path, stat in snapshot.items() if old.get(path, False) != stat}
+        changed.update(path for path in old if path not in snapshot)
+        return changed
+
+    def close(self):
+        self._snapshot = {}
+
+class InotifyWatcher:
+    """
+    Detects changes with Linux inotify, one watch per directory that is not excluded.
+
+    Raises:
+        OSError: If inotify is not available or the watch limit is reached.
+    """
+
+    def __init__(self, directory, ignore=None, honor_gitignore=False):
+        import ctypes
+        import ctypes.util
+        self.directory = os.path.abspath(directory)
+        self.ignore = ignore
+        self.honor_gitignore = honor_gitignore
+        self._excluded = exclusion_rules()[0]
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._get_errno = ctypes.get_errno
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths = {}    # watch descriptor -> directory
+        try:
+            self._add_tree(self.directory)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, directory):
+        for dirpath, _ in walk_files(directory, honor_gitignore=self.honor_gitignore):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), _WATCH_MASK)
+            if wd >= 0:
+                self._paths[wd] = dirpath
+                continue
+            error = self._get_errno()
+            if error in (errno.ENOSPC, errno.ENOMEM):
+                raise OSError(error, f"Out of inotify watches at {dirpath}; raise "
+                                     "fs.inotify.max_user_watches or use --backend poll")
+            # Directories that vanished or cannot be read are picked up by their parent's events.
+
+    def wait(self, timeout):
+        """
+        Waits up to timeout seconds for events and returns the set of paths they concern.
+        Events for ignored paths, such as the output being written, do not end the wait.
+        """
+        changed = set()
+        deadline = time.monotonic() + timeout
+        while not changed and self._fd is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self._fd], [], [], remaining)[0]:
+                break
+            while True:
+                try:
+                    data = os.read(self._fd, _READ_SIZE)
+                except BlockingIOError:
+                    break
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                    name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                    offset += _EVENT.size + length
+                    self._event(wd, mask, os.fsdecode(name), changed)
+        return changed
+
+    def _event(self, wd, mask, name, changed):
+        if mask & _IN_Q_OVERFLOW:
+            # Events were lost: re-arm every directory and treat the whole tree as changed.
+            self._add_tree(self.directory)
+            changed.add(self.directory)
+            return
+        if mask & _IN_IGNORED:
+            self._paths.pop(wd, None)
+            return
+        dirpath = self._paths.get(wd)
+        if dirpath is None:
+            return
+        path = os.path.join(dirpath, name) if name else dirpath
+        if name and self._excluded is not None and self._excluded.match(name):
+            return
+        if self.ignore is not None and self.ignore(path):
+            return
+        if mask & _IN_ISDIR:
+            if mask & _IN_MOVED_FROM:
+                self._remove_tree(path)
+            elif mask & (_IN_CREATE | _IN_MOVED_TO):
+                try:
+                    self._add_tree(path)
+                except OSError as e:
+                    logging.warning(f"Not watching {path}: {e}")
+        changed.add(path)
+
+    def _remove_tree(self, directory):
+        # Watches of a directory moved away would report its changes under the old path.
+        prefix = directory + os.sep
+        for wd, dirpath in list(self._paths.items()):
+            if dirpath == directory or dirpath.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._paths[wd]
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._paths = {}
+
+def open_watcher(directory, backend="auto", ignore=None, honor_gitignore=False, sleep=time.sleep):
+    """
+    Returns a watcher for a tree.
+
+    Args:
+        directory (str): The tree to watch.
+        backend (str): "inotify", "poll", or "auto" for inotify where it works, else polling.
+        ignore (callable): True for the absolute paths whose changes are ignored.
+        honor_gitignore (bool): Also skip paths ignored by .gitignore files.
+        sleep (callable): How PollWatcher waits between polls.
+
+    Returns:
+        InotifyWatcher or PollWatcher: An object with wait(timeout) and close().
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    if backend != "poll":
+        try:
+            return InotifyWatcher(directory, ignore, honor_gitignore)
+        except OSError as e:
+            if backend == "inotify":
+                raise
+            logging.info(f"inotify unavailable ({e}); polling instead")
+    return PollWatcher(directory, ignore, honor_gitignore, sleep)
+
+def watch(directory, output_file="llms-full.txt", interval=DEFAULT_INTERVAL, debounce=DEFAULT_DEBOUNCE,
+          max_delay=DEFAULT_MAX_DELAY, backend="auto", stop=None, on_update=None, **options):
+    """
+    Generates llms-full.txt, then regenerates it whenever the source tree changes, until stopped.
+
+    Args:
+        directory (str): The root directory to process.
+        output_file (str): The output path.
+        interval (float): Seconds between polls; with inotify, how often a stop request is
+            checked.
+        debounce (float): Quiet seconds after the last change before an update starts.
+        max_delay (float): Longest an update is put off while changes keep coming.
+        backend (str): "auto", "inotify" or "poll" (see open_watcher()).
+        stop (threading.Event): Ends the watch when set (default: run until interrupted).
+        on_update (callable): Called after every update with (changed, result, error): the set
+            of changed paths (empty for the initial run), the scan.ScanResult, and the exception
+            if the update failed.
+        **options: Passed on to generate_llms_full(); cache defaults to True.
+
+    Raises:
+        ValueError: For file-like outputs, max_tokens or an unknown backend.
+    """
+    if hasattr(output_file, "write"):
+        raise ValueError("watch needs an output path to replace")
+    if options.get("max_tokens"):
+        raise ValueError("watch replaces a single output file and cannot be combined with max_tokens")
+    if not os.path.isdir(directory):
+        raise NotADirectoryError(f"No such directory: {directory}")
+    options.setdefault("cache", True)
+    stop = stop or threading.Event()
+    watcher = open_watcher(directory, backend, own_files(output_file),
+                           options.get("honor_gitignore", False), stop.wait)
+
+    def update(changed):
+        result = error = None
+        try:
+            result = generate_llms_full(directory, output_file, **options)
+        except Exception as e:
+            error = e
+            logging.error(f"Updating {output_file} failed: {e}")
+        if on_update is not None:
+            on_update(changed, result, error)
+
+    try:
+        update(set())
+        while not stop.is_set():
+            changed = watcher.wait(interval)
+            if not changed:
+                continue
+            first = time.monotonic()
+            while not stop.is_set() and time.monotonic() - first < max_delay:
+                more = watcher.wait(min(debounce, max(0.0, max_delay - (time.monotonic() - first))))
+                if not more:
+                    break
+                changed |= more
+            if stop.is_set():
+                break
+            print(f"{len(changed)} changed {'path' if len(changed) == 1 else 'paths'}; updating {output_file}")
+            update(changed)
+    finally:
+        watcher.close()
+
+def main(argv=None, prog=None, interactive=True):
+    """
+    Command-line entry point; also run by "llms watch".
+
+    Args:
+        argv (list): Arguments (default: sys.argv[1:]).
+        prog (str): Program name shown in usage and help.
+        interactive (bool): Prompt for the directory when it is not given; otherwise it is required.
+    """
+    parser = argparse.ArgumentParser(prog=prog, description="Keep llms-full.txt up to date while a directory changes.")
+    parser.add_argument("directory", nargs="?" if interactive else None, help="Root directory to watch")
+    parser.add_argument("-o", "--output", default="llms-full.txt", help="Output file (default: llms-full.txt)")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto",
+                        help="How changes are detected (default: inotify where available, else polling)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"Seconds between polls (default: {DEFAULT_INTERVAL:g})")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help=f"Quiet seconds before an update (default: {DEFAULT_DEBOUNCE:g})")
+    parser.add_argument("--max-delay", type=float, default=DEFAULT_MAX_DELAY,
+                        help=f"Longest an update waits while changes continue (default: {DEFAULT_MAX_DELAY:g})")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of threads used to read and format files (default: 1)")
+    parser.add_argument("--gitignore", action="store_true", help="Skip paths ignored by .gitignore files")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Emit identical files once; later copies become a reference section")
+    parser.add_argument("--index", action="store_true",
+                        help="Also write <output>.index.jsonl with the byte range of every section")
+    parser.add_argument("--toc", action="store_true",
+                        help="Start the output with a table of contents of its headings")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Rebuild every section on each update instead of reusing <output>.cache.*")
+    parser.add_argument("--config", help="Configuration file (default: config.yaml)")
+    args = parser.parse_args(argv)
+    setup_logging()
+    if args.config:
+        use_config(args.config)
+
+    directory = args.directory or input("Enter the root directory to watch: ")
+    print(f"Watching {directory} (Ctrl+C to stop)")
+    try:
+        watch(directory, args.output, args.interval, args.debounce, args.max_delay, args.backend,
+              workers=args.workers, honor_gitignore=args.gitignore, dedup=args.dedup,
+              index=args.index, toc=args.toc, cache=not args.no_cache)
+    except KeyboardInterrupt:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()